@@ -1,12 +1,12 @@
 """
 Flask Contact Form Application
 Session 3: Virtual Machines & Cloud Compute
-Main entry point for the application
+Main entry point for the application (development server); in production
+serve wsgi.py with gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
 """
 
 import os
 from app import create_app
-from app.utils import get_message_count
 from config import config
 
 # Get environment or use default
@@ -20,7 +20,13 @@ if __name__ == '__main__':
     print("=" * 50)
     print(f"📁 Working directory: {os.getcwd()}")
     print(f"🔧 Environment: {env}")
-    print(f"📧 Total messages: {get_message_count()}")
+    if app.config.get('FAST_START', False):
+        # Counting can mean a full table scan or file read
+        print("📧 Total messages: see /health")
+    else:
+        from app.utils import get_message_count
+        with app.app_context():
+            print(f"📧 Total messages: {get_message_count()}")
     print("\n🌐 Access your application at:")
     print(f"   http://localhost:{app.config['PORT']}/")
     print("\n📚 Available routes:")
@@ -5,8 +5,8 @@ A simple web application demonstrating form handling, database migrations, and O
 """
 
 from flask import Flask
-from flask_migrate import Migrate
 import os
+import time
 
 
 def create_app(config_object='config.Config'):
@@ -19,6 +19,8 @@ def create_app(config_object='config.Config'):
     Returns:
         Flask: The configured Flask application instance
     """
+    started = time.perf_counter()
+
     # Initialize Flask application
     app = Flask(__name__,
                 template_folder='../templates',
@@ -26,16 +28,67 @@ def create_app(config_object='config.Config'):
 
     # Load configuration
     app.config.from_object(config_object)
+    if app.config.get('REQUIRE_DATABASE_URL') and not app.config.get('DATABASE_URL'):
+        raise ValueError("DATABASE_URL must be set in production")
+    fast_start = app.config.get('FAST_START', False)
+
+    # Pick the storage backend once; USE_DATABASE follows it, so the
+    # database-only features below switch on exactly for database storage
+    from .storage import create_storage, resolve_file_format, resolve_storage_backend
+    app.config['STORAGE_BACKEND'] = resolve_storage_backend(app.config)
+    app.config['USE_DATABASE'] = app.config['STORAGE_BACKEND'] == 'database'
+    if app.config['STORAGE_BACKEND'] == 'file':
+        app.config['FILE_STORAGE_FORMAT'] = resolve_file_format(app.config)
 
-    # Initialize SQLAlchemy
+    # Initialize SQLAlchemy with the configured connection pool
     from .models import db
+    from .pool import build_engine_options, install_statement_timeout
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
     db.init_app(app)
 
-    # Initialize Flask-Migrate
-    migrate = Migrate(app, db)
+    # Send listing, count and search reads to replicas if any are configured
+    replica_engines = {}
+    if app.config.get('USE_DATABASE', False) and app.config.get('DATABASE_REPLICA_URLS'):
+        from .replicas import ReplicaRouter, create_replica_engines, set_sticky_cookie
+        replica_engines = create_replica_engines(app)
+        app.extensions['replica_router'] = ReplicaRouter(
+            replica_engines,
+            eject_seconds=app.config.get('REPLICA_EJECT_SECONDS', 30.0),
+            max_lag=app.config.get('REPLICA_MAX_LAG_SECONDS', 0.0),
+            check_interval=app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5.0)
+        )
+        app.after_request(set_sticky_cookie)
+        print(f"✅ Routing reads to {len(replica_engines)} read replica(s)")
+
+    with app.app_context():
+        for engine in (db.engine, *replica_engines.values()):
+            install_statement_timeout(engine, app.config.get('DB_STATEMENT_TIMEOUT_MS', 0))
+        # Per-request query counts, slow-query log and N+1 warnings
+        if app.config.get('USE_DATABASE', False) and app.config.get('QUERY_PROFILING_ENABLED', False):
+            from .profiling import install_query_profiler
+            install_query_profiler(app, db.engine, *replica_engines.values())
+
+    # Initialize Flask-Migrate; alembic is slow to import, so fast-start
+    # workers only load it when running under the flask CLI (`flask db ...`)
+    if not fast_start or os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        migrate = Migrate(app, db)
+
+    # Serve repeated database and Supabase reads from memory if the read cache is enabled
+    if app.config.get('READ_CACHE_ENABLED', False):
+        from .cache import ReadCache
+        app.extensions['read_cache'] = ReadCache(
+            max_entries=app.config.get('READ_CACHE_MAX_ENTRIES', 1024),
+            ttls=app.config.get('READ_CACHE_TTLS')
+        )
+        print(f"✅ Read cache enabled ({app.config.get('READ_CACHE_MAX_ENTRIES', 1024)} entries)")
+
+    # Create the storage backend every storage helper uses
+    storage = create_storage(app)
+    app.extensions['storage'] = storage
 
     # Print storage type
-    if app.config.get('USE_DATABASE', False):
+    if storage.name == 'database':
         db_uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
         if 'postgresql' in db_uri:
             # Extract host from DATABASE_URL for display
@@ -47,21 +100,95 @@ def create_app(config_object='config.Config'):
             print(f"✅ Using SQLite database: {db_uri.replace('sqlite:///', '')}")
         else:
             print(f"✅ Using database: {db_uri.split('@')[-1] if '@' in db_uri else 'configured'}")
+    elif storage.name == 'segmented':
+        print(f"📁 Using segmented file storage ({storage.store.directory}/)")
+    elif storage.name == 'legacy':
+        print(f"📁 Using file-based storage ({storage.path})")
+    elif storage.name == 'supabase':
+        print("✅ Using Supabase storage (REST API)")
     else:
-        print("📁 Using file-based storage (messages.txt)")
+        print("⚠️  Using in-memory storage: messages are kept per process and lost on restart")
+
+    # Save submissions in background batches if write-behind is enabled
+    if app.config.get('WRITE_BEHIND_ENABLED', False):
+        from .writebehind import WriteBehindQueue
+        app.extensions['write_behind'] = WriteBehindQueue(
+            app,
+            max_size=app.config.get('WRITE_BEHIND_MAX_QUEUE', 10000),
+            batch_size=app.config.get('WRITE_BEHIND_BATCH_SIZE', 500),
+            max_latency=app.config.get('WRITE_BEHIND_MAX_LATENCY', 0.05),
+            durability=app.config.get('WRITE_BEHIND_DURABILITY', 'async'),
+            enqueue_timeout=app.config.get('WRITE_BEHIND_ENQUEUE_TIMEOUT', 1.0)
+        )
+        print(f"✅ Write-behind queue enabled ({app.config.get('WRITE_BEHIND_DURABILITY', 'async')} durability)")
+
+    # Shed submissions early instead of letting them pile up on the database
+    if app.config.get('ADMISSION_CONTROL_ENABLED', False):
+        from .admission import AdmissionController
+        app.extensions['admission'] = AdmissionController(
+            rate=app.config.get('ADMISSION_RATE', 1.0),
+            burst=app.config.get('ADMISSION_BURST', 10),
+            max_concurrent=app.config.get('ADMISSION_MAX_CONCURRENT_WRITES', 16),
+            acquire_timeout=app.config.get('ADMISSION_ACQUIRE_TIMEOUT', 0.0),
+            max_clients=app.config.get('ADMISSION_MAX_CLIENTS', 10000),
+            retry_after=app.config.get('ADMISSION_RETRY_AFTER', 1)
+        )
+        print(f"✅ Admission control enabled ({app.config.get('ADMISSION_MAX_CONCURRENT_WRITES', 16)} concurrent writes)")
+
+    # Reuse the rendered HTML of messages across listing requests
+    if app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        from .cache import FragmentCache
+        app.extensions['fragment_cache'] = FragmentCache(
+            max_bytes=app.config.get('FRAGMENT_CACHE_MAX_BYTES', 8 * 1024 * 1024))
 
     # Create tables if they don't exist (for development)
     # In production, use migrations instead
-    with app.app_context():
-        if app.config.get('USE_DATABASE', False):
-            try:
-                db.create_all()
-                print("✅ Database tables verified/created")
-            except Exception as e:
-                print(f"⚠️  Database initialization warning: {e}")
+    if app.config.get('USE_DATABASE', False):
+        if fast_start:
+            print("⏩ Fast start: skipping schema verification "
+                  "(run `flask db upgrade` or `flask messages verify-schema`)")
+        else:
+            with app.app_context():
+                try:
+                    from .models import verify_schema
+                    has_index = verify_schema()
+                    print("✅ Database tables verified/created")
+                    if has_index:
+                        print("✅ Full-text search index verified/created")
+                except Exception as e:
+                    print(f"⚠️  Database initialization warning: {e}")
+
+    # Per-route request metrics and storage timings on /metrics
+    if app.config.get('METRICS_ENABLED', True):
+        from .metrics import init_metrics
+        init_metrics(app)
+
+    # Requests served by each worker process, reported on /health
+    from .workers import init_worker_stats
+    init_worker_stats(app)
+
+    # Detailed /health statistics are refreshed in the background
+    from .health import HealthSnapshot
+    app.extensions['health_snapshot'] = HealthSnapshot(
+        app, interval=app.config.get('HEALTH_SNAPSHOT_INTERVAL', 10.0))
 
     # Register blueprints
     from .routes import main
     app.register_blueprint(main)
+    from .api import api
+    app.register_blueprint(api)
+
+    # Register CLI commands
+    from .cli import messages_cli
+    app.cli.add_command(messages_cli)
+
+    # Report cold-start time per worker process
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    app.extensions['startup'] = {
+        'pid': os.getpid(),
+        'startup_ms': round(elapsed_ms, 1),
+        'fast_start': fast_start,
+    }
+    print(f"⏱️  App created in {elapsed_ms:.1f} ms (pid {os.getpid()}{', fast start' if fast_start else ''})")
 
     return app
@@ -0,0 +1,186 @@
+"""
+Admission control for the write path of the Flask Contact Form Application
+
+Each client gets an in-memory token bucket: it refills at rate tokens per
+second up to burst, and every submission takes one token. A global cap
+limits how many submissions are saved at once, so a write storm cannot
+take every worker thread and database connection. Rejected requests get
+an immediate 429 (client over its rate) or 503 (write capacity full) with
+a Retry-After header, and read routes keep their threads and connections.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, render_template, request
+
+from .metrics import get_metrics
+
+
+class AdmissionController:
+    """
+    Per-client token buckets plus a cap on concurrent writes
+
+    Buckets are kept for at most max_clients clients; when a new client
+    arrives the least recently seen one is forgotten, which only ever
+    gives that client a full bucket again.
+    """
+
+    def __init__(self, rate=1.0, burst=10, max_concurrent=16, acquire_timeout=0.0,
+                 max_clients=10000, retry_after=1, clock=time.monotonic):
+        """
+        Initialize the controller
+
+        Args:
+            rate (float): Tokens added per client per second (0 disables
+                the per-client limit)
+            burst (int): Bucket size, i.e. submissions a client may make at once
+            max_concurrent (int): Writes allowed in flight at once (0 disables
+                the cap)
+            acquire_timeout (float): Seconds a request waits for a write slot
+                before it is shed
+            max_clients (int): Number of client buckets kept in memory
+            retry_after (int): Retry-After seconds sent with 503 responses
+            clock (callable): Monotonic time source in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self.max_clients = max_clients
+        self.retry_after = retry_after
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+        self.in_flight = 0
+        self.stats = {'admitted': 0, 'rate_limited': 0, 'shed': 0}
+
+    def take_token(self, client):
+        """
+        Take a token from a client's bucket
+
+        Args:
+            client (str): Client identifier, e.g. the remote address
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until the
+                next token is available
+        """
+        if self.rate <= 0:
+            return 0
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if not wait:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            if wait:
+                self.stats['rate_limited'] += 1
+            return wait
+
+    def refund(self, client):
+        """
+        Give back a token taken by take_token for a request that was shed
+
+        Args:
+            client (str): Client identifier passed to take_token
+        """
+        if self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is not None:
+                tokens, updated = bucket
+                self._buckets[client] = (min(self.burst, tokens + 1), updated)
+
+    def acquire(self):
+        """
+        Take a write slot
+
+        Returns:
+            bool: True if a slot was taken and release must be called
+        """
+        if self._slots is not None:
+            acquired = (self._slots.acquire(timeout=self.acquire_timeout) if self.acquire_timeout > 0
+                        else self._slots.acquire(blocking=False))
+            if not acquired:
+                with self._lock:
+                    self.stats['shed'] += 1
+                return False
+        with self._lock:
+            self.in_flight += 1
+            self.stats['admitted'] += 1
+        return True
+
+    def release(self):
+        """Give back a write slot taken by acquire"""
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def snapshot(self):
+        """
+        Get the counters, writes in flight and tracked clients
+
+        Returns:
+            dict: Admission statistics
+        """
+        with self._lock:
+            return {
+                **self.stats,
+                'in_flight': self.in_flight,
+                'max_concurrent': self.max_concurrent,
+                'clients': len(self._buckets),
+            }
+
+
+def _reject(status, reason, retry_after, message):
+    """Render a fast rejection with Retry-After and count it"""
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.inc('admission_rejections_total', (('reason', reason),))
+    response = current_app.make_response((
+        render_template('error.html', error_title='Too Busy', error_message=message), status))
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def admission_controlled(view):
+    """
+    Decorator applying the app's admission controller to a write route
+
+    Does nothing when ADMISSION_CONTROL_ENABLED is off.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = current_app.extensions.get('admission')
+        if controller is None:
+            return view(*args, **kwargs)
+
+        # Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so
+        # remote_addr is the client rather than the proxy
+        client = request.remote_addr or 'unknown'
+        wait = controller.take_token(client)
+        if wait:
+            return _reject(429, 'rate_limited', wait,
+                           'You are sending messages too quickly. Please try again shortly.')
+
+        if not controller.acquire():
+            # A shed request does not use up the client's rate budget
+            controller.refund(client)
+            return _reject(503, 'shed', controller.retry_after,
+                           'The server is busy saving other messages. Please try again shortly.')
+        try:
+            return view(*args, **kwargs)
+        finally:
+            controller.release()
+    return wrapper
@@ -0,0 +1,124 @@
+"""
+JSON and export API for the Flask Contact Form Application
+
+/api/messages returns one page of messages as JSON, with the same cursor
+pagination and conditional GET support as the HTML listing.
+/api/messages/export streams every message as NDJSON or CSV, reading the
+storage in batches (a yield_per cursor or COPY on the database, ranged
+requests on Supabase, segment reads on file storage), so an export of any
+size is served with constant memory.
+"""
+
+import io
+from datetime import datetime
+
+from flask import Blueprint, current_app, request, stream_with_context, url_for
+
+from .routes import add_validators, is_not_modified, make_etag
+from .storage import record_to_dict
+from .transfer import BACKENDS, FORMATS, export_messages, write_records
+from .utils import get_messages_page, get_messages_version
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _get_supabase():
+    """Get the Supabase client, or None if SUPABASE_URL and SUPABASE_KEY are not set"""
+    url = current_app.config.get('SUPABASE_URL')
+    key = current_app.config.get('SUPABASE_KEY')
+    if not url or not key:
+        return None
+    from .database import get_db, init_db
+    return get_db() or init_db(url, key)
+
+
+def encode_records(records, fmt, batch_size):
+    """
+    Encode message records as NDJSON or CSV text, one chunk per batch
+
+    Args:
+        records: Iterable of message dicts
+        fmt (str): 'ndjson' or 'csv'
+        batch_size (int): Number of records per yielded chunk
+
+    Yields:
+        str: Encoded records; the first CSV chunk starts with the header row
+    """
+    buffer = io.StringIO()
+    for written in write_records(records, buffer, fmt):
+        if written % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@api.route('/messages')
+def list_messages():
+    """One page of messages as JSON, newest first"""
+    cursor = request.args.get('cursor') or None
+    per_page = request.args.get('per_page', type=int)
+
+    try:
+        version, last_modified = get_messages_version()
+        etag = make_etag('api', version, cursor, per_page)
+        cache_control = current_app.config.get('MESSAGES_CACHE_CONTROL', 'private, no-cache')
+        if is_not_modified(etag, last_modified):
+            return add_validators(current_app.response_class(status=304),
+                                  etag, last_modified, cache_control)
+
+        messages, next_cursor = get_messages_page(cursor=cursor, per_page=per_page,
+                                                  version=version, preview=False)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        print(f"Error reading messages: {e}")
+        return {'error': 'Error reading messages'}, 500
+
+    next_url = None
+    if next_cursor:
+        next_url = url_for('api.list_messages', cursor=next_cursor, per_page=per_page)
+
+    response = current_app.json.response({
+        'messages': [record_to_dict(msg) for msg in messages],
+        'next_cursor': next_cursor,
+        'next_url': next_url,
+    })
+    return add_validators(response, etag, last_modified, cache_control)
+
+
+@api.route('/messages/export')
+def export():
+    """Stream every message as NDJSON or CSV, oldest first"""
+    fmt = request.args.get('format', 'ndjson').lower()
+    backend = request.args.get('backend', 'storage').lower()
+    if fmt not in FORMATS:
+        return {'error': f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}"}, 400
+    if backend not in BACKENDS:
+        return {'error': f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}"}, 400
+
+    supabase = None
+    if backend == 'supabase':
+        supabase = _get_supabase()
+        if supabase is None:
+            return {'error': 'SUPABASE_URL and SUPABASE_KEY must be set for backend=supabase'}, 400
+
+    batch_size = current_app.config.get('MESSAGES_STREAM_BATCH_SIZE', 500)
+    records = export_messages(backend, batch_size=batch_size, supabase=supabase)
+
+    # A failure after the first chunk cannot change the status code; the
+    # exception aborts the chunked response, so clients see a truncated body
+    # instead of a silently incomplete export
+    body = stream_with_context(encode_records(records, fmt, batch_size))
+    filename = f"messages-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{fmt}"
+    return current_app.response_class(body, mimetype=EXPORT_MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        # Ask reverse proxies such as nginx to pass chunks through unbuffered
+        'X-Accel-Buffering': 'no',
+    })
@@ -0,0 +1,372 @@
+"""
+Read-through cache for the Flask Contact Form Application
+
+Messages only change when a form is submitted or a message is deleted, so
+repeated reads of the listing, the count and single messages can be served
+from memory. ReadCache is a size-bounded LRU map with per-namespace TTLs;
+CachedSupabaseDB wraps SupabaseDB with it, and the database backend in
+app/storage.py uses it directly. Writes made through either invalidate the
+affected entries.
+FragmentCache keeps the rendered HTML of single messages for the listings.
+
+The cache lives in one process: writes made by other processes or workers
+become visible once the cached entries expire.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Namespaces whose entries depend on the set of stored messages, so any
+# write invalidates them; single messages are invalidated by id
+LISTING_NAMESPACES = ('get_all_messages', 'get_messages_page', 'get_message_count', 'search_messages')
+
+# Default time to live in seconds per namespace; listings and counts must
+# pick up writes from other processes quickly, single messages rarely change
+DEFAULT_TTLS = {
+    'get_all_messages': 5,
+    'get_messages_page': 5,
+    'get_message_count': 5,
+    'search_messages': 30,
+    'get_message_by_id': 300,
+}
+
+
+class ReadCache:
+    """
+    Thread-safe LRU cache with per-namespace time to live
+
+    Entries are keyed by (namespace, key). When the cache holds max_entries
+    entries, storing another one evicts the least recently used entry.
+    """
+
+    def __init__(self, max_entries=1024, ttls=None, default_ttl=5, clock=time.monotonic):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_entries (int): Maximum number of cached entries
+            ttls (dict, optional): Seconds to live per namespace, merged
+                over DEFAULT_TTLS
+            default_ttl (float): Seconds to live for other namespaces
+            clock (callable): Monotonic time source in seconds
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, namespace, key):
+        """
+        Look up a cached value
+
+        Args:
+            namespace (str): The entry namespace, usually the method name
+            key: Hashable key within the namespace
+
+        Returns:
+            tuple: (True, value) on a hit, (False, None) on a miss
+        """
+        cache_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(cache_key)
+                    self.stats['hits'] += 1
+                    return True, value
+                del self._entries[cache_key]
+                self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return False, None
+
+    def set(self, namespace, key, value):
+        """
+        Store a value with the namespace's time to live
+
+        Args:
+            namespace (str): The entry namespace
+            key: Hashable key within the namespace
+            value: The value to cache
+        """
+        ttl = self.ttls.get(namespace, self.default_ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        cache_key = (namespace, key)
+        with self._lock:
+            self._entries[cache_key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_or_load(self, namespace, key, loader, cache_if=None):
+        """
+        Return a cached value, calling loader and caching its result on a miss
+
+        Args:
+            namespace (str): The entry namespace
+            key: Hashable key within the namespace
+            loader (callable): Loads the value on a miss
+            cache_if (callable, optional): Predicate on the loaded value;
+                values it rejects (e.g. "not found") are returned uncached
+
+        Returns:
+            The cached or loaded value
+        """
+        found, value = self.get(namespace, key)
+        if found:
+            return value
+        value = loader()
+        if cache_if is None or cache_if(value):
+            self.set(namespace, key, value)
+        return value
+
+    def invalidate(self, namespaces=None, keys=None):
+        """
+        Drop cached entries
+
+        Args:
+            namespaces (iterable, optional): Namespaces to drop entirely;
+                None drops every entry unless keys is given
+            keys (dict, optional): Maps a namespace to the keys to drop from it
+        """
+        with self._lock:
+            if namespaces is None and keys is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                namespaces = set(namespaces or ())
+                stale = [cache_key for cache_key in self._entries if cache_key[0] in namespaces]
+                for namespace, namespace_keys in (keys or {}).items():
+                    stale.extend((namespace, key) for key in namespace_keys
+                                 if (namespace, key) in self._entries)
+                for cache_key in stale:
+                    self._entries.pop(cache_key, None)
+                dropped = len(stale)
+            self.stats['invalidations'] += dropped
+
+    def snapshot(self):
+        """
+        Get the counters, the hit ratio and the number of cached entries
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            }
+
+
+class FragmentCache:
+    """
+    Thread-safe LRU cache of rendered HTML fragments, bounded by size
+
+    Keys include the version of the message (its updated_at), so an edited
+    message gets a new entry and the old fragment simply ages out; only
+    messages removed in bulk are dropped, see discard_ids. Sizes are
+    counted in characters.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_bytes (int): Maximum total size of the cached fragments
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        """
+        Look up a fragment
+
+        Args:
+            key: Hashable key, e.g. (id, updated_at)
+
+        Returns:
+            str: The fragment, or None on a miss
+        """
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return fragment
+
+    def set(self, key, fragment):
+        """
+        Store a fragment, evicting the least recently used ones if needed
+
+        Args:
+            key: Hashable key
+            fragment (str): The rendered HTML
+        """
+        size = len(fragment)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self._entries[key] = fragment
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.stats['evictions'] += 1
+
+    def discard_ids(self, min_id, max_id):
+        """
+        Drop the fragments of messages with ids in a range
+
+        Args:
+            min_id (int): Smallest message id to drop
+            max_id (int): Largest message id to drop
+        """
+        with self._lock:
+            for key in [key for key in self._entries if min_id <= key[0] <= max_id]:
+                self.bytes -= len(self._entries.pop(key))
+
+    def snapshot(self):
+        """
+        Get the counters, the hit ratio and the cache size
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedSupabaseDB:
+    """
+    SupabaseDB wrapper serving repeated reads from a ReadCache
+
+    Reads go through the cache; writes go to Supabase first and then drop
+    the cached entries they make stale. Other SupabaseDB methods (such as
+    iter_messages) are passed through uncached.
+    """
+
+    def __init__(self, db, cache=None):
+        """
+        Wrap a SupabaseDB instance
+
+        Args:
+            db (SupabaseDB): The wrapped client
+            cache (ReadCache, optional): Cache to use, a new one by default
+        """
+        self.db = db
+        self.cache = cache if cache is not None else ReadCache()
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def get_all_messages(self, limit=None):
+        """Cached SupabaseDB.get_all_messages"""
+        return self.cache.get_or_load('get_all_messages', limit,
+                                      lambda: self.db.get_all_messages(limit))
+
+    def get_messages_page(self, limit, before=None, version=None):
+        """
+        Cached SupabaseDB.get_messages_page
+
+        Args:
+            limit (int): Maximum number of messages to retrieve
+            before (tuple, optional): (created_at, id) key of the previous page
+            version (str, optional): Version the page is served under; it is
+                part of the cache key, so a page cached before a write is not
+                sent with the newer version's validators
+        """
+        key = (limit, tuple(before) if before is not None else None, version)
+        return self.cache.get_or_load('get_messages_page', key,
+                                      lambda: self.db.get_messages_page(limit, before))
+
+    def get_message_count(self, mode='exact'):
+        """Cached SupabaseDB.get_message_count"""
+        return self.cache.get_or_load('get_message_count', mode,
+                                      lambda: self.db.get_message_count(mode))
+
+    def search_messages(self, search_term, limit=50, offset=0, substring=False):
+        """Cached SupabaseDB.search_messages"""
+        return self.cache.get_or_load(
+            'search_messages', (search_term, limit, offset, substring),
+            lambda: self.db.search_messages(search_term, limit, offset, substring))
+
+    def get_message_by_id(self, message_id):
+        """Cached SupabaseDB.get_message_by_id; misses are not cached"""
+        return self.cache.get_or_load('get_message_by_id', message_id,
+                                      lambda: self.db.get_message_by_id(message_id),
+                                      cache_if=lambda message: message is not None)
+
+    def get_messages_by_ids(self, message_ids):
+        """
+        SupabaseDB.get_messages_by_ids that only fetches uncached messages
+
+        Args:
+            message_ids (list): The message IDs
+
+        Returns:
+            list: The found records in the order of message_ids
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        found = {}
+        missing = []
+        for message_id in message_ids:
+            hit, message = self.cache.get('get_message_by_id', message_id)
+            if hit:
+                found[message_id] = message
+            else:
+                missing.append(message_id)
+
+        if missing:
+            for message in self.db.get_messages_by_ids(missing):
+                self.cache.set('get_message_by_id', message['id'], message)
+                found[message['id']] = message
+        return [found[message_id] for message_id in message_ids if message_id in found]
+
+    def save_message(self, name, email, message):
+        """SupabaseDB.save_message, then drop cached listings and counts"""
+        saved = self.db.save_message(name, email, message)
+        self.cache.invalidate(LISTING_NAMESPACES)
+        return saved
+
+    def save_messages(self, messages):
+        """SupabaseDB.save_messages, then drop cached listings and counts"""
+        saved = self.db.save_messages(messages)
+        self.cache.invalidate(LISTING_NAMESPACES)
+        return saved
+
+    def delete_message(self, message_id):
+        """SupabaseDB.delete_message, then drop the message and cached listings"""
+        deleted = self.db.delete_message(message_id)
+        self.cache.invalidate(LISTING_NAMESPACES, keys={'get_message_by_id': [message_id]})
+        return deleted
+
+    def delete_messages(self, message_ids):
+        """SupabaseDB.delete_messages, then drop the messages and cached listings"""
+        deleted = self.db.delete_messages(message_ids)
+        self.cache.invalidate(LISTING_NAMESPACES, keys={'get_message_by_id': list(message_ids)})
+        return deleted
@@ -0,0 +1,251 @@
+"""
+Command line interface for the Flask Contact Form Application
+Registered on the app in create_app and available as `flask messages ...`
+"""
+
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .filestore import MessageStore, convert_legacy_file
+from .transfer import (BACKENDS, FORMATS, IMPORT_FORMATS, batched, export_messages,
+                       import_batch, read_records, write_records)
+
+# Command group for message maintenance tasks
+messages_cli = AppGroup('messages', help='Manage stored messages.')
+
+
+@messages_cli.command('convert-legacy')
+@click.option('--source', default=None,
+              help='Legacy messages file to read (defaults to MESSAGE_FILE).')
+@click.option('--target', default=None,
+              help='Segmented store directory to write (defaults to MESSAGE_STORE_DIR).')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of records appended per write.')
+def convert_legacy(source, target, batch_size):
+    """Convert a legacy messages.txt file into the segmented file store."""
+    source = source or current_app.config.get('MESSAGE_FILE', 'messages.txt')
+    target = target or current_app.config.get('MESSAGE_STORE_DIR', 'messages_store')
+
+    if not os.path.exists(source):
+        raise click.ClickException(f"Legacy messages file not found: {source}")
+
+    store = MessageStore(target, segment_max_bytes=current_app.config.get(
+        'MESSAGE_SEGMENT_MAX_BYTES', 16 * 1024 * 1024))
+    if store.count():
+        raise click.ClickException(
+            f"Target store {target} already holds {store.count()} messages; "
+            "refusing to convert into a non-empty store")
+
+    started = time.perf_counter()
+    converted = convert_legacy_file(source, store, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    click.echo(f"✅ Converted {converted} messages from {source} to {target}/ in {elapsed:.2f}s")
+
+
+@messages_cli.command('verify-schema')
+def verify_schema_command():
+    """Create missing tables and the search index (the check FAST_START skips)."""
+    if not current_app.config.get('USE_DATABASE', False):
+        raise click.ClickException("USE_DATABASE is off; file storage has no schema")
+
+    from .models import verify_schema
+    started = time.perf_counter()
+    has_index = verify_schema()
+    elapsed = time.perf_counter() - started
+    click.echo(f"✅ Database tables verified/created in {elapsed:.2f}s")
+    if has_index:
+        click.echo("✅ Full-text search index verified/created")
+
+
+def _echo_progress(action, count, started):
+    """Print the number of processed messages and the throughput to stderr"""
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0
+    click.echo(f"{action} {count:,} messages in {elapsed:.1f}s ({rate:,.0f} messages/s)", err=True)
+
+
+def _get_supabase():
+    """Create the Supabase client from SUPABASE_URL and SUPABASE_KEY"""
+    url = current_app.config.get('SUPABASE_URL')
+    key = current_app.config.get('SUPABASE_KEY')
+    if not url or not key:
+        raise click.ClickException("SUPABASE_URL and SUPABASE_KEY must be set for --backend supabase")
+    from .database import init_db
+    return init_db(url, key)
+
+
+def _guess_format(path):
+    """Pick the import format from a file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension == '.txt':
+        return 'legacy'
+    return 'ndjson'
+
+
+@messages_cli.command('export')
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False, allow_dash=True),
+              help='File to write (defaults to stdout).')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='ndjson', show_default=True,
+              help='Output format.')
+@click.option('--backend', type=click.Choice(BACKENDS), default='storage', show_default=True,
+              help="Read from the configured storage or from Supabase.")
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of messages fetched per round trip.')
+def export_command(output, fmt, backend, batch_size):
+    """Export all messages as NDJSON or CSV, oldest first."""
+    supabase = _get_supabase() if backend == 'supabase' else None
+
+    started = time.perf_counter()
+    written = 0
+    with click.open_file(output, 'w', encoding='utf-8') as stream:
+        records = export_messages(backend, batch_size=batch_size, supabase=supabase)
+        try:
+            for written in write_records(records, stream, fmt):
+                if written % batch_size == 0:
+                    _echo_progress('Exported', written, started)
+        except Exception as e:
+            raise click.ClickException(f"{e} (after exporting {written:,} messages)")
+    _echo_progress('✅ Exported', written, started)
+
+
+@messages_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='Input format (guessed from the file extension by default; '
+                   '.txt files are read as legacy messages.txt).')
+@click.option('--backend', type=click.Choice(BACKENDS), default='storage', show_default=True,
+              help="Write to the configured storage or to Supabase.")
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of messages saved per batch.')
+def import_command(path, fmt, backend, batch_size):
+    """Import messages from an NDJSON, CSV or legacy messages.txt file."""
+    fmt = fmt or _guess_format(path)
+    supabase = _get_supabase() if backend == 'supabase' else None
+
+    started = time.perf_counter()
+    imported = 0
+    for batch in batched(read_records(path, fmt), batch_size):
+        try:
+            import_batch(backend, batch, supabase=supabase)
+        except Exception as e:
+            raise click.ClickException(f"{e} (after importing {imported:,} messages)")
+        imported += len(batch)
+        _echo_progress('Imported', imported, started)
+    _echo_progress('✅ Imported', imported, started)
+
+
+def _require_database():
+    """Fail unless the app stores messages in a database"""
+    if not current_app.config.get('USE_DATABASE', False):
+        raise click.ClickException("USE_DATABASE is off; archiving needs database storage")
+
+
+@messages_cli.command('partitions')
+@click.option('--months-ahead', type=int, default=None,
+              help='Future months to create partitions for (defaults to MESSAGE_PARTITION_MONTHS_AHEAD).')
+def partitions_command(months_ahead):
+    """Create upcoming monthly partitions and list the existing ones."""
+    _require_database()
+    from .models import db
+    from .partitions import ensure_partitions, is_partitioned, list_partitions
+
+    if months_ahead is None:
+        months_ahead = current_app.config.get('MESSAGE_PARTITION_MONTHS_AHEAD', 3)
+    for name in ensure_partitions(months_ahead):
+        click.echo(f"✅ Created partition {name}")
+
+    with db.engine.connect() as connection:
+        if not is_partitioned(connection):
+            raise click.ClickException("messages is not partitioned (PostgreSQL only; run `flask db upgrade`)")
+        for name, start, end in list_partitions(connection):
+            click.echo(f"{name}: {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+
+
+@messages_cli.command('archive')
+@click.option('--older-than-days', type=int, default=None,
+              help='Retention window in days (defaults to MESSAGE_RETENTION_DAYS).')
+@click.option('--directory', default=None,
+              help='Archive directory (defaults to MESSAGE_ARCHIVE_DIR).')
+@click.option('--dry-run', is_flag=True, help='Only list the months that would be archived.')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of messages fetched per round trip.')
+def archive_command(older_than_days, directory, dry_run, batch_size):
+    """Move whole months older than the retention window into compressed archives."""
+    _require_database()
+    from .partitions import archive_messages, ensure_partitions
+
+    if older_than_days is None:
+        older_than_days = current_app.config.get('MESSAGE_RETENTION_DAYS', 365)
+    directory = directory or current_app.config.get('MESSAGE_ARCHIVE_DIR', 'messages_archive')
+
+    if not dry_run:
+        for name in ensure_partitions(current_app.config.get('MESSAGE_PARTITION_MONTHS_AHEAD', 3)):
+            click.echo(f"✅ Created partition {name}")
+
+    started = time.perf_counter()
+    archived = archive_messages(directory, older_than_days, dry_run=dry_run, batch_size=batch_size)
+    if dry_run:
+        for source, start, end in archived:
+            click.echo(f"Would archive {start:%Y-%m} from {source}")
+        if not archived:
+            click.echo("Nothing to archive")
+        return
+
+    for entry in archived:
+        click.echo(f"📦 Archived {entry['count']:,} messages from {entry['source']} "
+                   f"({entry['start'][:7]}) to {os.path.join(directory, entry['file'])}")
+    total = sum(entry['count'] for entry in archived)
+    _echo_progress('✅ Archived', total, started)
+
+
+@messages_cli.command('archived')
+@click.option('--directory', default=None,
+              help='Archive directory (defaults to MESSAGE_ARCHIVE_DIR).')
+@click.option('--since', type=click.DateTime(), default=None, help='Only messages created at or after this (UTC).')
+@click.option('--until', type=click.DateTime(), default=None, help='Only messages created before this (UTC).')
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False, allow_dash=True),
+              help='File to write (defaults to stdout).')
+def archived_command(directory, since, until, output):
+    """Export archived messages as NDJSON, reading only the archives in range."""
+    from .partitions import iter_archived_messages
+
+    directory = directory or current_app.config.get('MESSAGE_ARCHIVE_DIR', 'messages_archive')
+    started = time.perf_counter()
+    written = 0
+    with click.open_file(output, 'w', encoding='utf-8') as stream:
+        for written in write_records(iter_archived_messages(directory, since, until), stream, 'ndjson'):
+            pass
+    _echo_progress('✅ Exported', written, started)
+
+
+@messages_cli.command('replicas')
+def replicas_command():
+    """Check every read replica and compare its newest message with the primary."""
+    router = current_app.extensions.get('replica_router')
+    if router is None:
+        raise click.ClickException("No read replicas configured (set DATABASE_REPLICA_URLS and USE_DATABASE)")
+    from sqlalchemy import exc, func, select
+    from .models import Message, db
+
+    newest = select(func.max(Message.id))
+    primary_max = db.session.scalar(newest)
+    click.echo(f"primary: newest message id {primary_max}")
+    for name, result in router.check().items():
+        url = router.engines[name].url.render_as_string(hide_password=True)
+        if not result['ok']:
+            click.echo(f"❌ {name} ({url}): {result['error']}")
+            continue
+        try:
+            with router.engines[name].connect() as connection:
+                replica_max = connection.scalar(newest)
+        except exc.DBAPIError as e:
+            click.echo(f"❌ {name} ({url}): {e.orig if e.orig is not None else e}")
+            continue
+        lag = f", lag {result['lag_seconds']}s" if result['lag_seconds'] is not None else ''
+        behind = '' if replica_max == primary_max else f" (primary has {primary_max})"
+        click.echo(f"✅ {name} ({url}): newest message id {replica_max}{behind}{lag}")
@@ -2,10 +2,45 @@
 Supabase database operations for the Flask Contact Form Application
 """
 
-from supabase import create_client, Client
-from typing import Optional, Dict, List
+import asyncio
+from typing import TYPE_CHECKING, Optional, Dict, Iterable, Iterator, List, Sequence, Tuple
 from datetime import datetime
 
+# The supabase package pulls in auth, storage, realtime and HTTP clients;
+# it is imported when a client is created, not when this module is loaded
+if TYPE_CHECKING:
+    from supabase import Client
+    from supabase._async.client import AsyncClient
+
+# Rows sent per multi-row insert request
+INSERT_BATCH_SIZE = 500
+# Ids per in.(...) filter; they travel in the query string, which proxies
+# and PostgREST limit to a few kilobytes
+ID_BATCH_SIZE = 200
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Split a sequence into slices of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _message_rows(messages: Iterable[Dict]) -> List[Dict]:
+    """Build insert payload rows from message dicts"""
+    now = datetime.now().isoformat()
+    return [{
+        'name': msg['name'],
+        'email': msg['email'],
+        'message': msg['message'],
+        'created_at': msg.get('created_at') or now
+    } for msg in messages]
+
+
+def _in_order(rows: List[Dict], message_ids: Sequence[int]) -> List[Dict]:
+    """Order fetched rows like the requested ids, dropping missing ones"""
+    by_id = {row['id']: row for row in rows}
+    return [by_id[message_id] for message_id in message_ids if message_id in by_id]
+
 
 class SupabaseDB:
     """Wrapper class for Supabase database operations"""
@@ -18,8 +53,10 @@ class SupabaseDB:
             url (str): Supabase project URL
             key (str): Supabase API key (anon or service role)
         """
-        self.client: Client = create_client(url, key)
+        from supabase import create_client
+        self.client: 'Client' = create_client(url, key)
         self.table_name = 'messages'
+        self.counter_table_name = 'message_counters'
 
     def save_message(self, name: str, email: str, message: str) -> Optional[Dict]:
         """
@@ -48,6 +85,52 @@ class SupabaseDB:
             print(f"Error saving message to Supabase: {e}")
             return None
 
+    def save_messages(self, messages: List[Dict]) -> List[Dict]:
+        """
+        Save several messages with a single multi-row insert request
+
+        Args:
+            messages (List[Dict]): Dicts with name, email and message keys and
+                an optional created_at ISO timestamp
+
+        Returns:
+            List[Dict]: The inserted records, empty if the insert failed
+        """
+        if not messages:
+            return []
+
+        try:
+            data = _message_rows(messages)
+            response = self.client.table(self.table_name).insert(data).execute()
+            return response.data if response.data else []
+
+        except Exception as e:
+            print(f"Error saving messages to Supabase: {e}")
+            return []
+
+    def iter_messages(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Iterate over every message in id order, one ranged request per batch
+
+        Seeks on id rather than using offsets, so each request costs the same
+        however far into the table it is.
+
+        Args:
+            batch_size (int): Number of messages fetched per request
+
+        Yields:
+            Dict: Message records, oldest first
+        """
+        last_id = 0
+        while True:
+            response = (self.client.table(self.table_name).select('*')
+                        .gt('id', last_id).order('id').limit(batch_size).execute())
+            rows = response.data if response.data else []
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]['id']
+
     def get_all_messages(self, limit: Optional[int] = None) -> List[Dict]:
         """
         Retrieve all messages from the database
@@ -71,15 +154,75 @@ class SupabaseDB:
             print(f"Error retrieving messages from Supabase: {e}")
             return []
 
-    def get_message_count(self) -> int:
+    def get_messages_page(self, limit: int,
+                          before: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """
+        Retrieve one page of messages using keyset (cursor) pagination
+
+        Args:
+            limit (int): Maximum number of messages to retrieve
+            before (Optional[Tuple[str, int]]): (created_at, id) of the last
+                message on the previous page; None for the first page
+
+        Returns:
+            Tuple[List[Dict], Optional[Tuple[str, int]]]: The message records and
+            the (created_at, id) key for the next page, or None on the last page
+
+        Raises:
+            Exception: If the request fails; an empty page would look like the
+                end of the messages to callers walking every page
+        """
+        try:
+            query = (self.client.table(self.table_name).select('*')
+                     .order('created_at', desc=True)
+                     .order('id', desc=True))
+
+            if before is not None:
+                created_at, message_id = before
+                # Quote the timestamp: ISO offsets contain characters that
+                # PostgREST treats as syntax inside or=(...)
+                query = query.lte('created_at', created_at).or_(
+                    f'created_at.lt."{created_at}",id.lt.{int(message_id)}'
+                )
+
+            response = query.limit(limit + 1).execute()
+            rows = response.data if response.data else []
+
+            next_key = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_key = (rows[-1]['created_at'], rows[-1]['id'])
+            return rows, next_key
+
+        except Exception as e:
+            print(f"Error retrieving messages page from Supabase: {e}")
+            raise
+
+    def get_message_count(self, mode: str = 'exact') -> int:
         """
         Get the total count of messages in the database
 
+        Args:
+            mode (str): 'exact' counts every row (a full scan), 'counter' reads
+                the message_counters row kept in sync by the insert and delete
+                triggers from database_setup.sql, 'estimated' uses the planner
+                statistics
+
         Returns:
             int: The number of messages
         """
         try:
-            response = self.client.table(self.table_name).select('id', count='exact').execute()
+            if mode == 'counter':
+                response = (self.client.table(self.counter_table_name).select('value')
+                            .eq('name', self.table_name).execute())
+                if response.data:
+                    return response.data[0]['value']
+                # The counter has not been created yet; fall back to an exact count
+                mode = 'exact'
+
+            count = 'planned' if mode == 'estimated' else 'exact'
+            # limit(1) avoids transferring rows we only need the count for
+            response = self.client.table(self.table_name).select('id', count=count).limit(1).execute()
             return response.count if hasattr(response, 'count') else 0
 
         except Exception as e:
@@ -104,6 +247,28 @@ class SupabaseDB:
             print(f"Error retrieving message by ID from Supabase: {e}")
             return None
 
+    def get_messages_by_ids(self, message_ids: Sequence[int]) -> List[Dict]:
+        """
+        Retrieve several messages with one in.(...) request per ID_BATCH_SIZE ids
+
+        Args:
+            message_ids (Sequence[int]): The message IDs
+
+        Returns:
+            List[Dict]: The found records in the order of message_ids
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        rows = []
+        try:
+            for chunk in _chunks(message_ids, ID_BATCH_SIZE):
+                response = self.client.table(self.table_name).select('*').in_('id', chunk).execute()
+                rows.extend(response.data or [])
+            return _in_order(rows, message_ids)
+
+        except Exception as e:
+            print(f"Error retrieving messages by ID from Supabase: {e}")
+            return []
+
     def delete_message(self, message_id: int) -> bool:
         """
         Delete a message by ID
@@ -122,23 +287,314 @@ class SupabaseDB:
             print(f"Error deleting message from Supabase: {e}")
             return False
 
-    def search_messages(self, search_term: str) -> List[Dict]:
+    def delete_messages(self, message_ids: Sequence[int]) -> int:
+        """
+        Delete several messages with one in.(...) request per ID_BATCH_SIZE ids
+
+        Args:
+            message_ids (Sequence[int]): The message IDs to delete
+
+        Returns:
+            int: The number of deleted messages
+        """
+        deleted = 0
+        try:
+            for chunk in _chunks(list(dict.fromkeys(message_ids)), ID_BATCH_SIZE):
+                response = self.client.table(self.table_name).delete().in_('id', chunk).execute()
+                deleted += len(response.data or [])
+
+        except Exception as e:
+            print(f"Error deleting messages from Supabase: {e}")
+
+        return deleted
+
+    def search_messages(self, search_term: str, limit: int = 50, offset: int = 0,
+                        substring: bool = False) -> List[Dict]:
         """
-        Search messages by name, email, or message content
+        Search messages by name, email, or message content, best matches first
+
+        Calls the search_messages function from database_setup.sql, which
+        uses the tsvector GIN index (and trigram indexes for substring
+        matches) instead of scanning the table.
 
         Args:
             search_term (str): The term to search for
+            limit (int): Maximum number of messages to return
+            offset (int): Number of ranked results to skip
+            substring (bool): Also match the term anywhere inside name or email
 
         Returns:
             List[Dict]: List of matching message records
         """
         try:
-            response = self.client.table(self.table_name).select('*').or_(
-                f'name.ilike.%{search_term}%,'
-                f'email.ilike.%{search_term}%,'
-                f'message.ilike.%{search_term}%'
-            ).execute()
+            response = self.client.rpc('search_messages', {
+                'search_term': search_term,
+                'result_limit': limit,
+                'result_offset': offset,
+                'include_substring': substring
+            }).execute()
+
+            return response.data if response.data else []
 
+        except Exception as e:
+            print(f"Error searching messages in Supabase: {e}")
+            return []
+
+
+class AsyncSupabaseDB:
+    """
+    asyncio counterpart of SupabaseDB
+
+    Bulk methods split their input into multi-row inserts and in.(...)
+    filters and send those requests concurrently, at most max_concurrency at
+    a time, over the client's shared HTTP connection pool.
+
+    Create instances with ``await AsyncSupabaseDB.create(url, key)`` and close
+    them with ``await db.close()`` (or use ``async with``).
+    """
+
+    def __init__(self, client: 'AsyncClient', max_concurrency: int = 10):
+        """
+        Wrap an async Supabase client
+
+        Args:
+            client (AsyncClient): Client from supabase's async create_client
+            max_concurrency (int): Maximum number of requests in flight
+        """
+        self.client = client
+        self.table_name = 'messages'
+        self.counter_table_name = 'message_counters'
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    async def create(cls, url: str, key: str, max_concurrency: int = 10) -> 'AsyncSupabaseDB':
+        """
+        Create the async Supabase client
+
+        Args:
+            url (str): Supabase project URL (any PostgREST-compatible server
+                reachable at <url>/rest/v1 works, e.g. a local stand-in)
+            key (str): Supabase API key (anon or service role)
+            max_concurrency (int): Maximum number of requests in flight
+
+        Returns:
+            AsyncSupabaseDB: The initialized database wrapper
+        """
+        from supabase._async.client import create_client as create_async_client
+        client = await create_async_client(url, key)
+        return cls(client, max_concurrency=max_concurrency)
+
+    async def close(self) -> None:
+        """Close the HTTP connections of the client"""
+        await self.client.postgrest.aclose()
+
+    async def __aenter__(self) -> 'AsyncSupabaseDB':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _execute(self, query):
+        """Execute a request builder, waiting for a free concurrency slot"""
+        async with self._semaphore:
+            return await query.execute()
+
+    async def save_message(self, name: str, email: str, message: str) -> Optional[Dict]:
+        """
+        Save a message to the Supabase database
+
+        Args:
+            name (str): The sender's name
+            email (str): The sender's email address
+            message (str): The message content
+
+        Returns:
+            Optional[Dict]: The inserted record or None if failed
+        """
+        saved = await self.save_messages([{'name': name, 'email': email, 'message': message}])
+        return saved[0] if saved else None
+
+    async def save_messages(self, messages: Sequence[Dict],
+                            batch_size: int = INSERT_BATCH_SIZE) -> List[Dict]:
+        """
+        Save messages with concurrent multi-row insert requests
+
+        Each request is its own transaction, so when one fails the other
+        batches are still saved; the result then holds only their records.
+
+        Args:
+            messages (Sequence[Dict]): Dicts with name, email and message keys
+                and an optional created_at ISO timestamp
+            batch_size (int): Rows per insert request
+
+        Returns:
+            List[Dict]: The inserted records in input order
+        """
+        async def insert(chunk):
+            try:
+                response = await self._execute(self.client.table(self.table_name).insert(chunk))
+                return response.data or []
+            except Exception as e:
+                print(f"Error saving messages to Supabase: {e}")
+                return []
+
+        rows = _message_rows(messages)
+        results = await asyncio.gather(*(insert(chunk) for chunk in _chunks(rows, batch_size)))
+        return [record for records in results for record in records]
+
+    async def get_all_messages(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Retrieve all messages from the database
+
+        Args:
+            limit (Optional[int]): Maximum number of messages to retrieve
+
+        Returns:
+            List[Dict]: List of message records
+        """
+        try:
+            query = self.client.table(self.table_name).select('*').order('created_at', desc=True)
+            if limit:
+                query = query.limit(limit)
+            response = await self._execute(query)
+            return response.data if response.data else []
+
+        except Exception as e:
+            print(f"Error retrieving messages from Supabase: {e}")
+            return []
+
+    async def get_message_count(self, mode: str = 'exact') -> int:
+        """
+        Get the total count of messages in the database
+
+        Args:
+            mode (str): 'exact', 'counter' or 'estimated', see
+                SupabaseDB.get_message_count
+
+        Returns:
+            int: The number of messages
+        """
+        try:
+            if mode == 'counter':
+                response = await self._execute(
+                    self.client.table(self.counter_table_name).select('value').eq('name', self.table_name))
+                if response.data:
+                    return response.data[0]['value']
+                mode = 'exact'
+
+            count = 'planned' if mode == 'estimated' else 'exact'
+            response = await self._execute(
+                self.client.table(self.table_name).select('id', count=count).limit(1))
+            return response.count if hasattr(response, 'count') else 0
+
+        except Exception as e:
+            print(f"Error counting messages in Supabase: {e}")
+            return 0
+
+    async def get_message_by_id(self, message_id: int) -> Optional[Dict]:
+        """
+        Retrieve a specific message by ID
+
+        Args:
+            message_id (int): The message ID
+
+        Returns:
+            Optional[Dict]: The message record or None if not found
+        """
+        try:
+            response = await self._execute(
+                self.client.table(self.table_name).select('*').eq('id', message_id))
+            return response.data[0] if response.data else None
+
+        except Exception as e:
+            print(f"Error retrieving message by ID from Supabase: {e}")
+            return None
+
+    async def get_messages_by_ids(self, message_ids: Sequence[int],
+                                  batch_size: int = ID_BATCH_SIZE) -> List[Dict]:
+        """
+        Retrieve several messages with concurrent in.(...) requests
+
+        Args:
+            message_ids (Sequence[int]): The message IDs
+            batch_size (int): Ids per request
+
+        Returns:
+            List[Dict]: The found records in the order of message_ids
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+
+        async def fetch(chunk):
+            response = await self._execute(
+                self.client.table(self.table_name).select('*').in_('id', chunk))
+            return response.data or []
+
+        try:
+            results = await asyncio.gather(*(fetch(chunk) for chunk in _chunks(message_ids, batch_size)))
+            return _in_order([row for rows in results for row in rows], message_ids)
+
+        except Exception as e:
+            print(f"Error retrieving messages by ID from Supabase: {e}")
+            return []
+
+    async def delete_message(self, message_id: int) -> bool:
+        """
+        Delete a message by ID
+
+        Args:
+            message_id (int): The message ID to delete
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return await self.delete_messages([message_id]) == 1
+
+    async def delete_messages(self, message_ids: Sequence[int],
+                              batch_size: int = ID_BATCH_SIZE) -> int:
+        """
+        Delete several messages with concurrent in.(...) requests
+
+        Args:
+            message_ids (Sequence[int]): The message IDs to delete
+            batch_size (int): Ids per request
+
+        Returns:
+            int: The number of deleted messages
+        """
+        async def delete(chunk):
+            try:
+                response = await self._execute(
+                    self.client.table(self.table_name).delete().in_('id', chunk))
+                return len(response.data or [])
+            except Exception as e:
+                print(f"Error deleting messages from Supabase: {e}")
+                return 0
+
+        chunks = _chunks(list(dict.fromkeys(message_ids)), batch_size)
+        return sum(await asyncio.gather(*(delete(chunk) for chunk in chunks)))
+
+    async def search_messages(self, search_term: str, limit: int = 50, offset: int = 0,
+                              substring: bool = False) -> List[Dict]:
+        """
+        Search messages by name, email, or message content, best matches first
+
+        Args:
+            search_term (str): The term to search for
+            limit (int): Maximum number of messages to return
+            offset (int): Number of ranked results to skip
+            substring (bool): Also match the term anywhere inside name or email
+
+        Returns:
+            List[Dict]: List of matching message records
+        """
+        try:
+            response = await self._execute(self.client.rpc('search_messages', {
+                'search_term': search_term,
+                'result_limit': limit,
+                'result_offset': offset,
+                'include_substring': substring
+            }))
             return response.data if response.data else []
 
         except Exception as e:
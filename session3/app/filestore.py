@@ -0,0 +1,704 @@
+"""
+File-based storage engines for the Flask Contact Form Application
+
+Two on-disk formats are supported:
+
+* legacy: the original messages.txt, free-form records separated by a line
+  of '=' characters
+* segmented: JSON-lines records in rotating segment files, each with a
+  sidecar offset index, plus a small header holding the record count, so
+  counting is O(1) and reading a page is O(page) however large the store is
+
+Both are safe with several writer processes (e.g. gunicorn workers) on one
+host: every append is a single write() on an O_APPEND descriptor, made
+while holding an exclusive flock() advisory lock, so records from different
+processes never interleave and the segmented header is never updated from a
+stale copy. Within a process, concurrent appends are grouped into one write
+(and one fsync when durability is requested) by GroupCommitter.
+"""
+
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+# Separator written between records in the legacy messages.txt format
+FILE_SEPARATOR = '\n' + '=' * 50 + '\n'
+
+# Block size used when reading messages.txt
+FILE_READ_CHUNK_SIZE = 64 * 1024
+
+# Index entry for one record: byte offset and length within its segment
+INDEX_ENTRY = struct.Struct('<QI')
+
+HEADER_FILE = 'header.json'
+HEADER_VERSION = 1
+
+# Advisory lock file held by writers of a segmented store
+LOCK_FILE = '.lock'
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Write data to fd, retrying short writes (rare on regular files)"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _lock(fd: int) -> None:
+    """Take an exclusive advisory lock on fd; closing fd releases it"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def append_bytes(path: str, data: bytes, fsync: bool = False) -> int:
+    """
+    Append data to a file with a single O_APPEND write under an exclusive lock
+
+    The lock is taken on the file itself, so every process appending to the
+    same file through this function writes whole records, one after another.
+
+    Args:
+        path (str): Path to the file, created if missing
+        data (bytes): The bytes to append
+        fsync (bool): Flush the file to stable storage before returning
+
+    Returns:
+        int: The offset at which data was written
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        _lock(fd)
+        offset = os.fstat(fd).st_size
+        _write_all(fd, data)
+        if fsync:
+            os.fsync(fd)
+        return offset
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(path: str) -> None:
+    """Flush a directory entry change (e.g. a rename) to stable storage"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class GroupCommitter:
+    """
+    Group concurrent submissions from threads into one flush call
+
+    The first thread to submit while no flush is running becomes the
+    leader: it waits up to max_delay for more submissions, then flushes
+    everything pending in one call and wakes the others with their results.
+    Submissions arriving during a flush are taken by the next leader, so
+    under load every flush carries a batch even with max_delay = 0.
+    """
+
+    def __init__(self, flush: Callable[[List], List], max_delay: float = 0.0, max_batch: int = 1000):
+        """
+        Initialize the committer
+
+        Args:
+            flush (Callable): Called with a list of items; returns one result
+                per item, in order
+            max_delay (float): Seconds a leader waits to collect a batch
+            max_batch (int): Maximum number of items per flush
+        """
+        self._flush = flush
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flushing = False
+        self.stats = {'submitted': 0, 'flushes': 0}
+
+    def submit(self, item):
+        """
+        Submit one item and wait until the flush containing it is done
+
+        Args:
+            item: The item to flush
+
+        Returns:
+            The flush result for the item
+
+        Raises:
+            Exception: Whatever the flush of the item's batch raised
+        """
+        slot = {'item': item, 'done': False, 'result': None, 'error': None}
+        with self._cond:
+            self._pending.append(slot)
+            self.stats['submitted'] += 1
+            while self._flushing and not slot['done']:
+                self._cond.wait()
+            if not slot['done']:
+                self._flushing = True
+
+        while not slot['done']:
+            # Leader: flush batches until our own item is written
+            if self.max_delay > 0:
+                time.sleep(self.max_delay)
+            with self._cond:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            try:
+                results = self._flush([s['item'] for s in batch])
+            except Exception as e:
+                results, error = [None] * len(batch), e
+            else:
+                error = None
+            with self._cond:
+                for s, result in zip(batch, results):
+                    s['result'], s['error'], s['done'] = result, error, True
+                self.stats['flushes'] += 1
+                if slot['done']:
+                    self._flushing = False
+                self._cond.notify_all()
+
+        if slot['error'] is not None:
+            raise slot['error']
+        return slot['result']
+
+    def snapshot(self) -> Dict:
+        """
+        Get the submission and flush counters
+
+        Returns:
+            dict: Counters plus the average batch size
+        """
+        with self._cond:
+            flushes = self.stats['flushes']
+            return {
+                **self.stats,
+                'average_batch': round(self.stats['submitted'] / flushes, 2) if flushes else 0,
+            }
+
+
+def parse_file_record(record: str) -> Dict:
+    """
+    Parse one record of the legacy file format into a message dictionary
+
+    Args:
+        record (str): Record text without the separator line
+
+    Returns:
+        Dict: Message data with name, email, message and created_at keys
+    """
+    fields = {'created_at': None, 'name': None, 'email': None, 'message': None}
+    labels = {'Timestamp': 'created_at', 'Name': 'name', 'Email': 'email', 'Message': 'message'}
+    current = None
+    for line in record.split('\n'):
+        label, sep, value = line.partition(': ')
+        if sep and label in labels and fields[labels[label]] is None:
+            current = labels[label]
+            fields[current] = value
+        elif current == 'message':
+            # Messages may span several lines
+            fields['message'] += '\n' + line
+    if fields['message'] is not None:
+        fields['message'] = fields['message'].rstrip('\n')
+    return fields
+
+
+def read_file_page(path: str, limit: int, before: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Read one page of messages from the end of a legacy messages file
+
+    The file is read backwards in blocks from the cursor position, so only
+    the bytes of the requested page are read, however large the file is.
+
+    Args:
+        path (str): Path to the messages file
+        limit (int): Maximum number of messages to return
+        before (Optional[int]): Byte offset where the previous page started;
+            None to start from the newest message
+
+    Returns:
+        Tuple[List[Dict], Optional[int]]: Message dicts newest first and the
+        byte offset key for the next page, or None if this is the last page
+    """
+    separator = FILE_SEPARATOR.encode('utf-8')
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell() if before is None else min(before, f.tell())
+        start = end
+        buffer = b''
+        # Keep reading backwards until the buffer holds one separator more
+        # than needed, which proves that an older page exists
+        while start > 0 and buffer.count(separator) <= limit:
+            step = min(FILE_READ_CHUNK_SIZE, start)
+            start -= step
+            f.seek(start)
+            buffer = f.read(step) + buffer
+
+    offsets = []
+    index = buffer.find(separator)
+    while index != -1:
+        offsets.append(index)
+        index = buffer.find(separator, index + len(separator))
+
+    has_more = len(offsets) > limit
+    offsets = offsets[-limit:] if limit else []
+    bounds = offsets + [len(buffer)]
+
+    messages = []
+    for record_start, record_end in zip(bounds, bounds[1:]):
+        record = buffer[record_start + len(separator):record_end].decode('utf-8', errors='replace')
+        messages.append(parse_file_record(record))
+    messages.reverse()
+
+    next_key = start + offsets[0] if has_more and offsets else None
+    return messages, next_key
+
+
+def iter_file_records(path: str) -> Iterator[Dict]:
+    """
+    Iterate over a legacy messages file from oldest to newest record
+
+    Args:
+        path (str): Path to the messages file
+
+    Yields:
+        Dict: Message data for each record
+    """
+    buffer = ''
+    seen_separator = False
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(FILE_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            parts = buffer.split(FILE_SEPARATOR)
+            # The last part may be an incomplete record; keep it for later
+            buffer = parts.pop()
+            for part in parts:
+                # Text before the first separator is not a record
+                if seen_separator:
+                    yield parse_file_record(part)
+                seen_separator = True
+    if seen_separator:
+        yield parse_file_record(buffer)
+
+
+def count_file_records(path: str) -> int:
+    """
+    Count the records of a legacy messages file without loading it
+
+    Args:
+        path (str): Path to the messages file
+
+    Returns:
+        int: The number of separator lines, 0 if the file does not exist
+    """
+    separator = FILE_SEPARATOR.encode('utf-8')
+    count = 0
+    tail = b''
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(FILE_READ_CHUNK_SIZE)
+                if not chunk:
+                    return count
+                buffer = tail + chunk
+                start = 0
+                index = buffer.find(separator)
+                while index != -1:
+                    count += 1
+                    start = index + len(separator)
+                    index = buffer.find(separator, start)
+                # Keep enough bytes to find a separator split across chunks,
+                # but none that belong to one already counted
+                tail = buffer[max(start, len(buffer) - len(separator) + 1):]
+    except FileNotFoundError:
+        return 0
+
+
+def format_file_record(name: str, email: str, message: str, timestamp: Optional[str]) -> str:
+    """
+    Format a message as a record of the legacy messages.txt format
+
+    Args:
+        name (str): The sender's name
+        email (str): The sender's email address
+        message (str): The message content
+        timestamp (Optional[str]): The timestamp
+
+    Returns:
+        str: The record text, starting with its separator line
+    """
+    return (f"{FILE_SEPARATOR}"
+            f"Timestamp: {timestamp}\n"
+            f"Name: {name}\n"
+            f"Email: {email}\n"
+            f"Message: {message}\n")
+
+
+class LegacyFileWriter:
+    """
+    Appender for the legacy messages.txt format
+
+    Each batch of records goes to the file with append_bytes, so records
+    from concurrent threads and processes never interleave.
+    """
+
+    def __init__(self, path: str, fsync: bool = False, group_commit_delay: float = 0.0):
+        """
+        Initialize the writer
+
+        Args:
+            path (str): Path to the messages file
+            fsync (bool): Flush every write to stable storage before returning
+            group_commit_delay (float): Seconds to collect concurrent appends
+                into one write
+        """
+        self.path = path
+        self.fsync = fsync
+        self.committer = GroupCommitter(self._write_batch, max_delay=group_commit_delay)
+
+    def append(self, record: str) -> None:
+        """
+        Append one formatted record, grouped with concurrent appends
+
+        Args:
+            record (str): Record text including its separator line
+        """
+        self.committer.submit(record.encode('utf-8'))
+
+    def append_many(self, records: Iterable[str]) -> None:
+        """
+        Append several formatted records with one write
+
+        Args:
+            records (Iterable[str]): Record texts including their separator lines
+        """
+        self._write_batch([record.encode('utf-8') for record in records])
+
+    def _write_batch(self, items: List[bytes]) -> List[None]:
+        append_bytes(self.path, b''.join(items), fsync=self.fsync)
+        return [None] * len(items)
+
+
+class MessageStore:
+    """
+    Append-only, segmented JSON-lines message store
+
+    Layout of the store directory:
+
+    * header.json: record count and the list of segments with the number of
+      their first record, replaced atomically after every append
+    * segment-NNNNNN.jsonl: one JSON record per line
+    * segment-NNNNNN.idx: fixed-size (offset, length) entries, one per record
+
+    * .lock: empty file locked by writers while they append
+
+    Records are numbered from 0 in insertion order and get id = number + 1.
+    A new segment is started once the current one exceeds segment_max_bytes.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 16 * 1024 * 1024,
+                 fsync: bool = False, group_commit_delay: float = 0.0):
+        """
+        Initialize the store; nothing is read or created until first use
+
+        Args:
+            directory (str): Directory holding the header and segment files
+            segment_max_bytes (int): Size after which a new segment is started
+            fsync (bool): Flush segments, indexes and the header to stable
+                storage before an append returns
+            group_commit_delay (float): Seconds to collect concurrent single
+                appends into one write
+        """
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.committer = GroupCommitter(self.append_many, max_delay=group_commit_delay)
+
+    def exists(self) -> bool:
+        """
+        Check whether the store has been created on disk
+
+        Returns:
+            bool: True if the header file exists
+        """
+        return os.path.exists(self._header_path())
+
+    def count(self) -> int:
+        """
+        Get the number of stored records from the header
+
+        Returns:
+            int: The number of records
+        """
+        return self._load_header()['count']
+
+    def version(self) -> Tuple[int, int]:
+        """
+        Get a cheap version of the stored data from the header
+
+        Every write replaces the header, so its record count and
+        modification time change whenever the stored messages do.
+
+        Returns:
+            tuple: (record count, header modification time in nanoseconds);
+                (0, 0) if the store does not exist yet
+        """
+        try:
+            with open(self._header_path(), 'r', encoding='utf-8') as f:
+                # Stat the open file so the count and mtime describe the same header
+                modified_ns = os.fstat(f.fileno()).st_mtime_ns
+                return json.load(f)['count'], modified_ns
+        except FileNotFoundError:
+            return 0, 0
+
+    def append(self, name: str, email: str, message: str, created_at: Optional[str] = None) -> Dict:
+        """
+        Append a single message, grouped with concurrent appends
+
+        Args:
+            name (str): The sender's name
+            email (str): The sender's email address
+            message (str): The message content
+            created_at (Optional[str]): The message timestamp
+
+        Returns:
+            Dict: The stored record including its id
+        """
+        return self.committer.submit({
+            'name': name,
+            'email': email,
+            'message': message,
+            'created_at': created_at,
+        })
+
+    def append_many(self, messages: Iterable[Dict]) -> List[Dict]:
+        """
+        Append several messages with one write per touched segment
+
+        The header is read and replaced while holding the store's lock file,
+        so appends from other processes are never lost or renumbered.
+
+        Args:
+            messages (Iterable[Dict]): Dicts with name, email, message and
+                created_at keys
+
+        Returns:
+            List[Dict]: The stored records including their ids
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                _lock(lock_fd)
+                return self._append_locked(messages)
+            finally:
+                os.close(lock_fd)
+
+    def _append_locked(self, messages: Iterable[Dict]) -> List[Dict]:
+        header = self._load_header()
+        stored = []
+        pending = []
+
+        for msg in messages:
+            segment = self._writable_segment(header)
+            record = {
+                'id': header['count'] + 1,
+                'name': msg.get('name'),
+                'email': msg.get('email'),
+                'message': msg.get('message'),
+                'created_at': msg.get('created_at'),
+            }
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            pending.append((segment, line))
+            segment['bytes'] += len(line)
+            segment['count'] += 1
+            header['count'] += 1
+            stored.append(record)
+
+        self._flush(pending)
+        if stored:
+            self._write_header(header)
+        return stored
+
+    def read_range(self, start: int, stop: int) -> List[Dict]:
+        """
+        Read records numbered start (inclusive) to stop (exclusive)
+
+        Args:
+            start (int): Number of the first record
+            stop (int): Number one past the last record
+
+        Returns:
+            List[Dict]: The records in insertion order
+        """
+        header = self._load_header()
+        stop = min(stop, header['count'])
+        start = max(start, 0)
+        segments = header['segments']
+        firsts = [segment['first'] for segment in segments]
+
+        records = []
+        position = start
+        while position < stop:
+            segment = segments[bisect.bisect_right(firsts, position) - 1]
+            segment_stop = min(stop, segment['first'] + segment['count'])
+            records.extend(self._read_segment(segment, position - segment['first'],
+                                              segment_stop - segment['first']))
+            position = segment_stop
+        return records
+
+    def read_page(self, limit: int, before: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Read one page of records, newest first
+
+        Args:
+            limit (int): Maximum number of records to return
+            before (Optional[int]): Number of the oldest record on the
+                previous page; None to start from the newest record
+
+        Returns:
+            Tuple[List[Dict], Optional[int]]: The records and the key for the
+            next page, or None if this is the last page
+        """
+        count = self.count()
+        stop = count if before is None else min(before, count)
+        start = max(stop - limit, 0)
+        records = self.read_range(start, stop)
+        records.reverse()
+        return records, start if start > 0 else None
+
+    def _header_path(self) -> str:
+        return os.path.join(self.directory, HEADER_FILE)
+
+    def _segment_paths(self, segment: Dict) -> Tuple[str, str]:
+        base = os.path.join(self.directory, segment['name'])
+        return base + '.jsonl', base + '.idx'
+
+    def _load_header(self) -> Dict:
+        try:
+            with open(self._header_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': HEADER_VERSION, 'count': 0, 'segments': []}
+
+    def _write_header(self, header: Dict) -> None:
+        # Write to a temporary file and rename it so readers never see a
+        # partially written header
+        tmp_path = self._header_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(header, f)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._header_path())
+        if self.fsync:
+            _fsync_directory(self.directory)
+
+    def _writable_segment(self, header: Dict) -> Dict:
+        segments = header['segments']
+        if not segments or segments[-1]['bytes'] >= self.segment_max_bytes:
+            segments.append({
+                'name': f'segment-{len(segments) + 1:06d}',
+                'first': header['count'],
+                'count': 0,
+                'bytes': 0,
+            })
+        return segments[-1]
+
+    def _flush(self, pending: List[Tuple[Dict, bytes]]) -> None:
+        # Group lines by segment so each segment gets one data write and one
+        # index write
+        groups = []
+        for segment, line in pending:
+            if not groups or groups[-1][0] is not segment:
+                groups.append((segment, []))
+            groups[-1][1].append(line)
+
+        for segment, lines in groups:
+            data_path, index_path = self._segment_paths(segment)
+            first_new = segment['count'] - len(lines)
+            fd = os.open(data_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                # Start from the real end of the file, which may be past the
+                # recorded size if an earlier write was interrupted
+                offset = os.fstat(fd).st_size
+                _write_all(fd, b''.join(lines))
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            entries = []
+            for line in lines:
+                entries.append(INDEX_ENTRY.pack(offset, len(line)))
+                offset += len(line)
+            segment['bytes'] = offset
+
+            fd = os.open(index_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.pwrite(fd, b''.join(entries), first_new * INDEX_ENTRY.size)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _read_segment(self, segment: Dict, start: int, stop: int) -> List[Dict]:
+        if start >= stop:
+            return []
+        data_path, index_path = self._segment_paths(segment)
+        with open(index_path, 'rb') as f:
+            f.seek(start * INDEX_ENTRY.size)
+            raw = f.read((stop - start) * INDEX_ENTRY.size)
+        entries = [INDEX_ENTRY.unpack_from(raw, i) for i in range(0, len(raw), INDEX_ENTRY.size)]
+        if not entries:
+            return []
+
+        # Records of a page are contiguous, so read them with a single call
+        first_offset = entries[0][0]
+        last_offset, last_length = entries[-1]
+        with open(data_path, 'rb') as f:
+            f.seek(first_offset)
+            data = f.read(last_offset + last_length - first_offset)
+
+        return [json.loads(data[offset - first_offset:offset - first_offset + length])
+                for offset, length in entries]
+
+
+def convert_legacy_file(path: str, store: MessageStore, batch_size: int = 1000) -> int:
+    """
+    Copy every record of a legacy messages file into a segmented store
+
+    Args:
+        path (str): Path to the legacy messages file
+        store (MessageStore): The target store
+        batch_size (int): Number of records appended per write
+
+    Returns:
+        int: The number of converted records
+    """
+    converted = 0
+    batch = []
+    for record in iter_file_records(path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            converted += len(store.append_many(batch))
+            batch = []
+    if batch:
+        converted += len(store.append_many(batch))
+    return converted
@@ -0,0 +1,213 @@
+"""
+Health reporting for the Flask Contact Form Application
+
+/livez and /readyz answer load balancer probes cheaply; the detailed /health
+statistics (message count, storage checks, pool and cache figures) are
+collected by a background thread every HEALTH_SNAPSHOT_INTERVAL seconds and
+served from memory, so frequent probes do not turn into database load.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from .utils import get_message_count, get_storage
+
+
+def collect_health():
+    """
+    Collect the detailed health statistics
+
+    Runs the message count and storage checks, so call it from the
+    snapshot thread rather than per request. Needs an application context.
+
+    Returns:
+        dict: Health data as served by /health
+    """
+    storage = get_storage()
+
+    health_data = {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        # UTC collection time, sent as Last-Modified by /health
+        'collected_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'total_messages': get_message_count(),
+        'storage_type': storage.storage_type,
+    }
+
+    fragment_cache = current_app.extensions.get('fragment_cache')
+    if fragment_cache is not None:
+        health_data['fragment_cache'] = fragment_cache.snapshot()
+
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind is not None:
+        health_data['write_behind'] = write_behind.snapshot()
+
+    admission = current_app.extensions.get('admission')
+    if admission is not None:
+        health_data['admission'] = admission.snapshot()
+
+    startup = current_app.extensions.get('startup')
+    if startup is not None:
+        health_data['startup_ms'] = startup['startup_ms']
+
+    router = current_app.extensions.get('replica_router')
+    if router is not None:
+        health_data['replicas'] = router.snapshot()
+
+    worker_stats = current_app.extensions.get('worker_stats')
+    if worker_stats is not None:
+        health_data['worker'] = worker_stats.snapshot()
+
+    # File format and existence, or database type, pool and cache figures
+    health_data.update(storage.describe())
+
+    return health_data
+
+
+class HealthSnapshot:
+    """
+    Health data refreshed by a background thread and read from memory
+
+    The first read collects the data in the request; after that a daemon
+    thread refreshes it every interval seconds. If a refresh fails, the
+    previous data is kept and marked with the error.
+    """
+
+    def __init__(self, app, interval=10.0):
+        """
+        Initialize the snapshot; the refresh thread starts on first use
+
+        Args:
+            app (Flask): The application, used for the thread's app context
+            interval (float): Seconds between refreshes
+        """
+        self.app = app
+        self.interval = interval
+        self._data = None
+        self._collected_at = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Get the latest health data
+
+        Returns:
+            dict: Health data plus the age of the snapshot in seconds
+        """
+        if self.interval <= 0:
+            # Snapshots disabled: collect on every request
+            return collect_health()
+
+        self._ensure_started()
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._refresh()
+
+        data = dict(self._data)
+        data['snapshot_age_seconds'] = round(time.monotonic() - self._collected_at, 3)
+        return data
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='health-snapshot', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._refresh()
+
+    def _refresh(self):
+        try:
+            with self.app.app_context():
+                data = collect_health()
+        except Exception as e:
+            print(f"Error refreshing health snapshot: {e}")
+            if self._data is None:
+                data = {'status': 'unhealthy', 'error': str(e)}
+            else:
+                data = dict(self._data, status='degraded', error=str(e))
+                # Keep the age of the last successful collection
+                self._data = data
+                return
+        self._data = data
+        self._collected_at = time.monotonic()
+
+
+# A single worker thread per process runs readiness queries, so a hung
+# database cannot pile up one blocked thread per probe
+_readiness_executor = None
+_readiness_pid = None
+_readiness_lock = threading.Lock()
+
+
+def _get_readiness_executor():
+    """Get this process's readiness executor; threads do not survive fork()"""
+    global _readiness_executor, _readiness_pid
+    with _readiness_lock:
+        if _readiness_pid != os.getpid():
+            _readiness_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='readiness')
+            _readiness_pid = os.getpid()
+        return _readiness_executor
+
+
+def _check_storage(app):
+    """Run the storage backend's check"""
+    with app.app_context():
+        return get_storage().check()
+
+
+def check_readiness(timeout=1.0):
+    """
+    Check whether this process can serve requests
+
+    Remote storage (the database, Supabase) is queried on a pooled
+    connection and given up on after timeout seconds; file storage checks
+    that the storage directory is writable. A full write-behind queue also
+    makes the process not ready. Needs an application context.
+
+    Args:
+        timeout (float): Seconds to wait for remote storage
+
+    Returns:
+        tuple: (bool ready, dict of individual check results)
+    """
+    checks = {}
+    storage = get_storage()
+
+    if storage.remote:
+        started = time.perf_counter()
+        future = _get_readiness_executor().submit(_check_storage, current_app._get_current_object())
+        try:
+            checks[storage.name] = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Drop the check if it is still queued behind a hung one
+            future.cancel()
+            checks[storage.name] = f'timeout after {timeout}s'
+        except Exception as e:
+            checks[storage.name] = f'error: {e}'
+        checks[f'{storage.name}_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    else:
+        checks['storage'] = storage.check()
+
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind is not None:
+        pending = write_behind.pending()
+        checks['write_behind'] = 'ok' if pending < write_behind.max_size else 'queue full'
+
+    ready = all(value == 'ok' for key, value in checks.items() if not key.endswith('_ms'))
+    return ready, checks
@@ -0,0 +1,245 @@
+"""
+Request and storage metrics for the Flask Contact Form Application
+
+Counts requests per route, records latency histograms, tracks in-flight
+requests and times the storage helpers in app/utils.py. Everything is kept
+in memory per process and rendered in the Prometheus text format on
+/metrics. Recording a sample is a lock, a dict update and a bisect, so the
+per-request overhead is a few microseconds.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+
+# Latency histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Metric names and help texts, in exposition order
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route, method and status'),
+    'http_request_errors_total': ('counter', 'HTTP responses with status 400 or higher by route and status'),
+    'http_request_duration_seconds': ('histogram', 'Time from request start until the response was returned'),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled by route'),
+    'storage_operation_duration_seconds': ('histogram', 'Time spent in storage helpers by operation and backend'),
+    'storage_operation_errors_total': ('counter', 'Storage helper calls that raised or reported failure'),
+    'admission_rejections_total': ('counter', 'Submissions rejected by admission control by reason'),
+}
+
+
+def _escape_label_value(value):
+    """Escape backslashes, quotes and newlines in a label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    """Render a label tuple as {name="value",...}"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    """Render a sample value the way Prometheus expects"""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-memory counters, gauges and histograms
+
+    Samples are keyed by metric name and a tuple of (label, value) pairs.
+    Histograms keep one count per bucket plus a sum and a total count.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize an empty registry
+
+        Args:
+            buckets (tuple): Histogram bucket upper bounds in seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}
+        self._histograms = {}
+
+    def inc(self, name, labels=(), amount=1):
+        """
+        Add to a counter or gauge
+
+        Args:
+            name (str): Metric name
+            labels (tuple): (label, value) pairs
+            amount (float): Amount to add (negative for gauges)
+        """
+        key = (name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        """
+        Record one histogram sample
+
+        Args:
+            name (str): Metric name
+            labels (tuple): (label, value) pairs
+            value (float): The observed value in seconds
+        """
+        key = (name, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # One slot per bucket plus +Inf, then the sum
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: The exposition text
+        """
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: list(counts) for key, counts in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind != 'histogram':
+                for (sample_name, labels), value in sorted(values.items()):
+                    if sample_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            for (sample_name, labels), counts in sorted(histograms.items()):
+                if sample_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    bucket_labels = labels + (('le', _format_value(float(bound))),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(counts[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def get_metrics():
+    """
+    Get the metrics registry of the current app
+
+    Returns:
+        MetricsRegistry: The registry, or None if METRICS_ENABLED is off
+    """
+    return current_app.extensions.get('metrics')
+
+
+def _route_label():
+    # The endpoint name keeps the label set bounded; unmatched URLs share one label
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    metrics = get_metrics()
+    if metrics is None:
+        return
+    g._metrics_started = time.perf_counter()
+    g._metrics_route = _route_label()
+    metrics.inc('http_requests_in_flight', (('route', g._metrics_route),))
+
+
+def _record_response(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _finish_request(error=None):
+    metrics = get_metrics()
+    started = g.pop('_metrics_started', None)
+    if metrics is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    route = g.pop('_metrics_route')
+    status = g.pop('_metrics_status', 500 if error is not None else 200)
+    method = request.method
+
+    metrics.inc('http_requests_in_flight', (('route', route),), -1)
+    metrics.inc('http_requests_total', (('method', method), ('route', route), ('status', str(status))))
+    metrics.observe('http_request_duration_seconds', (('method', method), ('route', route)), elapsed)
+    if status >= 400:
+        metrics.inc('http_request_errors_total', (('route', route), ('status', str(status))))
+
+
+def _storage_backend():
+    """Name the storage backend for metric labels"""
+    storage = current_app.extensions.get('storage')
+    return storage.name if storage is not None else 'none'
+
+
+def timed_operation(operation):
+    """
+    Decorator recording the duration of a storage helper
+
+    Calls that raise, or return False for failure, are also counted in
+    storage_operation_errors_total. Does nothing outside an app context or
+    when metrics are disabled.
+
+    Args:
+        operation (str): The operation label, e.g. 'save_message'
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics() if has_app_context() else None
+            if metrics is None:
+                return func(*args, **kwargs)
+
+            labels = (('backend', _storage_backend()), ('operation', operation))
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                metrics.inc('storage_operation_errors_total', labels)
+                raise
+            finally:
+                metrics.observe('storage_operation_duration_seconds', labels,
+                                time.perf_counter() - started)
+            if result is False:
+                metrics.inc('storage_operation_errors_total', labels)
+            return result
+        return wrapper
+    return decorator
+
+
+def metrics_view():
+    """Expose the metrics in the Prometheus text format"""
+    return current_app.extensions['metrics'].render(), 200, {'Content-Type': PROMETHEUS_CONTENT_TYPE}
+
+
+def init_metrics(app):
+    """
+    Register the request hooks and the /metrics route on the app
+
+    Args:
+        app (Flask): The application
+    """
+    app.extensions['metrics'] = MetricsRegistry(app.config.get('METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS))
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics_view)
@@ -3,12 +3,216 @@ Database models for the Flask Contact Form Application
 Using SQLAlchemy ORM for database operations
 """
 
+import threading
+import weakref
 from datetime import datetime
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
 
+from .search import SEARCH_CONFIG, build_fts5_query, create_search_index, has_search_index
+
 # Initialize SQLAlchemy instance
 db = SQLAlchemy()
 
+# Supported ways of counting messages, see Message.count_all
+COUNT_MODES = ('exact', 'counter', 'estimated')
+
+# Planner row estimate of a table. Autovacuum never analyzes a partitioned
+# parent, so for one the estimates of its partitions are summed; partitions
+# not analyzed yet (-1) count as empty, and -1 is returned if none has been
+ESTIMATED_COUNT_QUERY = db.text("""
+    SELECT CASE WHEN c.relkind = 'p' THEN (
+        SELECT CASE WHEN max(p.reltuples) < 0 THEN -1 ELSE sum(greatest(p.reltuples, 0)) END
+        FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+        WHERE i.inhparent = c.oid
+    ) ELSE c.reltuples END::bigint
+    FROM pg_class c WHERE c.oid = to_regclass(:table)
+""")
+
+# Counter triggers installed per engine, looked up once (see counter_triggers)
+_counter_triggers = weakref.WeakKeyDictionary()
+_counter_triggers_lock = threading.Lock()
+
+
+def read_session(operation):
+    """
+    Run a read-only query function on a replica if any are configured
+
+    Args:
+        operation (callable): Takes a Session and returns the query result
+
+    Returns:
+        The result, from a replica or, without healthy replicas or while the
+        client's own write may not have replicated yet, from db.session
+    """
+    router = current_app.extensions.get('replica_router') if has_app_context() else None
+    if router is None:
+        return operation(db.session)
+    return router.run(operation, primary=db.session)
+
+
+def counter_triggers(bind, table='messages'):
+    """
+    Get the counting triggers installed on a table, looked up once per engine
+
+    database_setup.sql adds the <table>_count_insert and <table>_count_delete
+    triggers that keep message_counters current. When a database set up
+    with it is also used through the models, the writes they count must not
+    be counted again by MessageCounter.adjust.
+
+    Args:
+        bind: Engine or Connection of the database
+        table (str): The counted table
+
+    Returns:
+        frozenset: Names of the installed counting triggers
+    """
+    engine = getattr(bind, 'engine', bind)
+    with _counter_triggers_lock:
+        cached = _counter_triggers.get(engine, {}).get(table)
+    if cached is not None:
+        return cached
+
+    if engine.dialect.name == 'postgresql':
+        query = db.text(
+            "SELECT tgname FROM pg_trigger "
+            "WHERE tgrelid = to_regclass(:table) AND NOT tgisinternal AND tgname IN (:insert, :delete)"
+        )
+    elif engine.dialect.name == 'sqlite':
+        query = db.text(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND tbl_name = :table AND name IN (:insert, :delete)"
+        )
+    else:
+        query = None
+
+    installed = frozenset()
+    if query is not None:
+        params = {'table': table, 'insert': f'{table}_count_insert', 'delete': f'{table}_count_delete'}
+        if bind is engine:
+            with engine.connect() as connection:
+                installed = frozenset(connection.execute(query, params).scalars())
+        else:
+            # Look up on the caller's connection, inside its transaction
+            installed = frozenset(bind.execute(query, params).scalars())
+
+    with _counter_triggers_lock:
+        _counter_triggers.setdefault(engine, {})[table] = installed
+    return installed
+
+
+def counted_by_trigger(bind, table, delta):
+    """
+    Check whether a database trigger already counts an insert or delete
+
+    Args:
+        bind: Engine or Connection of the database
+        table (str): The counted table
+        delta (int): Positive for inserts, negative for deletes
+
+    Returns:
+        bool: True if the counter must not be adjusted by hand
+    """
+    event = 'insert' if delta > 0 else 'delete'
+    return f'{table}_count_{event}' in counter_triggers(bind, table)
+
+
+def verify_schema():
+    """
+    Create missing tables and the full-text search index
+
+    Meant for development and for an explicit deploy or readiness step;
+    production schemas are managed with migrations.
+
+    Returns:
+        bool: True if the search index exists afterwards
+    """
+    db.create_all()
+    MessageCounter.seed(Message.__tablename__)
+    return create_search_index(db.engine)
+
+
+class MessageCounter(db.Model):
+    """
+    Maintained row count, so counting does not need a full table scan
+
+    Attributes:
+        name: Name of the counted table, primary key
+        value: Current number of rows
+    """
+
+    __tablename__ = 'message_counters'
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        """String representation of MessageCounter object"""
+        return f'<MessageCounter {self.name}: {self.value}>'
+
+    @classmethod
+    def adjust(cls, name, delta):
+        """
+        Add delta to a counter as part of the current transaction
+
+        The counter row is created by the migrations and by verify_schema;
+        while it is missing the update does nothing, and seed() counts the
+        committed rows instead. Does nothing either when the counting
+        triggers of database_setup.sql already count the write.
+
+        Args:
+            name (str): The counter name, which is also the counted table
+            delta (int): Amount to add (negative to subtract)
+        """
+        if counted_by_trigger(db.session.get_bind(), name, delta):
+            return
+        db.session.execute(
+            db.update(cls).where(cls.name == name).values(value=cls.value + delta)
+        )
+
+    @classmethod
+    def seed(cls, name):
+        """
+        Create a counter with an exact count of its table, if it is missing
+
+        On PostgreSQL the counted table is locked against writes while it is
+        counted, so a write whose adjust() found no row is either counted
+        here or sees the new row. Concurrent seeds wait for each other and
+        the later one finds the row already there.
+
+        Args:
+            name (str): The counter name, which is also the counted table
+        """
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(db.text(f"LOCK TABLE {name} IN SHARE ROW EXCLUSIVE MODE"))
+        # SQLite needs the WHERE to parse ON CONFLICT after a SELECT
+        db.session.execute(
+            db.text(
+                f"INSERT INTO {cls.__tablename__} (name, value) "
+                f"SELECT :name, count(*) FROM {name} WHERE true "
+                "ON CONFLICT (name) DO NOTHING"
+            ),
+            {'name': name}
+        )
+        db.session.commit()
+
+    @classmethod
+    def get_value(cls, name):
+        """
+        Get the value of a counter, seeding it if it is missing
+
+        Args:
+            name (str): The counter name
+
+        Returns:
+            int: The counter value
+        """
+        counter = db.session.get(cls, name)
+        if counter is None:
+            cls.seed(name)
+            counter = db.session.get(cls, name)
+        return counter.value
+
 
 class Message(db.Model):
     """
@@ -21,16 +225,22 @@ class Message(db.Model):
         message: Message content (required)
         created_at: Timestamp when message was created
         updated_at: Timestamp when message was last updated
+
+    get_all, get_listing, get_version, get_by_id, count_all and search run
+    through read_session, so they may be answered by a read replica.
     """
 
     __tablename__ = 'messages'
 
+    # On PostgreSQL the table is partitioned by created_at (see app/partitions.py)
+    # and its primary key is (id, created_at); id alone still identifies a message
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False, index=True)
     email = db.Column(db.String(255), nullable=False, index=True)
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           index=True)
 
     def __repr__(self):
         """String representation of Message object"""
@@ -71,9 +281,42 @@ class Message(db.Model):
             message=message
         )
         db.session.add(new_message)
+        MessageCounter.adjust(cls.__tablename__, 1)
         db.session.commit()
         return new_message
 
+    @classmethod
+    def create_many(cls, messages):
+        """
+        Create several messages with one bulk insert and a single commit
+
+        Args:
+            messages (list): Dicts with name, email and message keys and
+                optional created_at and updated_at datetimes (updated_at
+                defaults to created_at)
+
+        Returns:
+            int: The number of created messages
+        """
+        now = datetime.utcnow()
+        rows = []
+        for msg in messages:
+            created_at = msg.get('created_at') or now
+            rows.append({
+                'name': msg['name'],
+                'email': msg['email'],
+                'message': msg['message'],
+                'created_at': created_at,
+                'updated_at': msg.get('updated_at') or created_at
+            })
+        if not rows:
+            return 0
+
+        db.session.execute(db.insert(cls), rows)
+        MessageCounter.adjust(cls.__tablename__, len(rows))
+        db.session.commit()
+        return len(rows)
+
     @classmethod
     def get_all(cls, limit=None):
         """
@@ -85,10 +328,142 @@ class Message(db.Model):
         Returns:
             list: List of Message objects
         """
-        query = cls.query.order_by(cls.created_at.desc())
+        query = db.select(cls).order_by(cls.created_at.desc())
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return read_session(lambda session: session.scalars(query).all())
+
+    @classmethod
+    def _before(cls, before):
+        """
+        Build the keyset condition selecting rows older than a page key
+
+        Args:
+            before (tuple): (created_at, id) of the last row of the previous page
+
+        Returns:
+            The SQL condition
+        """
+        created_at, message_id = before
+        # The created_at bound lets the database range-scan the
+        # created_at index; the OR breaks ties between equal timestamps
+        return db.and_(
+            cls.created_at <= created_at,
+            db.or_(cls.created_at < created_at, cls.id < message_id)
+        )
+
+    @classmethod
+    def listing_columns(cls, preview_length=None):
+        """
+        Get the columns selected by the listing queries
+
+        Args:
+            preview_length (int, optional): Cut the message text to this
+                many characters, marked with an ellipsis; None keeps it whole
+
+        Returns:
+            tuple: id, name, email, message, created_at and updated_at column
+                expressions
+        """
+        message = cls.message
+        if preview_length:
+            # Cut in the database so long messages are never transferred
+            message = db.case(
+                (db.func.length(cls.message) > preview_length,
+                 db.func.substr(cls.message, 1, preview_length, type_=db.Text) + '…'),
+                else_=cls.message
+            ).label('message')
+        return cls.id, cls.name, cls.email, message, cls.created_at, cls.updated_at
+
+    @classmethod
+    def get_listing(cls, limit=None, before=None, preview_length=None):
+        """
+        Get messages for display as plain rows, newest first
+
+        Selects only the displayed columns and returns Row tuples instead
+        of Message objects, so no instances are built or tracked in the
+        session's identity map. Rows are immutable and can be cached.
+
+        Args:
+            limit (int, optional): Maximum number of rows to return
+            before (tuple, optional): (created_at, id) key to continue after
+            preview_length (int, optional): Cut the message text to this
+                many characters
+
+        Returns:
+            list: Rows of (id, name, email, message, created_at, updated_at)
+        """
+        query = db.select(*cls.listing_columns(preview_length)).order_by(
+            cls.created_at.desc(), cls.id.desc())
+        if before is not None:
+            query = query.where(cls._before(before))
+        if limit:
+            query = query.limit(limit)
+        return read_session(lambda session: session.execute(query).all())
+
+    @classmethod
+    def get_listing_page(cls, limit, before=None, preview_length=None):
+        """
+        Get one page of get_listing rows using keyset pagination
+
+        Args:
+            limit (int): Maximum number of rows to return
+            before (tuple, optional): (created_at, id) of the last row on the
+                previous page; None for the first page
+            preview_length (int, optional): Cut the message text to this
+                many characters
+
+        Returns:
+            tuple: (list of rows, (created_at, id) key for the next page or
+                None if this is the last page)
+        """
+        # Fetch one extra row to find out whether another page exists
+        rows = cls.get_listing(limit + 1, before=before, preview_length=preview_length)
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1].created_at, rows[-1].id)
+        return rows, next_key
+
+    @classmethod
+    def iter_listing(cls, batch_size=500, preview_length=None, oldest_first=False):
+        """
+        Iterate over get_listing rows, newest first, fetching them in batches
+
+        Args:
+            batch_size (int): Number of rows fetched per round trip
+            preview_length (int, optional): Cut the message text to this
+                many characters
+            oldest_first (bool): Iterate in insertion (id) order instead
+
+        Yields:
+            Row: (id, name, email, message, created_at, updated_at)
+        """
+        query = db.select(*cls.listing_columns(preview_length))
+        if oldest_first:
+            query = query.order_by(cls.id)
+        else:
+            query = query.order_by(cls.created_at.desc(), cls.id.desc())
+        yield from db.session.execute(query.execution_options(yield_per=batch_size))
+
+    @classmethod
+    def get_version(cls):
+        """
+        Get the newest id, created_at and updated_at in one round trip
+
+        Each maximum is its own subquery so it is answered from the end of
+        an index instead of scanning the table.
+
+        Returns:
+            tuple: (max id, max created_at, max updated_at); all None when
+                the table is empty
+        """
+        query = db.select(
+            db.select(db.func.max(cls.id)).scalar_subquery(),
+            db.select(db.func.max(cls.created_at)).scalar_subquery(),
+            db.select(db.func.max(cls.updated_at)).scalar_subquery()
+        )
+        return tuple(read_session(lambda session: session.execute(query).one()))
 
     @classmethod
     def get_by_id(cls, message_id):
@@ -101,37 +476,115 @@ class Message(db.Model):
         Returns:
             Message: The message object or None if not found
         """
-        return cls.query.get(message_id)
+        return read_session(lambda session: session.get(cls, message_id))
 
     @classmethod
-    def count_all(cls):
+    def count_all(cls, mode='exact'):
         """
         Get total count of messages
 
+        Args:
+            mode (str): How to count:
+                'exact' runs SELECT count(*), a full scan;
+                'counter' reads the counter row maintained by create/delete;
+                'estimated' reads the planner statistics on PostgreSQL (summed
+                over the partitions of a partitioned table; may lag behind
+                recent writes) and falls back to the counter elsewhere or
+                before the table has been analyzed
+
         Returns:
             int: Total number of messages
         """
-        return cls.query.count()
+        if mode not in COUNT_MODES:
+            raise ValueError(f"Unknown count mode: {mode!r}")
+
+        def count(session):
+            if mode == 'estimated' and session.get_bind().dialect.name == 'postgresql':
+                estimate = session.execute(ESTIMATED_COUNT_QUERY, {'table': cls.__tablename__}).scalar()
+                # reltuples is -1 until the table has been vacuumed or analyzed
+                if estimate is not None and estimate >= 0:
+                    return estimate
+
+            if mode in ('counter', 'estimated'):
+                counter = session.get(MessageCounter, cls.__tablename__)
+                return counter.value if counter is not None else None
+
+            return session.scalar(db.select(db.func.count()).select_from(cls))
+
+        value = read_session(count)
+        if value is None:
+            # Seeding writes the counter row, so it always happens on the primary
+            value = MessageCounter.get_value(cls.__tablename__)
+        return value
 
     @classmethod
-    def search(cls, search_term):
+    def search(cls, search_term, limit=50, offset=0, substring=False):
         """
         Search messages by name, email, or message content
 
+        Uses the full-text index when it exists (PostgreSQL tsvector or
+        SQLite FTS5, see app/search.py) and ranks the best matches first;
+        otherwise falls back to ILIKE matching, newest first.
+
         Args:
             search_term (str): The term to search for
+            limit (int): Maximum number of messages to return
+            offset (int): Number of ranked results to skip
+            substring (bool): Also match the term anywhere inside name or
+                email (served by trigram indexes on PostgreSQL)
 
         Returns:
             list: List of matching Message objects
         """
-        search_pattern = f'%{search_term}%'
-        return cls.query.filter(
-            db.or_(
-                cls.name.ilike(search_pattern),
-                cls.email.ilike(search_pattern),
-                cls.message.ilike(search_pattern)
-            )
-        ).order_by(cls.created_at.desc()).all()
+        def search_on(session):
+            engine = session.get_bind()
+            if not has_search_index(engine):
+                search_pattern = f'%{search_term}%'
+                return session.scalars(db.select(cls).where(
+                    db.or_(
+                        cls.name.ilike(search_pattern),
+                        cls.email.ilike(search_pattern),
+                        cls.message.ilike(search_pattern)
+                    )
+                ).order_by(cls.created_at.desc(), cls.id.desc()).limit(limit).offset(offset)).all()
+
+            columns = ', '.join(f'messages.{column.name}' for column in cls.__table__.columns)
+            params = {'term': search_term, 'limit': limit, 'offset': offset}
+            substring_filter = ''
+            if substring:
+                params['pattern'] = f'%{search_term}%'
+                substring_filter = ' OR messages.name ILIKE :pattern OR messages.email ILIKE :pattern'
+
+            if engine.dialect.name == 'postgresql':
+                statement = f"""
+                    SELECT {columns}
+                    FROM messages, websearch_to_tsquery('{SEARCH_CONFIG}', :term) AS query
+                    WHERE messages.search_vector @@ query{substring_filter}
+                    ORDER BY ts_rank(messages.search_vector, query) DESC, messages.id DESC
+                    LIMIT :limit OFFSET :offset
+                """
+            else:
+                params['term'] = build_fts5_query(search_term)
+                if not params['term']:
+                    return []
+                # bm25() is lower for better matches; substring-only matches
+                # have no FTS row and sort after them
+                join = 'LEFT JOIN' if substring else 'JOIN'
+                statement = f"""
+                    SELECT {columns}
+                    FROM messages {join} (
+                        SELECT rowid, bm25(messages_fts) AS rank
+                        FROM messages_fts WHERE messages_fts MATCH :term
+                    ) AS hits ON hits.rowid = messages.id
+                    WHERE hits.rowid IS NOT NULL{substring_filter.replace('ILIKE', 'LIKE')}
+                    ORDER BY coalesce(hits.rank, 0), messages.id DESC
+                    LIMIT :limit OFFSET :offset
+                """
+
+            return session.scalars(db.select(cls).from_statement(
+                db.text(statement).bindparams(**params))).all()
+
+        return read_session(search_on)
 
     def update(self, **kwargs):
         """
@@ -149,4 +602,5 @@ class Message(db.Model):
     def delete(self):
         """Delete this message"""
         db.session.delete(self)
+        MessageCounter.adjust(self.__tablename__, -1)
         db.session.commit()
@@ -0,0 +1,432 @@
+"""
+Time-based partitioning and cold archival for the messages table
+
+On PostgreSQL the partitioning migration turns messages into a table
+range-partitioned by month of created_at (messages_pYYYYMM, plus a
+messages_default catch-all), so recent listings and index lookups only
+touch the newest partitions. ensure_partitions creates the partitions for
+the coming months.
+
+archive_messages moves whole months older than a retention window into
+gzip-compressed NDJSON files in an archive directory: on PostgreSQL an old
+partition is exported and dropped, elsewhere (SQLite, an unpartitioned
+table, rows in the default partition) the month's rows are exported and
+deleted. index.json in the archive directory records the time range, id
+range, row count and checksum of every archive file, so
+iter_archived_messages only opens the files covering the requested range.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from flask import current_app
+
+from .cache import LISTING_NAMESPACES
+from .models import Message, MessageCounter, counted_by_trigger, db
+from .transfer import write_records
+
+PARTITION_PREFIX = 'messages_p'
+DEFAULT_PARTITION = 'messages_default'
+ARCHIVE_INDEX_FILE = 'index.json'
+ARCHIVE_INDEX_VERSION = 1
+
+# Bounds of a range partition as printed by pg_get_expr
+PARTITION_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_start(value):
+    """
+    Get the first instant of the month containing a timestamp
+
+    Args:
+        value (datetime): The timestamp
+
+    Returns:
+        datetime: Midnight on the first day of its month
+    """
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """
+    Move the first day of a month by a number of months
+
+    Args:
+        value (datetime): First day of a month
+        months (int): Months to add
+
+    Returns:
+        datetime: First day of the resulting month
+    """
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _naive_utc(value):
+    """Drop the time zone of an aware timestamp after converting it to UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_partitioned(connection):
+    """
+    Check whether messages is a partitioned PostgreSQL table
+
+    Args:
+        connection: SQLAlchemy connection
+
+    Returns:
+        bool: True if the table is range-partitioned
+    """
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('messages'))"
+    )).scalar()
+
+
+def list_partitions(connection):
+    """
+    List the range partitions of messages, oldest first
+
+    Args:
+        connection: SQLAlchemy connection
+
+    Returns:
+        list: (name, start, end) tuples with naive UTC bounds; the default
+            partition is not included
+    """
+    rows = connection.execute(sa.text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass('messages')"
+    )).all()
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND.search(bound)
+        if match:
+            start, end = (_naive_utc(datetime.fromisoformat(value)) for value in match.groups())
+            partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(connection, start):
+    """
+    Create the partition for the month starting at start
+
+    Rows for that month that already landed in the default partition are
+    moved into the new partition, since PostgreSQL refuses to create a
+    partition whose range overlaps rows in the default partition.
+
+    Args:
+        connection: SQLAlchemy connection inside a transaction
+        start (datetime): First day of the month
+
+    Returns:
+        str: Name of the new partition
+    """
+    name = f'{PARTITION_PREFIX}{start:%Y%m}'
+    lower, upper = start.isoformat(), add_months(start, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    in_range = {'start': start, 'end': add_months(start, 1)}
+    stray = connection.execute(sa.text(
+        f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"
+    ), in_range).scalar() if sa.inspect(connection).has_table(DEFAULT_PARTITION) else 0
+
+    if not stray:
+        connection.execute(sa.text(f"CREATE TABLE {name} PARTITION OF messages {bounds}"))
+        return name
+
+    columns = ', '.join(column.name for column in Message.__table__.columns)
+    connection.execute(sa.text(f"CREATE TABLE {name} (LIKE messages INCLUDING DEFAULTS INCLUDING GENERATED)"))
+    connection.execute(sa.text(
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} "
+        "WHERE created_at >= :start AND created_at < :end"
+    ), in_range)
+    connection.execute(sa.text(
+        f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"
+    ), in_range)
+    connection.execute(sa.text(f"ALTER TABLE messages ATTACH PARTITION {name} {bounds}"))
+    return name
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """
+    Create missing partitions from the current month to months_ahead ahead
+
+    Does nothing unless messages is a partitioned PostgreSQL table. Needs
+    an application context.
+
+    Args:
+        months_ahead (int): Number of future months to cover
+        now (datetime, optional): Current UTC time, for testing
+
+    Returns:
+        list: Names of the partitions created
+    """
+    created = []
+    with db.engine.begin() as connection:
+        if not is_partitioned(connection):
+            return created
+        existing = {start for _, start, _ in list_partitions(connection)}
+        month = month_start(now or datetime.utcnow())
+        for _ in range(months_ahead + 1):
+            if month not in existing:
+                created.append(create_partition(connection, month))
+            month = add_months(month, 1)
+    return created
+
+
+def _archive_units(connection, cutoff):
+    """
+    Find the whole months older than cutoff that hold messages
+
+    Returns:
+        list: (source table, start, end, drop) tuples; drop is True for a
+            partition that is dropped once archived
+    """
+    units = []
+    source = 'messages'
+    if is_partitioned(connection):
+        units.extend((name, start, end, True)
+                     for name, start, end in list_partitions(connection) if end <= cutoff)
+        source = DEFAULT_PARTITION
+        if not sa.inspect(connection).has_table(source):
+            return units
+
+    # Step from one non-empty month to the next instead of visiting every
+    # month since the oldest message
+    table = sa.table(source, sa.column('created_at', sa.DateTime))
+    limit = month_start(cutoff)
+    after = None
+    while True:
+        query = sa.select(sa.func.min(table.c.created_at)).where(table.c.created_at < limit)
+        if after is not None:
+            query = query.where(table.c.created_at >= after)
+        oldest = connection.execute(query).scalar()
+        if oldest is None:
+            break
+        start = month_start(_naive_utc(oldest))
+        after = add_months(start, 1)
+        units.append((source, start, after, False))
+    return sorted(units, key=lambda unit: unit[1])
+
+
+def load_archive_index(directory):
+    """
+    Read the archive index
+
+    Args:
+        directory (str): The archive directory
+
+    Returns:
+        dict: The index, with an 'archives' list of archive file entries
+    """
+    try:
+        with open(os.path.join(directory, ARCHIVE_INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': ARCHIVE_INDEX_VERSION, 'archives': []}
+
+
+def _write_archive_index(directory, index):
+    # Write to a temporary file and rename it so readers never see a
+    # partially written index
+    path = os.path.join(directory, ARCHIVE_INDEX_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _as_record(row):
+    record = row._asdict()
+    for field in ('created_at', 'updated_at'):
+        if isinstance(record[field], datetime):
+            record[field] = record[field].isoformat()
+    return record
+
+
+def _write_archive_file(directory, start, rows):
+    """Write rows to a new compressed archive file and describe it"""
+    base = os.path.join(directory, f'messages-{start:%Y-%m}')
+    path = base + '.ndjson.gz'
+    suffix = 1
+    # A month can be archived more than once (late imports in the default partition)
+    while os.path.exists(path):
+        path = f'{base}.{suffix}.ndjson.gz'
+        suffix += 1
+
+    stats = {'min_id': None, 'max_id': None}
+
+    def records():
+        for row in rows:
+            stats['min_id'] = row.id if stats['min_id'] is None else min(stats['min_id'], row.id)
+            stats['max_id'] = row.id if stats['max_id'] is None else max(stats['max_id'], row.id)
+            yield _as_record(row)
+
+    count = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.open(raw, 'wt', encoding='utf-8') as stream:
+            for count in write_records(records(), stream, 'ndjson'):
+                pass
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return path, dict(stats, count=count, file=os.path.basename(path),
+                      bytes=os.path.getsize(path), sha256=digest.hexdigest())
+
+
+def _archive_unit(directory, source, start, end, drop, batch_size):
+    """Export one month to an archive file and remove it from the database"""
+    columns = [sa.column(column.name, column.type) for column in Message.__table__.columns]
+    table = sa.table(source, *columns)
+    in_range = sa.and_(table.c.created_at >= start, table.c.created_at < end)
+
+    with db.engine.connect() as connection, connection.begin():
+        if drop:
+            # Block writes to the partition while it is exported and dropped
+            connection.execute(sa.text(f"LOCK TABLE {source} IN EXCLUSIVE MODE"))
+
+        # Only rows up to the current newest id are exported and deleted, so
+        # a message imported into this month meanwhile is left for next time
+        max_id = connection.execute(sa.select(sa.func.max(table.c.id)).where(in_range)).scalar()
+        if max_id is None:
+            if drop:
+                connection.execute(sa.text(f"DROP TABLE {source}"))
+            return None
+        selected = sa.and_(in_range, table.c.id <= max_id)
+
+        rows = connection.execute(
+            sa.select(table).where(selected).order_by(table.c.created_at, table.c.id)
+            .execution_options(yield_per=batch_size))
+        path, written = _write_archive_file(directory, start, rows)
+        entry = {
+            'file': written['file'],
+            'source': source,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'count': written['count'],
+            'min_id': written['min_id'],
+            'max_id': written['max_id'],
+            'bytes': written['bytes'],
+            'sha256': written['sha256'],
+            'archived_at': datetime.utcnow().isoformat(timespec='seconds'),
+        }
+
+        index = load_archive_index(directory)
+        try:
+            if drop:
+                remaining = connection.execute(sa.select(sa.func.count()).select_from(table)).scalar()
+                if remaining != entry['count']:
+                    raise RuntimeError(f"{source} holds {remaining} rows, archived {entry['count']}")
+                connection.execute(sa.text(f"DROP TABLE {source}"))
+            else:
+                deleted = connection.execute(sa.delete(table).where(selected)).rowcount
+                if deleted != entry['count']:
+                    raise RuntimeError(f"Deleted {deleted} rows from {source}, archived {entry['count']}")
+            # Dropping a partition fires no delete trigger
+            if drop or not counted_by_trigger(connection, Message.__tablename__, -entry['count']):
+                connection.execute(
+                    sa.update(MessageCounter.__table__)
+                    .where(MessageCounter.__table__.c.name == Message.__tablename__)
+                    .values(value=MessageCounter.__table__.c.value - entry['count'])
+                )
+
+            # Index the file before committing: if the commit fails the rows
+            # are both archived and stored, never in neither place
+            index['archives'].append(entry)
+            _write_archive_index(directory, index)
+        except Exception:
+            os.remove(path)
+            raise
+
+    return entry
+
+
+def _invalidate_caches(entry):
+    """Drop this process's cached listings and fragments of archived messages"""
+    read_cache = current_app.extensions.get('read_cache')
+    if read_cache is not None:
+        read_cache.invalidate(LISTING_NAMESPACES)
+    fragment_cache = current_app.extensions.get('fragment_cache')
+    if fragment_cache is not None:
+        fragment_cache.discard_ids(entry['min_id'], entry['max_id'])
+
+
+def archive_messages(directory, retention_days, now=None, dry_run=False, batch_size=1000):
+    """
+    Move whole months older than the retention window into archive files
+
+    Each month is archived in its own transaction, after which the app's
+    read and fragment caches drop what it removed (other processes' caches
+    expire on their own). Run one archive job at a time per archive
+    directory. Needs an application context.
+
+    Args:
+        directory (str): The archive directory, created if missing
+        retention_days (int): Days of messages to keep in the database
+        now (datetime, optional): Current UTC time, for testing
+        dry_run (bool): Only list the months that would be archived
+        batch_size (int): Number of rows fetched per round trip
+
+    Returns:
+        list: Index entries of the written archives, or (source, start, end)
+            tuples of the months that would be archived when dry_run is set
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    with db.engine.connect() as connection:
+        units = _archive_units(connection, cutoff)
+
+    if dry_run:
+        return [(source, start, end) for source, start, end, _ in units]
+
+    os.makedirs(directory, exist_ok=True)
+    archived = []
+    for source, start, end, drop in units:
+        entry = _archive_unit(directory, source, start, end, drop, batch_size)
+        if entry is not None:
+            _invalidate_caches(entry)
+            archived.append(entry)
+    return archived
+
+
+def iter_archived_messages(directory, since=None, until=None):
+    """
+    Read archived messages, using the index to skip unrelated files
+
+    Args:
+        directory (str): The archive directory
+        since (datetime, optional): Only messages created at or after this
+        until (datetime, optional): Only messages created before this
+
+    Yields:
+        dict: Message records in archive order (oldest first per file)
+    """
+    for entry in load_archive_index(directory)['archives']:
+        if since is not None and datetime.fromisoformat(entry['end']) <= since:
+            continue
+        if until is not None and datetime.fromisoformat(entry['start']) >= until:
+            continue
+        with gzip.open(os.path.join(directory, entry['file']), 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                created_at = _naive_utc(datetime.fromisoformat(record['created_at']))
+                if since is not None and created_at < since:
+                    continue
+                if until is not None and created_at >= until:
+                    continue
+                yield record
@@ -0,0 +1,178 @@
+"""
+Database connection pool configuration and instrumentation
+for the Flask Contact Form Application
+
+Builds SQLAlchemy engine options from the DB_POOL_* settings in config.py
+and provides a QueuePool that records how long checkouts wait, so the pool
+can be sized from data instead of guesses.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Thread-safe counters for connection checkouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, wait):
+        """
+        Record one checkout attempt
+
+        Args:
+            wait (float): Seconds spent getting the connection
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def record_timeout(self):
+        """Record a checkout that gave up after DB_POOL_TIMEOUT"""
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        """
+        Get a consistent copy of the counters
+
+        Returns:
+            dict: The counters and the average wait in milliseconds
+        """
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_ms_total': round(self.wait_seconds_total * 1000, 3),
+                'wait_ms_max': round(self.wait_seconds_max * 1000, 3),
+                'wait_ms_avg': round(self.wait_seconds_total * 1000 / self.checkouts, 3)
+                if self.checkouts else 0.0,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that times every checkout
+
+    The measured time covers waiting for a free connection, opening a new
+    one and the pre-ping, i.e. everything a request waits for before it can
+    run its first query.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        finally:
+            self.stats.record_checkout(time.perf_counter() - started)
+
+    def recreate(self):
+        # Keep the counters when the pool is rebuilt after a disconnect
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def build_engine_options(config):
+    """
+    Build SQLAlchemy engine options from the pool settings
+
+    SQLite is left alone: Flask-SQLAlchemy picks a suitable pool for it and
+    rejects QueuePool sizing arguments for in-memory databases.
+
+    Args:
+        config (dict): The Flask app config
+
+    Returns:
+        dict: Engine options; explicit SQLALCHEMY_ENGINE_OPTIONS entries win
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if not uri or make_url(uri).get_backend_name() == 'sqlite':
+        return options
+
+    pool_options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    connect_timeout = config.get('DB_CONNECT_TIMEOUT')
+    if connect_timeout and make_url(uri).get_backend_name() == 'postgresql':
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.setdefault('connect_timeout', connect_timeout)
+        pool_options['connect_args'] = connect_args
+
+    pool_options.update(options)
+    return pool_options
+
+
+def install_statement_timeout(engine, timeout_ms):
+    """
+    Set a server-side statement timeout on every new PostgreSQL connection
+
+    Uses SET on connect rather than a startup option, because the Supabase
+    connection pooler rejects startup options.
+
+    Args:
+        engine: SQLAlchemy engine
+        timeout_ms (int): Timeout in milliseconds; 0 disables it
+    """
+    if not timeout_ms or engine.dialect.name != 'postgresql':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_statement_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        finally:
+            cursor.close()
+        # SET opens a transaction on drivers without autocommit; end it so
+        # the connection is returned to the pool idle
+        dbapi_connection.commit()
+
+
+def get_pool_status(engine):
+    """
+    Get in-use and checkout-wait figures for an engine's pool
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        dict: Pool sizing, current usage and checkout wait statistics
+    """
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            # overflow() counts up from -pool_size while the pool fills
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
@@ -0,0 +1,193 @@
+"""
+SQL query profiling for the Flask Contact Form Application
+
+Listens to cursor events on the SQLAlchemy engine and, per request, counts
+queries, adds up database time and keeps the slowest statements. The totals
+are sent back in a Server-Timing header, except on streamed responses, whose
+queries run after the headers are sent and are only logged. Statements slower than
+SLOW_QUERY_THRESHOLD_MS are logged with their parameters redacted, and a
+statement repeated N_PLUS_ONE_THRESHOLD times in one request is reported as
+a likely N+1 pattern.
+"""
+
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+class QueryProfile:
+    """Queries executed while handling one request"""
+
+    __slots__ = ('count', 'total_seconds', 'statements', 'slowest', 'top_n')
+
+    def __init__(self, top_n=5):
+        """
+        Initialize an empty profile
+
+        Args:
+            top_n (int): Number of slowest statements to keep
+        """
+        self.count = 0
+        self.total_seconds = 0.0
+        # statement -> [executions, total seconds]
+        self.statements = {}
+        # (seconds, statement), slowest first
+        self.slowest = []
+        self.top_n = top_n
+
+    def record(self, statement, seconds):
+        """
+        Record one executed statement
+
+        Args:
+            statement (str): The SQL text with placeholders
+            seconds (float): Execution time
+        """
+        self.count += 1
+        self.total_seconds += seconds
+        stats = self.statements.get(statement)
+        if stats is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+
+        if len(self.slowest) < self.top_n or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.top_n:]
+
+    def repeated(self, threshold):
+        """
+        Find statements executed at least threshold times
+
+        Args:
+            threshold (int): Minimum number of executions
+
+        Returns:
+            list: (statement, executions, total seconds), most frequent first
+        """
+        repeated = [(statement, executions, total)
+                    for statement, (executions, total) in self.statements.items()
+                    if executions >= threshold]
+        return sorted(repeated, key=lambda item: item[1], reverse=True)
+
+
+def redact_parameters(parameters):
+    """
+    Replace parameter values with their type, keeping names and shape
+
+    Args:
+        parameters: DBAPI parameters (dict, sequence, or list of them for
+            executemany)
+
+    Returns:
+        str: A description safe to log, e.g. {'name': <str>, 'limit': <int>}
+    """
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key!r}: <{type(value).__name__}>'
+                               for key, value in parameters.items()) + '}'
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany: describe the first row only
+        return f'[{len(parameters)} rows of {redact_parameters(parameters[0])}]'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(f'<{type(value).__name__}>' for value in parameters) + ')'
+    return '<none>' if parameters is None else f'<{type(parameters).__name__}>'
+
+
+def _compact(statement, limit=500):
+    """Collapse whitespace and shorten a statement for logging"""
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+def install_query_profiler(app, *engines):
+    """
+    Attach the profiling listeners to engines and the request hooks to the app
+
+    Args:
+        app (Flask): The application
+        engines: SQLAlchemy engines used by the app (primary and replicas)
+    """
+    slow_threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 200) / 1000
+    n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    top_n = app.config.get('QUERY_PROFILE_TOP_N', 5)
+
+    def add_listeners(engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_timer(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def stop_timer(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['query_started'].pop()
+
+            # Queries from background threads (write-behind, health snapshot)
+            # have no request to attribute them to, but are still checked for slowness
+            in_request = has_request_context()
+            if in_request:
+                profile = g.get('query_profile')
+                if profile is None:
+                    profile = g.query_profile = QueryProfile(top_n)
+                profile.record(statement, elapsed)
+
+            if elapsed >= slow_threshold:
+                where = f" in {request.method} {request.path}" if in_request else ''
+                print(f"🐢 Slow query ({elapsed * 1000:.1f} ms){where}: {_compact(statement)} "
+                      f"params={redact_parameters(parameters)}")
+
+        @event.listens_for(engine, 'handle_error')
+        def drop_timer(exception_context):
+            # after_cursor_execute does not run for failed statements
+            connection = exception_context.connection
+            if connection is not None and connection.info.get('query_started'):
+                connection.info['query_started'].pop()
+
+    for engine in engines:
+        add_listeners(engine)
+
+    def log_profile(profile, method, path):
+        if profile.total_seconds >= slow_threshold:
+            slowest = '; '.join(f'{seconds * 1000:.1f} ms {_compact(statement, 120)}'
+                                for seconds, statement in profile.slowest)
+            print(f"🐢 Slow request {method} {path}: {profile.count} queries, "
+                  f"{profile.total_seconds * 1000:.1f} ms in the database; slowest: {slowest}")
+        for statement, executions, total in profile.repeated(n_plus_one_threshold):
+            print(f"⚠️  Possible N+1 in {method} {path}: executed {executions} times "
+                  f"({total * 1000:.1f} ms total): {_compact(statement)}")
+
+    @app.after_request
+    def report_queries(response):
+        if response.is_streamed:
+            # The body's queries run after the headers are sent, so there is
+            # no Server-Timing header; the whole request is logged at close
+            request_g = g._get_current_object()
+            method, path = request.method, request.path
+
+            def log_streamed():
+                profile = request_g.pop('query_profile', None)
+                if profile is not None:
+                    log_profile(profile, method, path)
+
+            response.call_on_close(log_streamed)
+            return response
+
+        profile = g.pop('query_profile', None)
+        if profile is None:
+            return response
+
+        response.headers.add('Server-Timing',
+                             f'db;dur={profile.total_seconds * 1000:.2f};desc="{profile.count} queries"')
+        log_profile(profile, request.method, request.path)
+        return response
+
+
+def get_query_profile():
+    """
+    Get the query profile of the current request so far
+
+    Returns:
+        QueryProfile: The profile, or None if no query has run yet
+    """
+    return g.get('query_profile')
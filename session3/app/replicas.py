@@ -0,0 +1,296 @@
+"""
+Read replica routing for the Flask Contact Form Application
+
+With DATABASE_REPLICA_URLS set, read-only model queries (listings, counts,
+search, single messages) run on the replicas in round-robin order while
+writes stay on the primary. A replica that fails a query, or lags behind
+the primary by more than REPLICA_MAX_LAG_SECONDS, is ejected for
+REPLICA_EJECT_SECONDS and the read moves on to the next replica, then to
+the primary. A client that just submitted a message reads from the primary
+for REPLICA_STICKY_SECONDS, so it always sees its own write.
+"""
+
+import itertools
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from .pool import build_engine_options, get_pool_status
+
+# Cookie holding the time until which a client reads from the primary. It is
+# not signed: a client forging it can only send its own reads to the primary
+STICKY_COOKIE = 'read_primary_until'
+
+# Seconds a PostgreSQL standby is behind; 0 when it has replayed everything
+# it received or the server is not a standby at all
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def parse_replica_urls(value):
+    """
+    Split a comma-separated DATABASE_REPLICA_URLS value
+
+    Args:
+        value (str): Comma-separated database URLs, or None
+
+    Returns:
+        list: The URLs, without empty entries
+    """
+    return [url.strip() for url in (value or '').split(',') if url.strip()]
+
+
+def create_replica_engines(app):
+    """
+    Create one engine per configured replica URL
+
+    Each engine gets the same pool settings as the primary. Relative SQLite
+    paths are resolved against the instance folder, as Flask-SQLAlchemy
+    does for the primary.
+
+    Args:
+        app (Flask): The application
+
+    Returns:
+        dict: Engines by replica name ('replica-1', 'replica-2', ...)
+    """
+    urls = app.config.get('DATABASE_REPLICA_URLS') or []
+    if isinstance(urls, str):
+        urls = parse_replica_urls(urls)
+
+    engines = {}
+    for number, url in enumerate(urls, start=1):
+        url = make_url(url)
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+                and not os.path.isabs(url.database):
+            url = url.set(database=os.path.join(app.instance_path, url.database))
+        options = build_engine_options({
+            **app.config,
+            'SQLALCHEMY_DATABASE_URI': url.render_as_string(hide_password=False),
+            'SQLALCHEMY_ENGINE_OPTIONS': app.config.get('REPLICA_ENGINE_OPTIONS'),
+        })
+        engines[f'replica-{number}'] = create_engine(url, **options)
+    return engines
+
+
+def _sticky_until():
+    """Time until which the current client reads from the primary, or 0"""
+    if not has_request_context():
+        return 0
+    if g.get('read_primary_until'):
+        return g.read_primary_until
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return 0
+
+
+def mark_primary_write(sticky_seconds):
+    """
+    Send the current client's reads to the primary for a while
+
+    Called after a submission, so the listing the client sees next includes
+    its message even if the replicas have not caught up yet.
+
+    Args:
+        sticky_seconds (float): How long reads stay on the primary
+    """
+    if has_request_context() and sticky_seconds > 0:
+        g.read_primary_until = time.time() + sticky_seconds
+
+
+def set_sticky_cookie(response):
+    """After-request hook storing the primary-read deadline in a cookie"""
+    until = g.get('read_primary_until')
+    if until:
+        response.set_cookie(STICKY_COOKIE, f'{until:.3f}', max_age=max(1, int(until - time.time()) + 1),
+                            httponly=True, samesite='Lax')
+    return response
+
+
+class ReplicaRouter:
+    """
+    Round-robin reads over replica engines with ejection of unhealthy ones
+
+    Health is checked passively: a replica is ejected when a query on it
+    fails, and, with max_lag set, when a lag check (run at most every
+    check_interval seconds per replica) finds it too far behind. Ejected
+    replicas are tried again after eject_seconds.
+    """
+
+    def __init__(self, engines, eject_seconds=30.0, max_lag=0.0, check_interval=5.0,
+                 clock=time.monotonic):
+        """
+        Initialize the router
+
+        Args:
+            engines (dict): Replica engines by name
+            eject_seconds (float): How long a failed or lagging replica gets no reads
+            max_lag (float): Replication lag in seconds above which a
+                PostgreSQL replica is ejected (0 disables lag checks)
+            check_interval (float): Seconds between lag checks of a replica
+            clock (callable): Monotonic time source in seconds
+        """
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._state = {name: {'ejected_until': 0.0, 'checked_at': None, 'lag': None,
+                              'reads': 0, 'errors': 0, 'ejections': 0, 'last_error': None}
+                       for name in engines}
+        self.stats = {'sticky_reads': 0, 'fallbacks': 0}
+
+    def candidates(self):
+        """
+        Get the replicas to try for the next read
+
+        Returns:
+            list: Names of the healthy replicas, rotated so each call
+                starts with the next one
+        """
+        names = list(self.engines)
+        if not names:
+            return []
+        start = next(self._next) % len(names)
+        now = self._clock()
+        with self._lock:
+            return [name for name in names[start:] + names[:start]
+                    if self._state[name]['ejected_until'] <= now]
+
+    def eject(self, name, reason):
+        """
+        Stop reading from a replica for eject_seconds
+
+        Args:
+            name (str): The replica name
+            reason (str): Why it was ejected, shown on /health
+        """
+        with self._lock:
+            state = self._state[name]
+            state['ejected_until'] = self._clock() + self.eject_seconds
+            state['ejections'] += 1
+            state['last_error'] = reason
+        print(f"⚠️  Replica {name} ejected for {self.eject_seconds:g}s: {reason}")
+
+    def run(self, operation, primary):
+        """
+        Run a read on a healthy replica, falling back to the primary
+
+        Args:
+            operation (callable): Takes a Session and returns the result;
+                must only read
+            primary: Session used when no replica can serve the read
+
+        Returns:
+            The result of operation
+        """
+        if _sticky_until() > time.time():
+            with self._lock:
+                self.stats['sticky_reads'] += 1
+            return operation(primary)
+
+        for name in self.candidates():
+            try:
+                with Session(self.engines[name]) as session:
+                    if not self._lag_ok(name, session):
+                        continue
+                    result = operation(session)
+            except exc.DBAPIError as e:
+                with self._lock:
+                    self._state[name]['errors'] += 1
+                self.eject(name, str(e.orig if e.orig is not None else e).strip().splitlines()[0])
+                continue
+            with self._lock:
+                self._state[name]['reads'] += 1
+            return result
+
+        with self._lock:
+            self.stats['fallbacks'] += 1
+        return operation(primary)
+
+    def _lag_ok(self, name, session):
+        """Check a replica's lag if it is due; eject it and return False if too far behind"""
+        if self.max_lag <= 0 or session.get_bind().dialect.name != 'postgresql':
+            return True
+        now = self._clock()
+        with self._lock:
+            state = self._state[name]
+            if state['checked_at'] is not None and now - state['checked_at'] < self.check_interval:
+                return True
+            state['checked_at'] = now
+        lag = float(session.execute(REPLICA_LAG_QUERY).scalar() or 0)
+        with self._lock:
+            self._state[name]['lag'] = round(lag, 3)
+        if lag > self.max_lag:
+            self.eject(name, f'replication lag {lag:.1f}s exceeds {self.max_lag:g}s')
+            return False
+        return True
+
+    def check(self):
+        """
+        Query every replica now, regardless of ejection
+
+        Returns:
+            dict: For each replica, whether it answered, its lag (PostgreSQL)
+                or the error
+        """
+        results = {}
+        for name, engine in self.engines.items():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                    lag = None
+                    if engine.dialect.name == 'postgresql':
+                        lag = round(float(connection.execute(REPLICA_LAG_QUERY).scalar() or 0), 3)
+                results[name] = {'ok': True, 'lag_seconds': lag}
+            except exc.DBAPIError as e:
+                results[name] = {'ok': False, 'error': str(e.orig if e.orig is not None else e).strip()}
+        return results
+
+    def snapshot(self):
+        """
+        Get read counts and health of every replica
+
+        Returns:
+            dict: Router counters plus per-replica state and pool status
+        """
+        now = self._clock()
+        with self._lock:
+            replicas = {}
+            for name, state in self._state.items():
+                ejected_for = state['ejected_until'] - now
+                replicas[name] = {
+                    'url': self.engines[name].url.render_as_string(hide_password=True),
+                    'healthy': ejected_for <= 0,
+                    'ejected_for_seconds': round(ejected_for, 1) if ejected_for > 0 else 0,
+                    'reads': state['reads'],
+                    'errors': state['errors'],
+                    'ejections': state['ejections'],
+                    'lag_seconds': state['lag'],
+                    'last_error': state['last_error'],
+                    'pool': get_pool_status(self.engines[name]),
+                }
+            return {**self.stats, 'replicas': replicas}
+
+    def dispose(self, close=True):
+        """
+        Dispose the replica engines' pools
+
+        Args:
+            close (bool): Close pooled connections; False in a forked child,
+                whose inherited connections belong to the parent
+        """
+        for engine in self.engines.values():
+            engine.dispose(close=close)
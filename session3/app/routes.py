@@ -2,16 +2,78 @@
 Route handlers for the Flask Contact Form Application
 """
 
-from flask import Blueprint, request, render_template, current_app
+from flask import (Blueprint, request, render_template, stream_template, current_app, url_for,
+                   make_response, jsonify)
 from datetime import datetime
-import os
+import hashlib
+import json
 
-from .utils import get_message_count, save_message, get_all_messages, format_messages_for_display
+from .admission import admission_controlled
+from .health import check_readiness
+from .utils import (get_message_count, save_message, get_messages_page, get_messages_version,
+                    format_messages_for_display, iter_message_fragments)
 
 # Create a Blueprint for routes
 main = Blueprint('main', __name__)
 
 
+def make_etag(*parts):
+    """
+    Build an ETag value from the parts that determine a response
+
+    Args:
+        *parts: Values whose string forms identify the response content
+
+    Returns:
+        str: A short hex digest
+    """
+    return hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Check the request's conditional headers against the current validators
+
+    If-None-Match takes precedence; If-Modified-Since is only used when the
+    client sent no ETag (RFC 9110, section 13.2.2).
+
+    Args:
+        etag (str): The current ETag value
+        last_modified (datetime, optional): The current modification time (UTC)
+
+    Returns:
+        bool: True if the client's copy is current and a 304 can be sent
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        # HTTP dates have whole-second precision
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def add_validators(response, etag, last_modified, cache_control):
+    """
+    Set ETag, Last-Modified and Cache-Control on a response
+
+    Args:
+        response (Response): The response to update
+        etag (str): The ETag value, sent as a weak validator
+        last_modified (datetime, optional): The modification time (UTC)
+        cache_control (str): The Cache-Control header value
+
+    Returns:
+        Response: The same response
+    """
+    # Weak: the body is equivalent, not byte-identical (gzip, timestamps in templates)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
 @main.route('/')
 def home():
     """Display the contact form"""
@@ -19,6 +81,7 @@ def home():
 
 
 @main.route('/submit', methods=['POST'])
+@admission_controlled
 def submit():
     """Process form submission and save to storage"""
     try:
@@ -58,21 +121,45 @@ def submit():
 
 @main.route('/messages')
 def view_messages():
-    """View all submitted messages"""
+    """View submitted messages, one page at a time"""
+    cursor = request.args.get('cursor') or None
+    per_page = request.args.get('per_page', type=int)
+
     try:
-        # Get messages from storage
-        messages = get_all_messages()
+        # The version is read before the page, so a write in between yields
+        # an older ETag for newer content and the next poll simply refetches
+        version, last_modified = get_messages_version()
+        etag = make_etag(version, cursor, per_page)
+        cache_control = current_app.config.get('MESSAGES_CACHE_CONTROL', 'private, no-cache')
+        if is_not_modified(etag, last_modified):
+            return add_validators(current_app.response_class(status=304),
+                                  etag, last_modified, cache_control)
+
+        # Get one page of messages from storage
+        messages, next_cursor = get_messages_page(cursor=cursor, per_page=per_page, version=version)
 
         # Check if no messages exist
-        if not messages or (isinstance(messages, list) and len(messages) == 0):
-            return render_template('no_messages.html')
+        if not messages and not cursor:
+            return add_validators(make_response(render_template('no_messages.html')),
+                                  etag, last_modified, cache_control)
 
         # Format messages for display
-        html_content = format_messages_for_display(messages)
+        html_content = format_messages_for_display(messages) if messages else ''
+
+        next_url = None
+        if next_cursor:
+            next_url = url_for('main.view_messages', cursor=next_cursor, per_page=per_page)
 
-        return render_template('messages.html',
-                             message_count=get_message_count(),
-                             content=html_content)
+        response = make_response(render_template('messages.html',
+                                                 message_count=get_message_count(),
+                                                 content=html_content,
+                                                 next_url=next_url))
+        return add_validators(response, etag, last_modified, cache_control)
+
+    except ValueError as e:
+        return render_template('error.html',
+                             error_title='Bad Request',
+                             error_message=str(e)), 400
 
     except Exception as e:
         return render_template('error.html',
@@ -80,27 +167,48 @@ def view_messages():
                              error_message=f'Error reading messages: {str(e)}'), 500
 
 
+@main.route('/messages/all')
+def stream_messages():
+    """Stream every submitted message, rendering each batch as it is fetched"""
+    message_count = get_message_count()
+    if not message_count:
+        return render_template('no_messages.html')
+
+    # The page header is sent immediately; message fragments follow as the
+    # storage backend yields them, so memory stays bounded by one batch
+    return stream_template('messages.html',
+                           message_count=message_count,
+                           fragments=iter_message_fragments())
+
+
 @main.route('/health')
 def health_check():
-    """Simple health check endpoint"""
-    use_database = current_app.config.get('USE_DATABASE', False)
-
-    health_data = {
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'total_messages': get_message_count(),
-        'storage_type': 'database' if use_database else 'file',
-    }
-
-    # Add file existence check only if not using database
-    if not use_database:
-        health_data['message_file_exists'] = os.path.exists('messages.txt')
+    """Detailed health statistics, served from the background-refreshed snapshot"""
+    health_data = current_app.extensions['health_snapshot'].get()
+
+    # The snapshot only changes when it is refreshed; its age changes on
+    # every read and is left out of the ETag
+    stable = {key: value for key, value in health_data.items() if key != 'snapshot_age_seconds'}
+    etag = make_etag(json.dumps(stable, sort_keys=True, default=str))
+    collected_at = health_data.get('collected_at')
+    last_modified = datetime.fromisoformat(collected_at) if collected_at else None
+    cache_control = current_app.config.get('HEALTH_CACHE_CONTROL', 'no-cache')
+
+    if is_not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
     else:
-        # Add database info if using database
-        db_uri = current_app.config.get('SQLALCHEMY_DATABASE_URI', '')
-        if 'postgresql' in db_uri:
-            health_data['database_type'] = 'postgresql'
-        elif 'sqlite' in db_uri:
-            health_data['database_type'] = 'sqlite'
-
-    return health_data
+        response = jsonify(health_data)
+    return add_validators(response, etag, last_modified, cache_control)
+
+
+@main.route('/livez')
+def liveness():
+    """Liveness probe: answers as long as the process serves requests, no I/O"""
+    return {'status': 'alive'}
+
+
+@main.route('/readyz')
+def readiness():
+    """Readiness probe: one SELECT 1 (or storage check) with a timeout"""
+    ready, checks = check_readiness(current_app.config.get('READINESS_TIMEOUT', 1.0))
+    return {'status': 'ready' if ready else 'unavailable', 'checks': checks}, 200 if ready else 503
@@ -0,0 +1,133 @@
+"""
+Full-text search support for the Flask Contact Form Application
+
+PostgreSQL uses a generated, weighted tsvector column with a GIN index, plus
+pg_trgm GIN indexes on name and email for substring matches. SQLite uses an
+external-content FTS5 table kept in sync by triggers. The same DDL is applied
+by the full-text search migration; create_search_index lets the create_all
+development path install it too.
+"""
+
+import re
+from sqlalchemy import inspect, text
+
+# Text search configuration; 'simple' does no stemming, so it works for
+# names, email addresses and messages in any language
+SEARCH_CONFIG = 'simple'
+
+POSTGRESQL_SEARCH_DDL = [
+    f"""
+    ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(email, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(message, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING gin (search_vector)",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_messages_name_trgm ON messages USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_messages_email_trgm ON messages USING gin (email gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        name, email, message, content='messages', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, name, email, message)
+        VALUES (new.id, new.name, new.email, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, name, email, message)
+        VALUES ('delete', old.id, old.name, old.email, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, name, email, message)
+        VALUES ('delete', old.id, old.name, old.email, old.message);
+        INSERT INTO messages_fts(rowid, name, email, message)
+        VALUES (new.id, new.name, new.email, new.message);
+    END
+    """,
+]
+
+# Indexes the rows that existed before the FTS5 table was created
+SQLITE_SEARCH_REBUILD = "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"
+
+# Cache of engine URL -> whether the search index exists
+_search_index_cache = {}
+
+
+def create_search_index(engine):
+    """
+    Create the full-text search index for the messages table if missing
+
+    Args:
+        engine: SQLAlchemy engine for the database
+
+    Returns:
+        bool: True if the database supports full-text search
+    """
+    statements = {
+        'postgresql': POSTGRESQL_SEARCH_DDL,
+        'sqlite': SQLITE_SEARCH_DDL,
+    }.get(engine.dialect.name)
+    if statements is None:
+        return False
+
+    with engine.begin() as connection:
+        # Only a newly created FTS5 table needs to index existing rows
+        rebuild = engine.dialect.name == 'sqlite' and not inspect(connection).has_table('messages_fts')
+        for statement in statements:
+            connection.execute(text(statement))
+        if rebuild:
+            connection.execute(text(SQLITE_SEARCH_REBUILD))
+    _search_index_cache.pop(str(engine.url), None)
+    return True
+
+
+def has_search_index(engine):
+    """
+    Check whether the full-text search index exists, caching the answer
+
+    Args:
+        engine: SQLAlchemy engine for the database
+
+    Returns:
+        bool: True if full-text search can be used
+    """
+    key = str(engine.url)
+    if key not in _search_index_cache:
+        inspector = inspect(engine)
+        if engine.dialect.name == 'postgresql':
+            columns = {column['name'] for column in inspector.get_columns('messages')}
+            _search_index_cache[key] = 'search_vector' in columns
+        elif engine.dialect.name == 'sqlite':
+            _search_index_cache[key] = inspector.has_table('messages_fts')
+        else:
+            _search_index_cache[key] = False
+    return _search_index_cache[key]
+
+
+def build_fts5_query(search_term):
+    """
+    Turn free text into an FTS5 query matching all of its words
+
+    Each word is quoted, so FTS5 operators and punctuation in user input are
+    matched literally instead of being parsed as query syntax.
+
+    Args:
+        search_term (str): The text to search for
+
+    Returns:
+        str: FTS5 MATCH expression, empty if the term has no words
+    """
+    words = re.findall(r'\S+', search_term)
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
@@ -0,0 +1,920 @@
+"""
+Storage backends for the Flask Contact Form Application
+
+create_app resolves STORAGE_BACKEND once and keeps the backend in
+app.extensions['storage']; the helpers in app/utils.py call it without
+looking at the configuration again. Every backend offers the same
+operations and implements each with its fastest path:
+
+* save / save_many: store one message or a batch (COPY or one executemany
+  on the database, one multi-row insert on Supabase, one append per
+  segment or one write on the file stores)
+* get_page: one page of the listing, newest first, and a JSON-serializable
+  key for the next page
+* count / version: the number of messages and a cheap marker that changes
+  with every write, for conditional requests
+* search: messages matching a term
+* stream: every message in bounded batches, newest or oldest first
+
+Reads return MessageRecord tuples (or SQLAlchemy rows with the same
+fields), so callers never need to check what kind of object they got.
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from .cache import LISTING_NAMESPACES, CachedSupabaseDB
+from .filestore import (HEADER_FILE, LegacyFileWriter, MessageStore, count_file_records, format_file_record,
+                        iter_file_records, read_file_page)
+from .models import Message, counted_by_trigger, db
+from .pool import get_pool_status
+from .replicas import mark_primary_write
+
+# Accepted STORAGE_BACKEND values; 'auto' picks 'database' when USE_DATABASE
+# is on and 'file' otherwise
+STORAGE_BACKENDS = ('auto', 'database', 'file', 'supabase', 'memory')
+FILE_STORAGE_FORMATS = ('auto', 'segmented', 'legacy')
+
+
+class MessageRecord(NamedTuple):
+    """
+    A stored message as returned by every backend
+
+    Has the fields of the database listing rows in the same order, so rows
+    and records unpack and render alike. Timestamps are datetimes on the
+    database and in memory, and the stored strings on Supabase and in files.
+    """
+    id: Optional[int]
+    name: str
+    email: str
+    message: str
+    created_at: object = None
+    updated_at: object = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a record from a message dict
+
+        Args:
+            data (dict): Message data; missing fields become None
+
+        Returns:
+            MessageRecord: The record
+        """
+        return cls(data.get('id'), data.get('name'), data.get('email'), data.get('message'),
+                   data.get('created_at'), data.get('updated_at'))
+
+
+def record_to_dict(record):
+    """
+    Convert a record or listing row to a JSON-ready dict
+
+    Args:
+        record: A MessageRecord or a row with the same fields
+
+    Returns:
+        dict: The fields, with datetimes as ISO 8601 strings
+    """
+    data = record._asdict()
+    for field in ('created_at', 'updated_at'):
+        if isinstance(data[field], datetime):
+            data[field] = data[field].isoformat()
+    return data
+
+
+def format_timestamp(value):
+    """
+    Format a record timestamp for display
+
+    Args:
+        value: A datetime, a stored timestamp string or None
+
+    Returns:
+        str: The ISO 8601 or stored text, 'N/A' if there is none
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value or 'N/A'
+
+
+def parse_timestamp(value):
+    """
+    Parse an exported or legacy timestamp
+
+    Args:
+        value: A datetime, an ISO 8601 string or None
+
+    Returns:
+        datetime: The timestamp, or None if it is missing or not ISO 8601
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _timestamp_text(message):
+    """Timestamp stored with a message in the file formats"""
+    value = message.get('timestamp') or message.get('created_at')
+    return value.isoformat() if isinstance(value, datetime) else value or None
+
+
+def _position(key):
+    """Validate a record-number page key"""
+    if key is not None and (not isinstance(key, int) or isinstance(key, bool) or key < 0):
+        raise ValueError(f"Invalid page key: {key!r}")
+    return key
+
+
+def _writable(path):
+    """Check that files can be created in path or, if it is missing, its nearest ancestor"""
+    # A missing store directory is created on the first write
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    return 'ok' if os.access(path or '.', os.W_OK) else 'not writable'
+
+
+class StorageBackend:
+    """
+    Operations every storage backend provides
+
+    Messages passed to save and save_many are dicts with name, email and
+    message keys, an optional created_at (datetime or ISO 8601 string) and
+    an optional timestamp, the display text the file formats store.
+    Failures raise; the helpers in app/utils.py report them.
+    """
+
+    # Label used in metrics and the /health file_format
+    name = None
+    # /health storage_type
+    storage_type = None
+    # Readiness checks on remote backends run with a timeout
+    remote = False
+
+    def save(self, message):
+        """
+        Store one message
+
+        Args:
+            message (dict): The message
+        """
+        self.save_many([message])
+
+    def save_many(self, messages):
+        """
+        Store several messages with the backend's bulk path
+
+        Args:
+            messages (list): The messages, oldest first
+
+        Returns:
+            int: The number of stored messages
+        """
+        raise NotImplementedError
+
+    def get_page(self, limit, key=None, preview=True, version=None):
+        """
+        Read one page of messages, newest first
+
+        Args:
+            limit (int): Maximum number of messages to return
+            key: Key returned with the previous page; None for the first page
+            preview (bool): Cut messages to MESSAGE_PREVIEW_LENGTH where the
+                backend supports it
+            version (str, optional): The current version, keying cached pages
+
+        Returns:
+            tuple: (list of records, JSON-serializable key for the next page
+                or None if this is the last page)
+
+        Raises:
+            ValueError: If the key is malformed
+        """
+        raise NotImplementedError
+
+    def count(self, mode=None):
+        """
+        Count the stored messages
+
+        Args:
+            mode (str, optional): Database count mode, see Message.count_all
+
+        Returns:
+            int: The number of messages
+        """
+        raise NotImplementedError
+
+    def version(self):
+        """
+        Get a cheap version of the stored messages for conditional requests
+
+        Returns:
+            tuple: (version string, last modification time as an aware UTC
+                datetime or None if nothing is stored)
+        """
+        raise NotImplementedError
+
+    def search(self, term, limit=50, offset=0):
+        """
+        Find messages whose name, email or text contains term
+
+        Backends without a search index scan every message, newest first.
+
+        Args:
+            term (str): The term to search for
+            limit (int): Maximum number of messages to return
+            offset (int): Number of matches to skip
+
+        Returns:
+            list: The matching records
+        """
+        needle = term.casefold()
+        matches = []
+        for record in self.stream(preview=False):
+            if any(needle in (value or '').casefold() for value in (record.name, record.email, record.message)):
+                if offset:
+                    offset -= 1
+                    continue
+                matches.append(record)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def stream(self, batch_size=500, oldest_first=False, preview=True):
+        """
+        Iterate over every stored message, fetching them in batches
+
+        Args:
+            batch_size (int): Number of messages fetched per batch
+            oldest_first (bool): Iterate in insertion order instead of newest first
+            preview (bool): Cut messages to MESSAGE_PREVIEW_LENGTH where the
+                backend supports it
+
+        Yields:
+            The records
+        """
+        raise NotImplementedError
+
+    def note_write(self):
+        """Keep the current client's reads consistent with the write it just made"""
+
+    def check(self):
+        """
+        Check that the storage can be used
+
+        Returns:
+            str: 'ok' or the problem found; remote backends may raise instead
+        """
+        return 'ok'
+
+    def describe(self):
+        """
+        Get backend-specific /health details
+
+        Returns:
+            dict: Fields added to the health data
+        """
+        return {}
+
+
+def _uses_psycopg_copy():
+    """Check whether the database supports COPY through psycopg 3"""
+    return db.engine.dialect.name == 'postgresql' and db.engine.dialect.driver == 'psycopg'
+
+
+def _copy_out():
+    """Stream all messages with COPY ... TO STDOUT, oldest first"""
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        columns = ', '.join(MessageRecord._fields)
+        with cursor.copy(f"COPY (SELECT {columns} FROM messages ORDER BY id) TO STDOUT") as copy:
+            copy.set_types(['int8', 'text', 'text', 'text', 'timestamp', 'timestamp'])
+            for row in copy.rows():
+                yield MessageRecord(*row)
+    finally:
+        connection.close()
+
+
+def _copy_in(messages):
+    """Insert messages with COPY ... FROM STDIN and commit them"""
+    now = datetime.utcnow()
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        with cursor.copy("COPY messages (name, email, message, created_at, updated_at) FROM STDIN") as copy:
+            for msg in messages:
+                created_at = parse_timestamp(msg.get('created_at')) or now
+                updated_at = parse_timestamp(msg.get('updated_at')) or created_at
+                copy.write_row((msg['name'], msg['email'], msg['message'], created_at, updated_at))
+        if not counted_by_trigger(db.engine, Message.__tablename__, len(messages)):
+            cursor.execute(
+                "UPDATE message_counters SET value = value + %s WHERE name = %s",
+                (len(messages), Message.__tablename__)
+            )
+        connection.commit()
+    finally:
+        connection.close()
+    return len(messages)
+
+
+class DatabaseBackend(StorageBackend):
+    """
+    Messages in the SQLAlchemy database
+
+    Listings select plain rows, cut to the preview length in the query;
+    counts, pages and searches go through the read cache if it is enabled
+    and run on read replicas if any are configured. Bulk writes use COPY
+    on PostgreSQL with psycopg 3 and one executemany elsewhere.
+    """
+
+    name = 'database'
+    storage_type = 'database'
+    remote = True
+
+    def __init__(self, preview_length=None, count_mode='counter', cache=None, router=None,
+                 sticky_seconds=5.0):
+        """
+        Initialize the backend
+
+        Args:
+            preview_length (int, optional): Characters of each message shown
+                in listings, None for whole messages
+            count_mode (str): Default Message.count_all mode
+            cache (ReadCache, optional): Cache for counts, pages and searches
+            router (ReplicaRouter, optional): Router sending reads to replicas
+            sticky_seconds (float): How long a writing client reads from the primary
+        """
+        self.preview_length = preview_length
+        self.count_mode = count_mode
+        self.cache = cache
+        self.router = router
+        self.sticky_seconds = sticky_seconds
+
+    def _cached(self, namespace, key, load):
+        if self.cache is None:
+            return load()
+        return self.cache.get_or_load(namespace, key, load)
+
+    def _written(self):
+        if self.cache is not None:
+            self.cache.invalidate(LISTING_NAMESPACES)
+        self.note_write()
+
+    def note_write(self):
+        """Send the client's reads to the primary until replicas catch up"""
+        if self.router is not None:
+            mark_primary_write(self.sticky_seconds)
+
+    def save(self, message):
+        """Insert one message and commit it"""
+        Message.create(name=message['name'], email=message['email'], message=message['message'])
+        self._written()
+
+    def save_many(self, messages):
+        """Insert messages with COPY or one executemany and a single commit"""
+        if not messages:
+            return 0
+        if _uses_psycopg_copy():
+            saved = _copy_in(messages)
+        else:
+            saved = Message.create_many([{
+                'name': msg['name'],
+                'email': msg['email'],
+                'message': msg['message'],
+                'created_at': parse_timestamp(msg.get('created_at')),
+                'updated_at': parse_timestamp(msg.get('updated_at'))
+            } for msg in messages])
+        self._written()
+        return saved
+
+    def get_page(self, limit, key=None, preview=True, version=None):
+        """Read a page of listing rows; keys are [created_at ISO string, id]"""
+        before = None
+        if key is not None:
+            try:
+                created_at, message_id = key
+                before = (datetime.fromisoformat(created_at), int(message_id))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid page key: {key!r}") from e
+        preview_length = self.preview_length if preview else None
+
+        def load_page():
+            rows, next_key = Message.get_listing_page(limit, before=before, preview_length=preview_length)
+            if next_key is not None:
+                next_key = [next_key[0].isoformat(), next_key[1]]
+            return rows, next_key
+
+        # The version is part of the key, so a page cached before another
+        # process wrote is not served under the newer version's ETag
+        return self._cached('get_messages_page', (limit, before, preview_length, version), load_page)
+
+    def count(self, mode=None):
+        """Count messages with the configured or given Message.count_all mode"""
+        mode = mode or self.count_mode
+        return self._cached('get_message_count', mode, lambda: Message.count_all(mode=mode))
+
+    def version(self):
+        """
+        Combine the message counter with the newest id, created_at and
+        updated_at (index lookups, no scan); bypasses the read cache so
+        writes by other processes are seen immediately
+        """
+        max_id, max_created, max_updated = Message.get_version()
+        count = Message.count_all(mode='counter')
+        if max_id is None:
+            return f'db-{count}-empty', None
+        last_modified = max(max_created, max_updated).replace(tzinfo=timezone.utc)
+        return f'db-{count}-{max_id}-{max_updated.isoformat()}', last_modified
+
+    def search(self, term, limit=50, offset=0):
+        """Search with the full-text index, best matches first"""
+        def load():
+            return [MessageRecord(msg.id, msg.name, msg.email, msg.message, msg.created_at, msg.updated_at)
+                    for msg in Message.search(term, limit=limit, offset=offset)]
+        return self._cached('search_messages', (term, limit, offset), load)
+
+    def stream(self, batch_size=500, oldest_first=False, preview=True):
+        """Stream listing rows with yield_per, or with COPY for whole messages oldest first"""
+        preview_length = self.preview_length if preview else None
+        if oldest_first and not preview_length and _uses_psycopg_copy():
+            yield from _copy_out()
+            return
+        yield from Message.iter_listing(batch_size=batch_size, preview_length=preview_length,
+                                        oldest_first=oldest_first)
+
+    def check(self):
+        """Run SELECT 1 on a pooled connection"""
+        with db.engine.connect() as connection:
+            connection.execute(db.text('SELECT 1'))
+        return 'ok'
+
+    def describe(self):
+        """Database type, pool status and read cache statistics"""
+        details = {'database_type': db.engine.dialect.name, 'pool': get_pool_status(db.engine)}
+        if self.cache is not None:
+            details['read_cache'] = self.cache.snapshot()
+        return details
+
+
+class SegmentedFileBackend(StorageBackend):
+    """
+    Messages in the segmented JSON-lines store
+
+    Counts and versions come from the store's header; page keys are record
+    numbers. Search scans the store, newest first.
+    """
+
+    name = 'segmented'
+    storage_type = 'file'
+
+    def __init__(self, store):
+        """
+        Initialize the backend
+
+        Args:
+            store (MessageStore): The store
+        """
+        self.store = store
+
+    def save(self, message):
+        """Append one message, grouped with concurrent appends"""
+        self.store.append(message['name'], message['email'], message['message'],
+                          created_at=_timestamp_text(message))
+
+    def save_many(self, messages):
+        """Append messages with one write per touched segment"""
+        return len(self.store.append_many([{
+            'name': msg['name'],
+            'email': msg['email'],
+            'message': msg['message'],
+            'created_at': _timestamp_text(msg)
+        } for msg in messages]))
+
+    def get_page(self, limit, key=None, preview=True, version=None):
+        """Read a page of records; keys are record numbers"""
+        records, next_key = self.store.read_page(limit, before=_position(key))
+        return [MessageRecord.from_dict(record) for record in records], next_key
+
+    def count(self, mode=None):
+        """Read the count from the header"""
+        return self.store.count()
+
+    def version(self):
+        """Use the header's record count and modification time"""
+        count, modified_ns = self.store.version()
+        if not modified_ns:
+            return 'segmented-empty', None
+        return (f'segmented-{count}-{modified_ns}',
+                datetime.fromtimestamp(modified_ns / 1e9, timezone.utc))
+
+    def stream(self, batch_size=500, oldest_first=False, preview=True):
+        """Read the store in ranges of batch_size records"""
+        if oldest_first:
+            for start in range(0, self.store.count(), batch_size):
+                for record in self.store.read_range(start, start + batch_size):
+                    yield MessageRecord.from_dict(record)
+            return
+
+        before = None
+        while True:
+            records, before = self.store.read_page(batch_size, before=before)
+            for record in records:
+                yield MessageRecord.from_dict(record)
+            if before is None:
+                return
+
+    def check(self):
+        """Check that the store directory is writable"""
+        return _writable(self.store.directory)
+
+    def describe(self):
+        """File format, whether the store exists and group commit statistics"""
+        return {
+            'file_format': 'segmented',
+            'message_file_exists': self.store.exists(),
+            'file_group_commit': self.store.committer.snapshot(),
+        }
+
+
+class LegacyFileBackend(StorageBackend):
+    """
+    Messages in the legacy messages.txt format
+
+    Pages are read backwards from the end of the file, keyed by byte
+    offset; counting and search read the whole file in blocks.
+    """
+
+    name = 'legacy'
+    storage_type = 'file'
+
+    def __init__(self, writer):
+        """
+        Initialize the backend
+
+        Args:
+            writer (LegacyFileWriter): Appender for the messages file
+        """
+        self.writer = writer
+        self.path = writer.path
+
+    def save(self, message):
+        """Append one record, grouped with concurrent appends"""
+        self.writer.append(format_file_record(message['name'], message['email'], message['message'],
+                                              _timestamp_text(message)))
+
+    def save_many(self, messages):
+        """Append all records with a single write"""
+        self.writer.append_many(format_file_record(msg['name'], msg['email'], msg['message'],
+                                                   _timestamp_text(msg)) for msg in messages)
+        return len(messages)
+
+    def get_page(self, limit, key=None, preview=True, version=None):
+        """Read a page of records; keys are byte offsets"""
+        key = _position(key)
+        if not os.path.exists(self.path):
+            return [], None
+        records, next_key = read_file_page(self.path, limit, before=key)
+        return [MessageRecord.from_dict(record) for record in records], next_key
+
+    def count(self, mode=None):
+        """Count the separator lines"""
+        return count_file_records(self.path)
+
+    def version(self):
+        """Use the file's size and modification time"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 'legacy-empty', None
+        return (f'legacy-{stat.st_size}-{stat.st_mtime_ns}',
+                datetime.fromtimestamp(stat.st_mtime_ns / 1e9, timezone.utc))
+
+    def stream(self, batch_size=500, oldest_first=False, preview=True):
+        """Read the file forwards, or backwards one page at a time"""
+        if not os.path.exists(self.path):
+            return
+        if oldest_first:
+            for record in iter_file_records(self.path):
+                yield MessageRecord.from_dict(record)
+            return
+
+        before = None
+        while True:
+            records, before = read_file_page(self.path, batch_size, before=before)
+            for record in records:
+                yield MessageRecord.from_dict(record)
+            if before is None:
+                return
+
+    def check(self):
+        """Check that the file's directory is writable"""
+        return _writable(os.path.dirname(self.path))
+
+    def describe(self):
+        """File format, whether the file exists and group commit statistics"""
+        return {
+            'file_format': 'legacy',
+            'message_file_exists': os.path.exists(self.path),
+            'file_group_commit': self.writer.committer.snapshot(),
+        }
+
+
+class SupabaseBackend(StorageBackend):
+    """
+    Messages in Supabase, through the PostgREST API
+
+    Reads go through the read cache if it is enabled; page keys are
+    [created_at, id] as returned by Supabase.
+    """
+
+    name = 'supabase'
+    storage_type = 'supabase'
+    remote = True
+
+    def __init__(self, client, cache=None, count_mode='counter'):
+        """
+        Initialize the backend
+
+        Args:
+            client (SupabaseDB): The Supabase client
+            cache (ReadCache, optional): Cache for counts, pages and searches
+            count_mode (str): Default SupabaseDB.get_message_count mode
+        """
+        self.client = client
+        self.cache = cache
+        self.db = CachedSupabaseDB(client, cache) if cache is not None else client
+        self.count_mode = count_mode
+
+    def save(self, message):
+        """Insert one message"""
+        if self.db.save_message(message['name'], message['email'], message['message']) is None:
+            raise RuntimeError("Supabase insert failed")
+
+    def save_many(self, messages):
+        """Insert messages with one multi-row request"""
+        rows = []
+        for msg in messages:
+            created_at = msg.get('created_at')
+            rows.append({
+                'name': msg['name'],
+                'email': msg['email'],
+                'message': msg['message'],
+                'created_at': created_at.isoformat() if isinstance(created_at, datetime) else created_at or None
+            })
+        saved = self.db.save_messages(rows)
+        if len(saved) != len(rows):
+            raise RuntimeError("Supabase insert failed")
+        return len(saved)
+
+    def get_page(self, limit, key=None, preview=True, version=None):
+        """Read a page of records; keys are [created_at, id]"""
+        before = None
+        if key is not None:
+            try:
+                created_at, message_id = key
+                before = (str(created_at), int(message_id))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid page key: {key!r}") from e
+        if self.cache is not None:
+            # The version keys the cached page, as on the database backend
+            rows, next_key = self.db.get_messages_page(limit, before, version=version)
+        else:
+            rows, next_key = self.client.get_messages_page(limit, before)
+        return [MessageRecord.from_dict(row) for row in rows], list(next_key) if next_key else None
+
+    def count(self, mode=None):
+        """Count with the configured or given SupabaseDB.get_message_count mode"""
+        return self.db.get_message_count(mode or self.count_mode)
+
+    def version(self):
+        """Combine the message counter with the newest message; bypasses the read cache"""
+        count = self.client.get_message_count('counter')
+        rows, _ = self.client.get_messages_page(1)
+        if not rows:
+            return f'supabase-{count}-empty', None
+        newest = rows[0]
+        changed = newest.get('updated_at') or newest['created_at']
+        last_modified = datetime.fromisoformat(changed)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return f"supabase-{count}-{newest['id']}-{changed}", last_modified
+
+    def search(self, term, limit=50, offset=0):
+        """Search with the search_messages database function, best matches first"""
+        return [MessageRecord.from_dict(row) for row in self.db.search_messages(term, limit, offset)]
+
+    def stream(self, batch_size=500, oldest_first=False, preview=True):
+        """Read with one ranged request per batch, bypassing the read cache"""
+        if oldest_first:
+            for row in self.client.iter_messages(batch_size=batch_size):
+                yield MessageRecord.from_dict(row)
+            return
+
+        before = None
+        while True:
+            rows, before = self.client.get_messages_page(batch_size, before)
+            for row in rows:
+                yield MessageRecord.from_dict(row)
+            if before is None:
+                return
+
+    def check(self):
+        """Fetch one id from the messages table"""
+        self.client.client.table(self.client.table_name).select('id').limit(1).execute()
+        return 'ok'
+
+    def describe(self):
+        """Read cache statistics"""
+        return {'read_cache': self.cache.snapshot()} if self.cache is not None else {}
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Messages in a list in this process
+
+    For development, tests and benchmarks: nothing is persisted and every
+    process, e.g. each gunicorn worker, has its own messages. Page keys are
+    record numbers; search scans the list.
+    """
+
+    name = 'memory'
+    storage_type = 'memory'
+
+    def __init__(self):
+        """Initialize an empty store"""
+        self._records = []
+        self._modified = None
+        self._lock = threading.Lock()
+
+    def save_many(self, messages):
+        """Append messages to the list"""
+        now = datetime.utcnow()
+        with self._lock:
+            first_id = len(self._records) + 1
+            for number, msg in enumerate(messages):
+                created_at = parse_timestamp(msg.get('created_at')) or now
+                self._records.append(MessageRecord(first_id + number, msg['name'], msg['email'],
+                                                   msg['message'], created_at, created_at))
+            self._modified = datetime.now(timezone.utc)
+            return len(self._records) - first_id + 1
+
+    def get_page(self, limit, key=None, preview=True, version=None):
+        """Slice a page off the list; keys are record numbers"""
+        key = _position(key)
+        with self._lock:
+            stop = len(self._records) if key is None else min(key, len(self._records))
+            start = max(stop - limit, 0)
+            records = self._records[start:stop]
+        records.reverse()
+        return records, start if start > 0 else None
+
+    def count(self, mode=None):
+        """Get the length of the list"""
+        return len(self._records)
+
+    def version(self):
+        """Use the number of records, which only ever grows, in this process"""
+        with self._lock:
+            count, modified = len(self._records), self._modified
+        if not count:
+            return 'memory-empty', None
+        return f'memory-{os.getpid()}-{count}', modified
+
+    def stream(self, batch_size=500, oldest_first=False, preview=True):
+        """Copy the list out one batch at a time"""
+        if oldest_first:
+            start = 0
+            while True:
+                with self._lock:
+                    records = self._records[start:start + batch_size]
+                yield from records
+                if len(records) < batch_size:
+                    return
+                start += batch_size
+
+        before = None
+        while True:
+            records, before = self.get_page(batch_size, before)
+            yield from records
+            if before is None:
+                return
+
+
+def resolve_storage_backend(config):
+    """
+    Resolve STORAGE_BACKEND to the backend the app will use
+
+    Args:
+        config: The application config
+
+    Returns:
+        str: 'database', 'file', 'supabase' or 'memory'
+
+    Raises:
+        ValueError: If STORAGE_BACKEND is not a known backend
+    """
+    name = (config.get('STORAGE_BACKEND') or 'auto').lower()
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {name!r}, expected one of {', '.join(STORAGE_BACKENDS)}")
+    if name == 'auto':
+        return 'database' if config.get('USE_DATABASE', False) else 'file'
+    return name
+
+
+def resolve_file_format(config):
+    """
+    Resolve FILE_STORAGE_FORMAT to the file format the app will use
+
+    'auto' keeps using MESSAGE_FILE while it exists and the segmented store
+    has not been created yet, so a deployment that only has messages.txt
+    does not start out showing an empty store.
+
+    Args:
+        config: The application config
+
+    Returns:
+        str: 'segmented' or 'legacy'
+
+    Raises:
+        ValueError: If FILE_STORAGE_FORMAT is unknown, or is 'segmented'
+            while only the legacy messages file exists
+    """
+    name = (config.get('FILE_STORAGE_FORMAT') or 'auto').lower()
+    if name not in FILE_STORAGE_FORMATS:
+        raise ValueError(f"Unknown FILE_STORAGE_FORMAT {name!r}, expected one of {', '.join(FILE_STORAGE_FORMATS)}")
+    if name == 'legacy':
+        return name
+
+    message_file = config.get('MESSAGE_FILE', 'messages.txt')
+    store_dir = config.get('MESSAGE_STORE_DIR', 'messages_store')
+    if not os.path.exists(message_file) or os.path.exists(os.path.join(store_dir, HEADER_FILE)):
+        return 'segmented'
+    if name == 'segmented':
+        raise ValueError(
+            f"FILE_STORAGE_FORMAT=segmented but {store_dir}/ does not exist while {message_file} does; "
+            f"run 'flask messages convert-legacy' or set FILE_STORAGE_FORMAT=legacy"
+        )
+    print(f"⚠️  Using legacy file storage: {message_file} exists and {store_dir}/ does not. "
+          f"Run 'flask messages convert-legacy' to move to the segmented store.")
+    return 'legacy'
+
+
+def create_storage(app):
+    """
+    Create the storage backend selected by the resolved STORAGE_BACKEND
+
+    Call after the read cache and the replica router are set up, so the
+    backend can use them.
+
+    Args:
+        app (Flask): The application
+
+    Returns:
+        StorageBackend: The backend
+
+    Raises:
+        ValueError: If the supabase backend is selected without credentials
+    """
+    config = app.config
+    name = config['STORAGE_BACKEND']
+    count_mode = config.get('MESSAGE_COUNT_MODE', 'counter')
+
+    if name == 'database':
+        return DatabaseBackend(
+            preview_length=config.get('MESSAGE_PREVIEW_LENGTH', 0) or None,
+            count_mode=count_mode,
+            cache=app.extensions.get('read_cache'),
+            router=app.extensions.get('replica_router'),
+            sticky_seconds=config.get('REPLICA_STICKY_SECONDS', 5)
+        )
+
+    if name == 'supabase':
+        if not config.get('SUPABASE_URL') or not config.get('SUPABASE_KEY'):
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set for STORAGE_BACKEND=supabase")
+        from .database import init_db
+        return SupabaseBackend(init_db(config['SUPABASE_URL'], config['SUPABASE_KEY']),
+                               cache=app.extensions.get('read_cache'), count_mode=count_mode)
+
+    if name == 'memory':
+        return MemoryBackend()
+
+    if config.get('FILE_STORAGE_FORMAT') != 'legacy':
+        return SegmentedFileBackend(MessageStore(
+            config.get('MESSAGE_STORE_DIR', 'messages_store'),
+            segment_max_bytes=config.get('MESSAGE_SEGMENT_MAX_BYTES', 16 * 1024 * 1024),
+            fsync=config.get('FILE_FSYNC', False),
+            group_commit_delay=config.get('FILE_GROUP_COMMIT_DELAY', 0.0)
+        ))
+    return LegacyFileBackend(LegacyFileWriter(
+        config.get('MESSAGE_FILE', 'messages.txt'),
+        fsync=config.get('FILE_FSYNC', False),
+        group_commit_delay=config.get('FILE_GROUP_COMMIT_DELAY', 0.0)
+    ))
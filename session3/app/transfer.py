@@ -0,0 +1,148 @@
+"""
+Bulk import and export of messages for the Flask Contact Form Application
+Used by the `flask messages import` / `flask messages export` commands
+
+Every backend moves rows in batches using its fastest bulk path:
+PostgreSQL COPY through psycopg, executemany on other databases, multi-row
+insert payloads for Supabase, and batched appends for the file stores.
+"""
+
+import csv
+import json
+from itertools import islice
+
+from .filestore import iter_file_records
+from .storage import SupabaseBackend, record_to_dict
+from .utils import get_storage
+
+# Fields written by export and understood by import; import assigns new ids
+EXPORT_FIELDS = ('id', 'name', 'email', 'message', 'created_at', 'updated_at')
+
+FORMATS = ('ndjson', 'csv')
+IMPORT_FORMATS = FORMATS + ('legacy',)
+# 'storage' is the backend the app is configured for (see app/storage.py)
+BACKENDS = ('storage', 'supabase')
+
+
+def batched(iterable, size):
+    """
+    Split an iterable into lists of at most size items
+
+    Args:
+        iterable: The items to split
+        size (int): Maximum batch length
+
+    Yields:
+        list: The next batch
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_records(path, fmt):
+    """
+    Read message records from an export file or a legacy messages.txt
+
+    Args:
+        path (str): File to read
+        fmt (str): 'ndjson', 'csv' or 'legacy'
+
+    Yields:
+        dict: Message data with name, email, message and created_at keys
+    """
+    if fmt == 'legacy':
+        yield from iter_file_records(path)
+        return
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def write_records(records, stream, fmt):
+    """
+    Write message records to an open text stream
+
+    Args:
+        records: Iterable of message dicts
+        stream: Text stream to write to
+        fmt (str): 'ndjson' or 'csv'
+
+    Yields:
+        int: Running number of records written, once per record
+    """
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            stream.write(json.dumps({field: record.get(field) for field in EXPORT_FIELDS},
+                                    ensure_ascii=False))
+            stream.write('\n')
+
+    for written, record in enumerate(records, start=1):
+        write(record)
+        yield written
+
+
+def get_backend(backend, supabase=None):
+    """
+    Get the storage backend to export from or import into
+
+    Args:
+        backend (str): 'storage' or 'supabase'
+        supabase (SupabaseDB, optional): Client for the supabase backend
+
+    Returns:
+        StorageBackend: The app's backend, or one for the given Supabase client
+    """
+    if backend == 'supabase':
+        return SupabaseBackend(supabase)
+    return get_storage()
+
+
+def export_messages(backend, batch_size=1000, supabase=None):
+    """
+    Iterate over every stored message, oldest first
+
+    Args:
+        backend (str): 'storage' or 'supabase'
+        batch_size (int): Number of messages fetched per round trip
+        supabase (SupabaseDB, optional): Client for the supabase backend
+
+    Yields:
+        dict: Message records with the EXPORT_FIELDS keys
+    """
+    storage = get_backend(backend, supabase)
+    for record in storage.stream(batch_size, oldest_first=True, preview=False):
+        yield record_to_dict(record)
+
+
+def import_batch(backend, batch, supabase=None):
+    """
+    Save one batch of imported records with the backend's bulk path
+
+    Args:
+        backend (str): 'storage' or 'supabase'
+        batch (list): Message dicts with name, email, message and created_at
+        supabase (SupabaseDB, optional): Client for the supabase backend
+
+    Raises:
+        Exception: If the batch could not be saved
+    """
+    get_backend(backend, supabase).save_many([{
+        'name': record['name'],
+        'email': record['email'],
+        'message': record['message'],
+        'created_at': record.get('created_at') or None,
+        'updated_at': record.get('updated_at') or None
+    } for record in batch])
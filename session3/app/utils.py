@@ -1,63 +1,140 @@
 """
 Utility functions for the Flask Contact Form Application
-Supports both file-based storage and database (PostgreSQL/SQLite) via SQLAlchemy
+Stores and reads messages through the storage backend resolved by create_app
+(database, Supabase, file or in-memory, see app/storage.py)
 """
 
-import os
+import json
+import base64
+from datetime import datetime
 from flask import current_app
-from .models import Message
+from markupsafe import escape
+from .metrics import timed_operation
+from .storage import format_timestamp
 
 
-def get_message_count():
+def get_storage():
+    """
+    Get the storage backend resolved by create_app
+
+    Returns:
+        StorageBackend: The backend
+    """
+    return current_app.extensions['storage']
+
+
+def get_fragment_cache():
+    """
+    Get the cache of rendered message fragments
+
+    Returns:
+        FragmentCache: The cache, or None if FRAGMENT_CACHE_ENABLED is off
+    """
+    return current_app.extensions.get('fragment_cache')
+
+
+def encode_cursor(key):
+    """
+    Encode a pagination key as an opaque, URL-safe cursor string
+
+    Args:
+        key: JSON-serializable pagination key
+
+    Returns:
+        str: The encoded cursor
+    """
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor (str): The encoded cursor
+
+    Returns:
+        The decoded pagination key
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+@timed_operation('get_message_count')
+def get_message_count(mode=None):
     """
     Helper function to count total messages
 
+    Args:
+        mode (str, optional): Database count mode ('exact', 'counter' or
+            'estimated'), defaults to MESSAGE_COUNT_MODE
+
     Returns:
         int: The number of messages stored
     """
     try:
-        # Use database if enabled
-        if current_app.config.get('USE_DATABASE', False):
-            return Message.count_all()
-
-        # Fallback to file-based storage
-        if os.path.exists('messages.txt'):
-            with open('messages.txt', 'r') as f:
-                content = f.read()
-                # Count separator lines as message indicators
-                return content.count('=' * 50)
-        return 0
+        return get_storage().count(mode)
     except Exception as e:
         print(f"Error getting message count: {e}")
         return 0
 
 
+@timed_operation('get_messages_version')
+def get_messages_version():
+    """
+    Get a cheap version of the stored messages for conditional requests
+
+    The version changes whenever a message is added, updated or deleted:
+    the database combines the message counter with the newest id,
+    created_at and updated_at (index lookups, no scan); segmented file
+    storage uses the header's record count and modification time; the
+    legacy file its size and modification time. Deliberately bypasses the
+    read cache so writes by other processes are seen immediately.
+
+    Returns:
+        tuple: (version string, last modification time as an aware UTC
+            datetime or None if nothing is stored)
+    """
+    return get_storage().version()
+
+
+@timed_operation('save_message')
 def save_message(name, email, message, timestamp=None):
     """
-    Save a message to storage (database or file)
+    Save a message to storage
 
     Args:
         name (str): The sender's name
         email (str): The sender's email address
         message (str): The message content
-        timestamp (str, optional): The timestamp (used only for file storage)
+        timestamp (str, optional): The timestamp (stored by file storage)
 
     Returns:
         bool: True if successful, False otherwise
     """
+    storage = get_storage()
+
+    # Hand the message to the write-behind queue if it is enabled
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind is not None:
+        storage.note_write()
+        return write_behind.submit({
+            'name': name,
+            'email': email,
+            'message': message,
+            'timestamp': timestamp,
+            'created_at': datetime.utcnow()
+        })
+
     try:
-        # Use database if enabled
-        if current_app.config.get('USE_DATABASE', False):
-            Message.create(name=name, email=email, message=message)
-            return True
-
-        # Fallback to file-based storage
-        with open('messages.txt', 'a', encoding='utf-8') as f:
-            f.write(f"\n{'='*50}\n")
-            f.write(f"Timestamp: {timestamp}\n")
-            f.write(f"Name: {name}\n")
-            f.write(f"Email: {email}\n")
-            f.write(f"Message: {message}\n")
+        storage.save({'name': name, 'email': email, 'message': message, 'timestamp': timestamp})
         return True
 
     except Exception as e:
@@ -65,60 +142,220 @@ def save_message(name, email, message, timestamp=None):
         return False
 
 
+@timed_operation('save_messages')
+def save_messages(messages):
+    """
+    Save several messages to storage in one batch
+
+    Uses the backend's bulk path: COPY or one bulk insert and commit on the
+    database, one multi-row request on Supabase, one append per segment on
+    segmented file storage and a single write on the legacy file.
+
+    Args:
+        messages (list): Dicts with name, email and message keys, plus an
+            optional timestamp (file storage) and created_at (database)
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        get_storage().save_many(messages)
+        return True
+
+    except Exception as e:
+        print(f"Error saving messages: {e}")
+        return False
+
+
+@timed_operation('get_all_messages')
 def get_all_messages():
     """
-    Retrieve all messages from storage
+    Retrieve all messages from storage, newest first
 
     Returns:
-        list or str: List of Message objects (database) or formatted string (file)
+        list: Records of (id, name, email, message, created_at, updated_at),
+            or None if reading failed
     """
     try:
-        # Use database if enabled
-        if current_app.config.get('USE_DATABASE', False):
-            return Message.get_all()
-
-        # Fallback to file-based storage
-        if os.path.exists('messages.txt'):
-            with open('messages.txt', 'r', encoding='utf-8') as f:
-                return f.read()
-        return None
+        return list(get_storage().stream(current_app.config.get('MESSAGES_STREAM_BATCH_SIZE', 500)))
 
     except Exception as e:
         print(f"Error retrieving messages: {e}")
         return None
 
 
-def format_messages_for_display(messages):
+@timed_operation('get_messages_page')
+def get_messages_page(cursor=None, per_page=None, version=None, preview=True):
     """
-    Format messages for HTML display
+    Retrieve one page of messages from storage, newest first
 
     Args:
-        messages: Either a list of Message objects (database) or string (file)
+        cursor (str, optional): Cursor returned for the previous page
+        per_page (int, optional): Page size, clamped to MAX_MESSAGES_PER_PAGE
+        version (str, optional): Version from get_messages_version; it is
+            part of the read-cache key, so a page cached before another
+            process wrote is not served under the newer version's ETag
+        preview (bool): Cut messages to MESSAGE_PREVIEW_LENGTH; False
+            returns whole messages
 
     Returns:
-        str: HTML-formatted message content
+        tuple: (list of (id, name, email, message, created_at, updated_at)
+            records, cursor for the next page or None if this is the last
+            page)
+
+    Raises:
+        ValueError: If the cursor is malformed
     """
+    default_size = current_app.config.get('MESSAGES_PER_PAGE', 50)
+    max_size = current_app.config.get('MAX_MESSAGES_PER_PAGE', 500)
+    limit = min(max(per_page or default_size, 1), max_size)
+    key = decode_cursor(cursor) if cursor else None
+
     try:
-        # If messages is a list of Message objects from database
-        if isinstance(messages, list) and messages and hasattr(messages[0], 'to_dict'):
-            html_parts = []
-            for msg in messages:
-                msg_dict = msg.to_dict()
-                html_parts.append(f"""
+        messages, next_key = get_storage().get_page(limit, key, preview=preview, version=version)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return messages, encode_cursor(next_key) if next_key is not None else None
+
+
+def iter_messages(batch_size=None):
+    """
+    Iterate over every stored message, newest first, in bounded batches
+
+    Args:
+        batch_size (int, optional): Number of messages fetched per batch,
+            defaults to MESSAGES_STREAM_BATCH_SIZE
+
+    Yields:
+        Records of (id, name, email, message, created_at, updated_at)
+    """
+    batch_size = batch_size or current_app.config.get('MESSAGES_STREAM_BATCH_SIZE', 500)
+    yield from get_storage().stream(batch_size)
+
+
+@timed_operation('search_messages')
+def search_messages(term, limit=50, offset=0):
+    """
+    Search messages by name, email or message content
+
+    Args:
+        term (str): The term to search for
+        limit (int): Maximum number of messages to return
+        offset (int): Number of matches to skip
+
+    Returns:
+        list: Matching records, best matches first where the backend
+            ranks them, otherwise newest first
+    """
+    return get_storage().search(term, limit=limit, offset=offset)
+
+
+def format_message_fields(name, email, message, created_at):
+    """
+    Format the displayed fields of a message as an HTML fragment
+
+    The fields are HTML-escaped, so user input is shown as text.
+
+    Args:
+        name (str): The sender's name
+        email (str): The sender's email address
+        message (str): The message content (or its preview)
+        created_at (str): The timestamp as displayed
+
+    Returns:
+        str: HTML fragment for the message
+    """
+    return f"""
                     <div class="message-item">
-                        <strong>Name:</strong> {msg_dict.get('name', 'N/A')}<br>
-                        <strong>Email:</strong> {msg_dict.get('email', 'N/A')}<br>
-                        <strong>Message:</strong> {msg_dict.get('message', 'N/A')}<br>
-                        <strong>Timestamp:</strong> {msg_dict.get('created_at', 'N/A')}
+                        <strong>Name:</strong> {escape(name)}<br>
+                        <strong>Email:</strong> {escape(email)}<br>
+                        <strong>Message:</strong> {escape(message)}<br>
+                        <strong>Timestamp:</strong> {escape(created_at)}
                     </div>
                     <hr>
-                """)
-            return ''.join(html_parts)
+                """
+
+
+def format_message_html(msg, cache_fill=True):
+    """
+    Format a single message as an HTML fragment
+
+    Messages with an id are looked up in the fragment cache by (id,
+    updated_at), or (id, created_at) for file records, which are never
+    updated; a miss renders and escapes the message once and caches it.
+
+    Args:
+        msg: A record of (id, name, email, message, created_at, updated_at)
+            as returned by the storage backend
+        cache_fill (bool): Store newly rendered fragments in the cache;
+            full scans pass False so they do not evict the fragments of
+            the first pages
+
+    Returns:
+        str: HTML fragment for the message
+    """
+    # Records render straight from the tuple, without a dict per message
+    message_id, name, email, message, created_at, updated_at = msg
+    key = (message_id, updated_at or created_at)
+
+    cache = get_fragment_cache() if message_id is not None else None
+    if cache is not None:
+        fragment = cache.get(key)
+        if fragment is not None:
+            return fragment
+
+    fragment = format_message_fields(name, email, message, format_timestamp(created_at))
+    if cache is not None and cache_fill:
+        cache.set(key, fragment)
+    return fragment
+
+
+def iter_message_fragments(batch_size=None):
+    """
+    Render every stored message as HTML, one batch per yielded chunk
+
+    Joining a batch of fragments before yielding keeps the number of
+    writes to the client low while holding only one batch in memory.
+
+    Args:
+        batch_size (int, optional): Number of messages per yielded chunk,
+            defaults to MESSAGES_STREAM_BATCH_SIZE
 
-        # If messages is a string (from file), convert to HTML
-        elif isinstance(messages, str):
-            return messages.replace('\n', '<br>').replace('='*50, '<hr>')
+    Yields:
+        str: HTML for a batch of messages
+    """
+    batch_size = batch_size or current_app.config.get('MESSAGES_STREAM_BATCH_SIZE', 500)
+    html_parts = []
+    try:
+        for msg in iter_messages(batch_size):
+            html_parts.append(format_message_html(msg, cache_fill=False))
+            if len(html_parts) >= batch_size:
+                yield ''.join(html_parts)
+                html_parts = []
+        if html_parts:
+            yield ''.join(html_parts)
+
+    except Exception as e:
+        # Headers are already sent, so report the failure inline
+        print(f"Error streaming messages: {e}")
+        if html_parts:
+            yield ''.join(html_parts)
+        yield '<p class="error">Error displaying remaining messages</p>'
 
+
+def format_messages_for_display(messages):
+    """
+    Format messages for HTML display
+
+    Args:
+        messages (list): Records as returned by the storage backend
+
+    Returns:
+        str: HTML-formatted message content
+    """
+    try:
+        if messages:
+            return ''.join(format_message_html(msg) for msg in messages)
         return "No messages available"
 
     except Exception as e:
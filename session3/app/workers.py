@@ -0,0 +1,186 @@
+"""
+Production serving support for the Flask Contact Form Application
+
+Builds the gunicorn settings from config.py (used by gunicorn.conf.py),
+re-initializes per-process state in workers forked from a preloading
+master, and counts the requests each worker process has served.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# WSGI_WORKER_CLASS values and the gunicorn worker classes they select
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'threaded': 'gthread',
+    'gevent': 'gevent',
+    'async': 'gevent',
+}
+
+
+class WorkerStats:
+    """
+    Requests served by the current worker process
+
+    The counters start over in every process, so a worker forked from a
+    preloading master does not report the master's numbers.
+    """
+
+    def __init__(self, worker_class='sync', max_requests=0):
+        """
+        Initialize the counters
+
+        Args:
+            worker_class (str): The configured WSGI_WORKER_CLASS
+            max_requests (int): Requests after which the worker is recycled
+                (0 if it never is)
+        """
+        self.worker_class = worker_class
+        self.max_requests = max_requests
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start counting for the current process"""
+        with self._lock:
+            self.pid = os.getpid()
+            self.requests = 0
+            self.in_flight = 0
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.monotonic()
+
+    def request_started(self):
+        """Count one request; called before every request"""
+        if self.pid != os.getpid():
+            self.reset()
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def request_finished(self, error=None):
+        """Mark a request as done; called on request teardown"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def snapshot(self):
+        """
+        Get the counters of this worker
+
+        Returns:
+            dict: pid, worker class, requests served and in flight, the
+                recycling limit and uptime
+        """
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'worker_class': self.worker_class,
+                'requests': self.requests if self.pid == os.getpid() else 0,
+                'in_flight': self.in_flight if self.pid == os.getpid() else 0,
+                'max_requests': self.max_requests,
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'uptime_seconds': round(time.monotonic() - self._started, 1),
+            }
+
+
+def init_worker_stats(app):
+    """
+    Count requests per worker process
+
+    Args:
+        app (Flask): The application
+    """
+    stats = WorkerStats(
+        worker_class=app.config.get('WSGI_WORKER_CLASS', 'sync'),
+        max_requests=app.config.get('WSGI_MAX_REQUESTS', 0)
+    )
+    app.extensions['worker_stats'] = stats
+    app.before_request(stats.request_started)
+    app.teardown_request(stats.request_finished)
+
+
+def get_worker_class(config):
+    """
+    Get the gunicorn worker class for WSGI_WORKER_CLASS
+
+    Args:
+        config: Configuration class or mapping with the WSGI_* settings
+
+    Returns:
+        str: 'sync', 'gthread' or 'gevent'
+
+    Raises:
+        ValueError: If WSGI_WORKER_CLASS is not a known worker class
+    """
+    name = _setting(config, 'WSGI_WORKER_CLASS', 'sync')
+    if name not in WORKER_CLASSES:
+        raise ValueError(f"Unknown WSGI_WORKER_CLASS {name!r}, expected one of {', '.join(WORKER_CLASSES)}")
+    return WORKER_CLASSES[name]
+
+
+def server_settings(config):
+    """
+    Build gunicorn settings from the WSGI_* configuration
+
+    Args:
+        config: Configuration class or mapping with HOST, PORT and the
+            WSGI_* settings
+
+    Returns:
+        dict: gunicorn setting names and values
+    """
+    worker_class = get_worker_class(config)
+    workers = _setting(config, 'WSGI_WORKERS', 0)
+    if workers <= 0:
+        # Sync workers block on I/O, so run more of them than there are cores;
+        # threaded and gevent workers overlap I/O within each process
+        cores = os.cpu_count() or 1
+        workers = cores * 2 + 1 if worker_class == 'sync' else cores
+
+    settings = {
+        'bind': f"{_setting(config, 'HOST', '0.0.0.0')}:{_setting(config, 'PORT', 8000)}",
+        'workers': workers,
+        'worker_class': worker_class,
+        'preload_app': _setting(config, 'WSGI_PRELOAD', True),
+        'max_requests': _setting(config, 'WSGI_MAX_REQUESTS', 0),
+        'max_requests_jitter': _setting(config, 'WSGI_MAX_REQUESTS_JITTER', 0),
+        'timeout': _setting(config, 'WSGI_TIMEOUT', 30),
+        'graceful_timeout': _setting(config, 'WSGI_GRACEFUL_TIMEOUT', 30),
+        'keepalive': _setting(config, 'WSGI_KEEPALIVE', 2),
+    }
+    if worker_class == 'gthread':
+        settings['threads'] = _setting(config, 'WSGI_THREADS', 4)
+    elif worker_class == 'gevent':
+        settings['worker_connections'] = _setting(config, 'WSGI_WORKER_CONNECTIONS', 1000)
+    return settings
+
+
+def after_fork(app):
+    """
+    Re-initialize per-process state in a worker forked from the master
+
+    Connections opened by the master (e.g. for schema verification) must not
+    be shared between processes, so the worker drops its copies without
+    closing them and opens its own on first use. Background threads (health
+    snapshot, write-behind) restart by themselves when they see a new pid.
+
+    Args:
+        app (Flask): The preloaded application
+    """
+    from .models import db
+    if app.config.get('USE_DATABASE', False):
+        with app.app_context():
+            db.engine.dispose(close=False)
+    router = app.extensions.get('replica_router')
+    if router is not None:
+        router.dispose(close=False)
+    stats = app.extensions.get('worker_stats')
+    if stats is not None:
+        stats.reset()
+
+
+def _setting(config, name, default):
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
@@ -0,0 +1,210 @@
+"""
+Write-behind queue for the Flask Contact Form Application
+
+Submissions are put on a bounded in-memory queue and a background thread
+saves them in batches with save_messages, so a burst of submissions costs one
+transaction (or one file write) per batch instead of one per message.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+from .utils import save_messages
+
+DURABILITY_MODES = ('async', 'sync')
+
+
+class _Entry:
+    """A queued message, plus the event a synchronous submitter waits on"""
+
+    __slots__ = ('item', 'done', 'result')
+
+    def __init__(self, item, done=None):
+        self.item = item
+        self.done = done
+        self.result = False
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of pending messages flushed in batches by a worker thread
+
+    A batch is flushed once it holds batch_size messages or its oldest
+    message has waited max_latency seconds. When the queue stays full for
+    enqueue_timeout seconds the submitting request saves its message itself,
+    which slows submitters down instead of dropping messages.
+
+    Durability modes:
+        'async': submit returns as soon as the message is queued
+        'sync': submit waits until the batch holding the message is saved
+            (group commit), so success means the message is stored
+    """
+
+    def __init__(self, app, max_size=10000, batch_size=500, max_latency=0.05,
+                 durability='async', enqueue_timeout=1.0, sync_timeout=30.0):
+        """
+        Initialize the queue; the worker thread starts on first use
+
+        Args:
+            app (Flask): The application, used for the worker's app context
+            max_size (int): Maximum number of queued messages
+            batch_size (int): Maximum number of messages saved per batch
+            max_latency (float): Seconds a message may wait for its batch
+            durability (str): 'async' or 'sync', see the class docstring
+            enqueue_timeout (float): Seconds to wait for room in a full queue
+            sync_timeout (float): Seconds a 'sync' submitter waits for its batch
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown write-behind durability: {durability!r}")
+
+        self.app = app
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.durability = durability
+        self.enqueue_timeout = enqueue_timeout
+        self.sync_timeout = sync_timeout
+
+        self.stats = {'queued': 0, 'saved': 0, 'failed': 0, 'batches': 0, 'overflow': 0}
+        self._stats_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._closing = threading.Event()
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+
+    def submit(self, item):
+        """
+        Queue a message for saving
+
+        Must be called inside an application context, which is used to save
+        the message directly when the queue is full or shut down.
+
+        Args:
+            item (dict): Message data as accepted by save_messages
+
+        Returns:
+            bool: True if the message was queued ('async') or saved ('sync')
+        """
+        if self._closing.is_set():
+            return save_messages([item])
+
+        self._ensure_started()
+        entry = _Entry(item, threading.Event() if self.durability == 'sync' else None)
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            # Backpressure: save in the request instead of growing the queue
+            self._count('overflow')
+            return save_messages([item])
+
+        self._count('queued')
+        if entry.done is None:
+            return True
+        if not entry.done.wait(self.sync_timeout):
+            print("Error saving message: timed out waiting for write-behind batch")
+            return False
+        return entry.result
+
+    def snapshot(self):
+        """
+        Get the counters and the number of pending messages
+
+        Returns:
+            dict: Queue statistics
+        """
+        with self._stats_lock:
+            return {**self.stats, 'pending': self.pending(), 'max_size': self.max_size}
+
+    def pending(self):
+        """
+        Get the number of messages waiting to be saved
+
+        Returns:
+            int: The queue length
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def close(self, timeout=None):
+        """
+        Stop accepting queued writes and save everything still pending
+
+        Args:
+            timeout (float, optional): Seconds to wait for the drain
+        """
+        self._closing.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a worker process that inherited
+        # this object starts its own queue and thread
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._closing.is_set():
+                    return
+                continue
+
+            # Collect more messages until the batch is full or the oldest
+            # one has waited max_latency
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            with self.app.app_context():
+                if save_messages([entry.item for entry in batch]):
+                    results = [True] * len(batch)
+                elif len(batch) > 1:
+                    # Retry one by one so a single bad message does not
+                    # lose the whole batch
+                    results = [save_messages([entry.item]) for entry in batch]
+                else:
+                    results = [False]
+        except Exception as e:
+            print(f"Error flushing write-behind batch: {e}")
+            results = [False] * len(batch)
+
+        saved = sum(1 for result in results if result)
+        with self._stats_lock:
+            self.stats['batches'] += 1
+            self.stats['saved'] += saved
+            self.stats['failed'] += len(results) - saved
+        for entry, result in zip(batch, results):
+            entry.result = result
+            if entry.done is not None:
+                entry.done.set()
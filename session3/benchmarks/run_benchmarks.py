@@ -0,0 +1,487 @@
+"""
+Benchmark suite for the Flask Contact Form Application
+
+Loads a synthetic dataset into each storage backend and measures /submit,
+/messages, /health and the storage search, either through the Flask test
+client or over HTTP against a real (threaded werkzeug) WSGI server. Every
+backend/dataset combination runs in a fresh process, so peak RSS is
+measured per combination.
+
+Results are printed as a table and saved as JSON; pass a previous results
+file with --baseline to exit with status 1 when a scenario got slower.
+
+Usage (from the session3 directory):
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --backends file sqlite --sizes 10000 100000 --mode both
+    python benchmarks/run_benchmarks.py --baseline benchmark-results.json --output new.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from urllib.parse import urlencode
+
+# Make the app package and config importable when run as a script
+SESSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SESSION_DIR)
+
+# 'memory' is TestingConfig's in-memory SQLite database
+BACKENDS = ('file', 'legacy', 'sqlite', 'memory')
+SCENARIOS = ('submit', 'messages', 'health', 'search')
+MODES = ('client', 'wsgi')
+
+# Metrics compared against the baseline; True means higher is better
+COMPARED_METRICS = {'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'throughput_rps': True}
+
+WORDS = ('hello', 'question', 'order', 'invoice', 'support', 'refund', 'delivery', 'account',
+         'password', 'feedback', 'great', 'problem', 'thanks', 'urgent', 'meeting', 'pricing')
+SEARCH_TERMS = ('invoice', 'refund delivery', 'password', 'great feedback', 'nomatchatall')
+
+
+def synthetic_messages(count, seed=42):
+    """
+    Generate reproducible message dicts
+
+    Args:
+        count (int): Number of messages
+        seed (int): Random seed
+
+    Yields:
+        dict: Message data accepted by save_messages
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        created_at = start + timedelta(seconds=i * 7)
+        yield {
+            'name': f'Sender {rng.randrange(5000)}',
+            'email': f'user{rng.randrange(50000)}@example.com',
+            'message': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+            'timestamp': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'created_at': created_at,
+        }
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors):
+    """
+    Reduce per-request latencies to the reported statistics
+
+    Args:
+        latencies (list): Seconds per request
+        elapsed (float): Wall-clock seconds for all requests
+        errors (int): Number of failed requests
+
+    Returns:
+        dict: Latency percentiles in milliseconds, throughput and errors
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_config(backend, workdir):
+    """
+    Build the configuration class for a backend
+
+    Args:
+        backend (str): One of BACKENDS
+        workdir (str): Directory for the files the backend writes
+
+    Returns:
+        type: A Config subclass
+    """
+    from config import Config, TestingConfig
+
+    base = TestingConfig if backend == 'memory' else Config
+    settings = {
+        'DEBUG': False,
+        'FAST_START': False,
+        'QUERY_PROFILING_ENABLED': False,
+        'WRITE_BEHIND_ENABLED': False,
+        'READ_CACHE_ENABLED': False,
+        'STORAGE_BACKEND': 'auto',
+        'USE_DATABASE': backend in ('sqlite', 'memory'),
+        'MESSAGE_FILE': os.path.join(workdir, 'messages.txt'),
+        'MESSAGE_STORE_DIR': os.path.join(workdir, 'messages_store'),
+        'FILE_STORAGE_FORMAT': 'legacy' if backend == 'legacy' else 'segmented',
+    }
+    if backend == 'sqlite':
+        settings['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'messages.db')}"
+    return type(f'Benchmark{backend.title()}Config', (base,), settings)
+
+
+def load_dataset(app, size, batch_size=5000):
+    """Bulk-load size synthetic messages with save_messages"""
+    from app.utils import save_messages
+
+    batch = []
+    with app.app_context():
+        for message in synthetic_messages(size):
+            batch.append(message)
+            if len(batch) >= batch_size:
+                if not save_messages(batch):
+                    raise RuntimeError('Loading the benchmark dataset failed')
+                batch = []
+        if batch and not save_messages(batch):
+            raise RuntimeError('Loading the benchmark dataset failed')
+
+
+class TestClientDriver:
+    """Sends requests through the Flask test client, one at a time"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class WSGIServerDriver:
+    """Runs the app on a threaded werkzeug server and sends HTTP requests"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(
+                '127.0.0.1', self.server.server_port, timeout=60)
+        return connection
+
+    def request(self, method, path, form=None):
+        body = urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            # Reconnect on the next request
+            connection.close()
+            self.local.connection = None
+            raise
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_requests(driver, count, concurrency, make_request):
+    """
+    Send count requests from concurrency threads
+
+    Args:
+        driver: TestClientDriver or WSGIServerDriver
+        count (int): Total number of requests
+        concurrency (int): Number of client threads
+        make_request (callable): Returns (method, path, form) for request i
+
+    Returns:
+        dict: Summary as returned by summarize
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(count))
+
+    def worker():
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            method, path, form = make_request(i)
+            started = time.perf_counter()
+            try:
+                status = driver.request(method, path, form)
+                ok = status < 400
+            except Exception:
+                ok = False
+            local_latencies.append(time.perf_counter() - started)
+            local_errors += 0 if ok else 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - started, errors[0])
+
+
+def run_search(app, count):
+    """Time the storage backend's search directly, cycling through SEARCH_TERMS"""
+    from app.models import db
+    from app.utils import search_messages
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    with app.app_context():
+        for i in range(count):
+            term = SEARCH_TERMS[i % len(SEARCH_TERMS)]
+            request_started = time.perf_counter()
+            try:
+                search_messages(term, limit=50)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - request_started)
+            db.session.remove()
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def run_combination(backend, size, modes, scenarios, requests, concurrency):
+    """
+    Benchmark one backend with one dataset size; runs in a child process
+
+    Returns:
+        list: Result dicts, one per mode and scenario
+    """
+    import contextlib
+    import io
+
+    from app import create_app
+
+    workdir = tempfile.mkdtemp(prefix=f'bench-{backend}-')
+    try:
+        # create_app reports its setup on stdout; keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = create_app(make_config(backend, workdir))
+
+        load_started = time.perf_counter()
+        load_dataset(app, size)
+        load_seconds = round(time.perf_counter() - load_started, 2)
+
+        results = []
+        rng = random.Random(7)
+
+        def submit_form(i):
+            return ('POST', '/submit', {
+                'name': f'Bench {i}', 'email': f'bench{i}@example.com',
+                'message': ' '.join(rng.choice(WORDS) for _ in range(20))})
+
+        requests_for = {
+            'submit': submit_form,
+            'messages': lambda i: ('GET', '/messages', None),
+            'health': lambda i: ('GET', '/health', None),
+        }
+
+        for mode in modes:
+            for scenario in scenarios:
+                if scenario == 'search':
+                    # Search is a storage helper, not a route; it has no mode.
+                    # File storage has no search index and only scans
+                    if backend in ('file', 'legacy') or mode != modes[0]:
+                        continue
+                    summary = run_search(app, requests)
+                    scenario_mode = 'direct'
+                    threads = 1
+                else:
+                    driver = TestClientDriver(app) if mode == 'client' else WSGIServerDriver(app)
+                    try:
+                        # Client mode drives the app from one thread; the test
+                        # client is not meant to be shared between threads. In-memory
+                        # SQLite shares a single connection, which cannot take
+                        # concurrent writes
+                        threads = 1 if mode == 'client' or backend == 'memory' else concurrency
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            summary = run_requests(driver, requests, threads, requests_for[scenario])
+                    finally:
+                        driver.close()
+                    scenario_mode = mode
+
+                results.append({
+                    'backend': backend,
+                    'dataset_size': size,
+                    'mode': scenario_mode,
+                    'scenario': scenario,
+                    'concurrency': threads if scenario_mode == 'wsgi' else 1,
+                    'load_seconds': load_seconds,
+                    **summary,
+                    'peak_rss_mb': peak_rss_mb(),
+                })
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def result_key(result):
+    """Identify a result for comparison across runs"""
+    return (result['backend'], result['dataset_size'], result['mode'], result['scenario'])
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare results with a baseline run
+
+    Args:
+        results (list): Current result dicts
+        baseline (list): Result dicts of the baseline run
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        tuple: (number of results found in the baseline, list of
+            human-readable descriptions of the regressions)
+    """
+    previous = {result_key(result): result for result in baseline}
+    compared = 0
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        compared += 1
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old_value, new_value = old.get(metric), result.get(metric)
+            if not old_value or new_value is None:
+                continue
+            if higher_is_better:
+                regressed = new_value < old_value * (1 - tolerance)
+            else:
+                regressed = new_value > old_value * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{'/'.join(str(part) for part in result_key(result))} "
+                                   f"{metric}: {old_value} -> {new_value}")
+    return compared, regressions
+
+
+def git_revision():
+    """Current git commit, if available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SESSION_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    """Print the results as an aligned table"""
+    columns = ('backend', 'dataset_size', 'mode', 'scenario', 'p50_ms', 'p95_ms', 'p99_ms',
+               'throughput_rps', 'errors', 'peak_rss_mb')
+    rows = [[str(result[column]) for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) if rows else len(column)
+              for i, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the contact form app.')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=['file', 'sqlite', 'memory'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000],
+                        help='Dataset sizes to load before measuring (e.g. 10000 100000 1000000).')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--mode', choices=MODES + ('both',), default='client',
+                        help='Drive the app through the test client, a WSGI server, or both.')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Client threads in wsgi mode.')
+    parser.add_argument('--output', default='benchmark-results.json', help='JSON file to write.')
+    parser.add_argument('--baseline', help='Previous results JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown before a scenario counts as a regression.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    modes = MODES if args.mode == 'both' else (args.mode,)
+
+    results = []
+    for backend in args.backends:
+        for size in args.sizes:
+            print(f"⏱️  {backend} with {size:,} messages...", flush=True)
+            # A fresh process per combination keeps peak RSS and caches separate
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                results.extend(executor.submit(run_combination, backend, size, modes, args.scenarios,
+                                               args.requests, args.concurrency).result())
+
+    print()
+    print_table(results)
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'arguments': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        compared, regressions = find_regressions(results, baseline, args.tolerance)
+        if not compared:
+            print(f"\n⚠️  No result matches {args.baseline} (backend, dataset size, mode and scenario differ)")
+            return 1
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} in {compared} results compared with {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Multi-process stress test for the file storage writers
+
+Starts several processes with several threads each, all appending messages
+to the same legacy messages file and the same segmented store at once, then
+reads everything back and checks that no record is torn, lost, duplicated
+or renumbered:
+
+* every record parses and its message body matches the checksum written
+  into it, so interleaved or partial writes are detected
+* each writer's records are all present, once, in the order it wrote them
+* the segmented store's ids run from 1 to the total without gaps and its
+  data files hold no bytes beyond the indexed records
+
+Message sizes vary from a few bytes to well past the pipe and page sizes
+(--max-size), so large writes are exercised as well.
+
+Exits with status 1 if any check fails.
+
+Usage (from the session3 directory):
+    python benchmarks/stress_file_writes.py
+    python benchmarks/stress_file_writes.py --processes 8 --threads 8 --messages 500 --fsync
+    python benchmarks/stress_file_writes.py --formats segmented --group-commit-delay 0.002
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import get_context
+
+# Make the app package importable when run as a script
+SESSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SESSION_DIR)
+
+from app.filestore import (INDEX_ENTRY, LegacyFileWriter, MessageStore,  # noqa: E402
+                           format_file_record, iter_file_records)
+
+FORMATS = ('legacy', 'segmented')
+
+
+def make_message(writer, seq, size, rng):
+    """Build a message whose first line identifies the writer and checksums the body"""
+    # End with a non-newline, since the legacy parser strips trailing newlines
+    body = ''.join(rng.choices('abcdefghij klmnop\nqrstuvwxyz', k=size)) + '.'
+    digest = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    return f"{writer}:{seq}:{digest}\n{body}"
+
+
+def check_message(message):
+    """Return (writer, seq) if the message is intact, otherwise None"""
+    head, sep, body = (message or '').partition('\n')
+    parts = head.split(':')
+    if not sep or len(parts) != 3:
+        return None
+    writer, seq, digest = parts
+    if hashlib.sha1(body.encode('utf-8')).hexdigest() != digest:
+        return None
+    return writer, int(seq)
+
+
+def run_writer(args):
+    """Append messages from several threads of one process"""
+    fmt, target, process, threads, messages, max_size, fsync, delay, seed = args
+    if fmt == 'legacy':
+        writer = LegacyFileWriter(target, fsync=fsync, group_commit_delay=delay)
+    else:
+        writer = MessageStore(target, segment_max_bytes=256 * 1024, fsync=fsync,
+                              group_commit_delay=delay)
+    errors = []
+
+    def work(thread):
+        rng = random.Random(seed * 1000003 + process * 1009 + thread)
+        name = f"p{process}t{thread}"
+        try:
+            for seq in range(messages):
+                # Mostly small messages with the occasional large one
+                size = rng.randint(1, 200) if rng.random() < 0.9 else rng.randint(4096, max_size)
+                message = make_message(name, seq, size, rng)
+                if fmt == 'legacy':
+                    writer.append(format_file_record(name, f"{name}@example.com", message, seq))
+                else:
+                    writer.append(name, f"{name}@example.com", message, created_at=str(seq))
+        except Exception as e:
+            errors.append(f"{name}: {e!r}")
+
+    workers = [threading.Thread(target=work, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return errors, writer.committer.snapshot()
+
+
+def verify(records, expected_writers, messages):
+    """Check records read back from storage; return a list of problems"""
+    problems = []
+    next_seq = {writer: 0 for writer in expected_writers}
+    for position, record in enumerate(records):
+        checked = check_message(record.get('message'))
+        if checked is None:
+            problems.append(f"record {position}: torn or corrupt message")
+            continue
+        writer, seq = checked
+        if record.get('name') != writer:
+            problems.append(f"record {position}: name {record.get('name')!r} does not match {writer!r}")
+        if writer not in next_seq:
+            problems.append(f"record {position}: unknown writer {writer!r}")
+        elif seq != next_seq[writer]:
+            problems.append(f"record {position}: {writer} wrote #{seq}, expected #{next_seq[writer]}")
+            next_seq[writer] = seq + 1
+        else:
+            next_seq[writer] += 1
+    for writer, seq in next_seq.items():
+        if seq != messages:
+            problems.append(f"{writer}: last record #{seq - 1}, expected #{messages - 1}")
+    return problems
+
+
+def verify_segmented(store, total):
+    """Check ids and segment files of a segmented store; return a list of problems"""
+    problems = []
+    count = store.count()
+    if count != total:
+        problems.append(f"header count {count}, expected {total}")
+    records = store.read_range(0, count)
+    ids = [record['id'] for record in records]
+    if ids != list(range(1, count + 1)):
+        problems.append("ids are not 1..count in order")
+
+    header = store._load_header()
+    for segment in header['segments']:
+        data_path, index_path = store._segment_paths(segment)
+        data_size = os.path.getsize(data_path)
+        if data_size != segment['bytes']:
+            problems.append(f"{segment['name']}: {data_size} data bytes, header says {segment['bytes']}")
+        index_size = os.path.getsize(index_path)
+        if index_size != segment['count'] * INDEX_ENTRY.size:
+            problems.append(f"{segment['name']}: index holds {index_size // INDEX_ENTRY.size} entries, "
+                            f"header says {segment['count']}")
+    return records, problems
+
+
+def run_format(fmt, options, workdir):
+    """Run the stress test for one storage format; return True if it passed"""
+    if fmt == 'legacy':
+        target = os.path.join(workdir, 'messages.txt')
+    else:
+        target = os.path.join(workdir, 'messages_store')
+    jobs = [(fmt, target, process, options.threads, options.messages, options.max_size,
+             options.fsync, options.group_commit_delay, options.seed)
+            for process in range(options.processes)]
+
+    started = time.perf_counter()
+    with get_context('spawn').Pool(options.processes) as pool:
+        results = pool.map(run_writer, jobs)
+    elapsed = time.perf_counter() - started
+
+    total = options.processes * options.threads * options.messages
+    errors = [error for process_errors, _ in results for error in process_errors]
+    submitted = sum(stats['submitted'] for _, stats in results)
+    flushes = sum(stats['flushes'] for _, stats in results)
+
+    if fmt == 'legacy':
+        records = list(iter_file_records(target))
+        problems = [] if len(records) == total else [f"{len(records)} records, expected {total}"]
+    else:
+        records, problems = verify_segmented(MessageStore(target), total)
+    writers = [f"p{p}t{t}" for p in range(options.processes) for t in range(options.threads)]
+    problems = errors + problems + verify(records, writers, options.messages)
+
+    print(f"{fmt:10} {total} records from {options.processes} processes x {options.threads} threads "
+          f"in {elapsed:.2f}s ({total / elapsed:,.0f}/s), "
+          f"{flushes} writes (avg batch {submitted / flushes if flushes else 0:.1f})")
+    for problem in problems[:20]:
+        print(f"  ❌ {problem}")
+    if len(problems) > 20:
+        print(f"  ... and {len(problems) - 20} more")
+    if not problems:
+        print("  ✅ no torn, lost, duplicated or reordered records")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=250, help='Messages per thread')
+    parser.add_argument('--max-size', type=int, default=64 * 1024, help='Largest message in characters')
+    parser.add_argument('--fsync', action='store_true', help='Flush every write to stable storage')
+    parser.add_argument('--group-commit-delay', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', help='Directory for the test files (default: a temporary one)')
+    options = parser.parse_args()
+
+    workdir = options.workdir or tempfile.mkdtemp(prefix='stress-file-writes-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        passed = all([run_format(fmt, options, workdir) for fmt in options.formats])
+    finally:
+        if not options.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
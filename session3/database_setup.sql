@@ -5,20 +5,100 @@
 -- Dashboard > SQL Editor > New Query
 -- ============================================
 
--- Create the messages table
+-- Create the messages table, partitioned by month of created_at so recent
+-- queries only touch recent partitions and old months can be archived.
+-- Unique keys of a partitioned table must include created_at
 CREATE TABLE IF NOT EXISTS messages (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     name VARCHAR(255) NOT NULL,
     email VARCHAR(255) NOT NULL,
     message TEXT NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Create the monthly partitions (messages_pYYYYMM) from the current month
+-- to months_ahead months ahead. Run it monthly, e.g. with pg_cron, or run
+-- `flask messages archive`, which also creates them and archives old months
+CREATE OR REPLACE FUNCTION create_message_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => i);
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+            'messages_p' || to_char(month_start, 'YYYYMM'),
+            month_start AT TIME ZONE 'UTC',
+            (month_start + interval '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A messages table created by an earlier, unpartitioned version of this
+-- script is kept as it is, so the rest of the script still runs; partition
+-- it with `flask db upgrade` (migration c5f0a7d2e913)
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'public.messages'::regclass) = 'p' THEN
+        -- Catches rows outside the monthly partitions (e.g. imported old messages)
+        CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT;
+        PERFORM create_message_partitions(3);
+    ELSE
+        RAISE NOTICE 'messages is not partitioned; run flask db upgrade to partition it';
+    END IF;
+END;
+$$;
 
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_messages_email ON messages(email);
 
+-- Full-text search: weighted tsvector over name, email and message,
+-- computed for existing rows when the column is added
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(email, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(message, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_search_vector ON messages USING gin (search_vector);
+
+-- Trigram indexes for substring search on name and email
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_messages_name_trgm ON messages USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_messages_email_trgm ON messages USING gin (email gin_trgm_ops);
+
+-- Ranked, paginated search used by the Supabase client
+CREATE OR REPLACE FUNCTION search_messages(
+    search_term TEXT,
+    result_limit INTEGER DEFAULT 50,
+    result_offset INTEGER DEFAULT 0,
+    include_substring BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    id BIGINT,
+    name VARCHAR(255),
+    email VARCHAR(255),
+    message TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    rank REAL
+) AS $$
+    SELECT m.id, m.name, m.email, m.message, m.created_at, m.updated_at,
+           ts_rank(m.search_vector, q) AS rank
+    FROM messages m, websearch_to_tsquery('simple', search_term) AS q
+    WHERE m.search_vector @@ q
+       OR (include_substring AND (m.name ILIKE '%' || search_term || '%'
+                                  OR m.email ILIKE '%' || search_term || '%'))
+    ORDER BY rank DESC, m.id DESC
+    LIMIT result_limit OFFSET result_offset;
+$$ LANGUAGE sql STABLE;
+
 -- Add a trigger to automatically update the updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -33,8 +113,67 @@ CREATE TRIGGER update_messages_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Maintained message count, so counting does not scan the whole table
+CREATE TABLE IF NOT EXISTS message_counters (
+    name VARCHAR(64) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+-- Seed the counter from the rows that already exist
+INSERT INTO message_counters (name, value)
+SELECT 'messages', COUNT(*) FROM messages
+ON CONFLICT (name) DO NOTHING;
+
+-- Keep the counter current in the same transaction as every insert and
+-- delete. Statement-level triggers read the transition tables, so a
+-- multi-row insert updates the counter once. SECURITY DEFINER lets inserts
+-- by the public role update message_counters without write access to it;
+-- trigger functions cannot be called through the REST API, and the pinned
+-- search_path keeps the definer's rights from resolving other objects.
+-- The SQLAlchemy models look these triggers up by name and then leave the
+-- counting to them, so the database can also be used with DATABASE_URL
+CREATE OR REPLACE FUNCTION count_inserted_messages()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.message_counters SET value = value + (SELECT COUNT(*) FROM new_rows)
+    WHERE name = 'messages';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = pg_catalog, public;
+
+CREATE OR REPLACE FUNCTION count_deleted_messages()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.message_counters SET value = value - (SELECT COUNT(*) FROM old_rows)
+    WHERE name = 'messages';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = pg_catalog, public;
+
+REVOKE ALL ON FUNCTION count_inserted_messages() FROM PUBLIC;
+REVOKE ALL ON FUNCTION count_deleted_messages() FROM PUBLIC;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS messages_count_insert ON messages;
+CREATE TRIGGER messages_count_insert
+    AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_inserted_messages();
+
+DROP TRIGGER IF EXISTS messages_count_delete ON messages;
+CREATE TRIGGER messages_count_delete
+    AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_deleted_messages();
+
+-- Earlier versions of this script let clients adjust the counter directly
+DROP FUNCTION IF EXISTS adjust_message_counter(TEXT, BIGINT);
+
 -- Enable Row Level Security (RLS)
 ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE message_counters ENABLE ROW LEVEL SECURITY;
 
 -- Create a policy to allow all operations for authenticated users
 -- You can modify these policies based on your security requirements
@@ -52,6 +191,12 @@ CREATE POLICY "Allow public read" ON messages
     TO public
     USING (true);
 
+-- Policy: Allow anyone to read the message count
+CREATE POLICY "Allow public read" ON message_counters
+    FOR SELECT
+    TO public
+    USING (true);
+
 -- Policy: Allow authenticated users to update their own messages
 -- Uncomment if you want to allow updates
 -- CREATE POLICY "Allow authenticated update" ON messages
@@ -89,6 +234,7 @@ CREATE POLICY "Allow public read" ON messages
 
 -- Count messages
 -- SELECT COUNT(*) as total_messages FROM messages;
+-- SELECT value AS total_messages FROM message_counters WHERE name = 'messages';
 
 -- View all messages
 -- SELECT * FROM messages ORDER BY created_at DESC;
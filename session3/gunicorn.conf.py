@@ -0,0 +1,53 @@
+"""
+gunicorn configuration for the Flask Contact Form Application
+
+Every setting comes from the WSGI_* variables in config.py (see the README),
+so the server is tuned through the same environment as the app:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    WSGI_WORKER_CLASS=threaded WSGI_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master and workers are forked from it
+(WSGI_PRELOAD), each worker is replaced after WSGI_MAX_REQUESTS requests,
+and every worker logs how many requests it served when it exits.
+"""
+
+import os
+
+# Every module-level name is read as a gunicorn setting, and 'config' is one
+from config import config as _configs
+
+_config = _configs[os.environ.get('FLASK_ENV', 'production')]
+
+if _config.WSGI_WORKER_CLASS in ('gevent', 'async'):
+    # Patch before the preloaded app imports socket, ssl and threading, so
+    # database drivers and locks cooperate with gevent in every worker
+    from gevent import monkey
+    monkey.patch_all()
+
+from app.workers import server_settings  # noqa: E402
+
+globals().update(server_settings(_config))
+
+accesslog = os.environ.get('WSGI_ACCESS_LOG')  # '-' logs requests to stdout
+errorlog = '-'
+
+
+def when_ready(server):
+    server.log.info("🚀 Serving with %s %s worker(s)%s, recycled after %s requests",
+                    server.cfg.workers, server.cfg.worker_class_str,
+                    ' (preloaded)' if server.cfg.preload_app else '',
+                    server.cfg.max_requests or 'no')
+
+
+def post_fork(server, worker):
+    from app.workers import after_fork
+    from wsgi import app
+    after_fork(app)
+
+
+def worker_exit(server, worker):
+    from wsgi import app
+    stats = app.extensions['worker_stats'].snapshot()
+    server.log.info("Worker %s exiting after %s requests in %ss",
+                    worker.pid, stats['requests'], stats['uptime_seconds'])
@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -51,6 +52,27 @@ def get_metadata():
     return target_db.metadata
 
 
+# Full-text search objects (app/search.py) are not part of the models and
+# are managed by hand-written migrations, so autogenerate must ignore them
+SEARCH_INDEXES = {'ix_messages_search_vector', 'ix_messages_name_trgm', 'ix_messages_email_trgm'}
+
+# Monthly partitions of messages (app/partitions.py) are created and dropped
+# at runtime, so neither they nor their indexes belong in a migration
+PARTITION_TABLE = re.compile(r'^messages_(p\d{6}|default)$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and (name.startswith('messages_fts') or PARTITION_TABLE.match(name)):
+        return False
+    if type_ in ('index', 'unique_constraint') and PARTITION_TABLE.match(object.table.name):
+        return False
+    if type_ == 'column' and name == 'search_vector':
+        return False
+    if type_ == 'index' and name in SEARCH_INDEXES:
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +87,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +116,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
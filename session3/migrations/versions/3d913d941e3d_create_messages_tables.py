@@ -0,0 +1,52 @@
+"""Create messages and message_counters tables
+
+Revision ID: 3d913d941e3d
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d913d941e3d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app may already have created the tables with db.create_all()
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('messages'):
+        op.create_table(
+            'messages',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('email', sa.String(length=255), nullable=False),
+            sa.Column('message', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_messages_created_at', 'messages', ['created_at'], unique=False)
+        op.create_index('ix_messages_email', 'messages', ['email'], unique=False)
+        op.create_index('ix_messages_name', 'messages', ['name'], unique=False)
+
+    if not inspector.has_table('message_counters'):
+        op.create_table(
+            'message_counters',
+            sa.Column('name', sa.String(length=64), nullable=False),
+            sa.Column('value', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('message_counters')
+    op.drop_index('ix_messages_name', table_name='messages')
+    op.drop_index('ix_messages_email', table_name='messages')
+    op.drop_index('ix_messages_created_at', table_name='messages')
+    op.drop_table('messages')
@@ -0,0 +1,88 @@
+"""Add full-text search index for messages
+
+PostgreSQL: generated, weighted tsvector column with a GIN index, plus
+pg_trgm GIN indexes on name and email for substring search.
+SQLite: external-content FTS5 table kept in sync by triggers.
+Rows that already exist are indexed as part of the upgrade.
+
+Revision ID: 4630a0be65ff
+Revises: 3d913d941e3d
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4630a0be65ff'
+down_revision = '3d913d941e3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # A STORED generated column is computed for every existing row when
+        # it is added, so no separate backfill is needed
+        op.execute("""
+            ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(email, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(message, '')), 'C')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING gin (search_vector)")
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_messages_name_trgm ON messages USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_messages_email_trgm ON messages USING gin (email gin_trgm_ops)")
+
+    elif dialect == 'sqlite':
+        created = not sa.inspect(op.get_bind()).has_table('messages_fts')
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                name, email, message, content='messages', content_rowid='id'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, name, email, message)
+                VALUES (new.id, new.name, new.email, new.message);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, name, email, message)
+                VALUES ('delete', old.id, old.name, old.email, old.message);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, name, email, message)
+                VALUES ('delete', old.id, old.name, old.email, old.message);
+                INSERT INTO messages_fts(rowid, name, email, message)
+                VALUES (new.id, new.name, new.email, new.message);
+            END
+        """)
+        if created:
+            # Index the messages stored before the FTS table existed
+            op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_messages_email_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_messages_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_messages_search_vector")
+        op.execute("ALTER TABLE messages DROP COLUMN IF EXISTS search_vector")
+
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS messages_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS messages_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS messages_fts_insert")
+        op.execute("DROP TABLE IF EXISTS messages_fts")
@@ -0,0 +1,30 @@
+"""Index messages.updated_at
+
+Conditional GET on /messages reads max(updated_at) on every request; the
+index lets the database answer it from the end of the index.
+
+Revision ID: 8b2e61c4d7a9
+Revises: 4630a0be65ff
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e61c4d7a9'
+down_revision = '4630a0be65ff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app may already have created the index with db.create_all()
+    indexes = sa.inspect(op.get_bind()).get_indexes('messages')
+    if not any(index['name'] == 'ix_messages_updated_at' for index in indexes):
+        op.create_index('ix_messages_updated_at', 'messages', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_messages_updated_at', table_name='messages')
@@ -0,0 +1,144 @@
+"""Partition messages by month of created_at
+
+PostgreSQL only: messages becomes a range-partitioned table with one
+partition per calendar month (messages_pYYYYMM), from the oldest stored
+message to three months ahead, plus a DEFAULT partition for anything
+outside those ranges. Existing rows are copied into the new partitions in
+the migration's transaction. The primary key becomes (id, created_at),
+since a partitioned table's unique keys must include the partition key.
+Triggers, row level security and policies on the table are carried over.
+
+`flask messages archive` creates later partitions and archives old ones.
+
+Revision ID: c5f0a7d2e913
+Revises: 8b2e61c4d7a9
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f0a7d2e913'
+down_revision = '8b2e61c4d7a9'
+branch_labels = None
+depends_on = None
+
+# Partitions created ahead of the current month
+MONTHS_AHEAD = 3
+
+# Columns copied between the old and the new table; search_vector is
+# generated and recomputed on insert
+COLUMNS = 'id, name, email, message, created_at, updated_at'
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _add_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _is_partitioned(bind):
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('messages'))"
+    )).scalar()
+
+
+def _capture_table_objects(bind):
+    """Read the triggers, RLS flag and policies of messages so they can be recreated"""
+    triggers = bind.execute(sa.text(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger "
+        "WHERE tgrelid = to_regclass('messages') AND NOT tgisinternal"
+    )).scalars().all()
+    rls = bind.execute(sa.text(
+        "SELECT relrowsecurity FROM pg_class WHERE oid = to_regclass('messages')"
+    )).scalar()
+    policies = bind.execute(sa.text(
+        "SELECT policyname, permissive, roles, cmd, qual, with_check FROM pg_policies "
+        "WHERE schemaname = current_schema() AND tablename = 'messages'"
+    )).all()
+    return triggers, rls, policies
+
+
+def _restore_table_objects(triggers, rls, policies):
+    for definition in triggers:
+        # The definition names the table as it was when it was captured
+        op.execute(definition)
+    if rls:
+        op.execute("ALTER TABLE messages ENABLE ROW LEVEL SECURITY")
+    for name, permissive, roles, cmd, qual, with_check in policies:
+        statement = (f'CREATE POLICY "{name}" ON messages AS {permissive} FOR {cmd} '
+                     f'TO {", ".join(roles)}')
+        if qual:
+            statement += f' USING ({qual})'
+        if with_check:
+            statement += f' WITH CHECK ({with_check})'
+        op.execute(statement)
+
+
+def _create_indexes(has_search):
+    op.execute("CREATE INDEX ix_messages_created_at ON messages (created_at)")
+    op.execute("CREATE INDEX ix_messages_updated_at ON messages (updated_at)")
+    op.execute("CREATE INDEX ix_messages_name ON messages (name)")
+    op.execute("CREATE INDEX ix_messages_email ON messages (email)")
+    if has_search:
+        op.execute("CREATE INDEX ix_messages_search_vector ON messages USING gin (search_vector)")
+        op.execute("CREATE INDEX ix_messages_name_trgm ON messages USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_messages_email_trgm ON messages USING gin (email gin_trgm_ops)")
+
+
+def _rebuild(bind, partitioned):
+    """Copy messages into a new table, partitioned or not, and replace it"""
+    has_search = 'search_vector' in {column['name'] for column in sa.inspect(bind).get_columns('messages')}
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('messages', 'id')")).scalar()
+    triggers, rls, policies = _capture_table_objects(bind)
+
+    op.execute("ALTER TABLE messages RENAME TO messages_old")
+    partition_by = ' PARTITION BY RANGE (created_at)' if partitioned else ''
+    op.execute("CREATE TABLE messages (LIKE messages_old INCLUDING DEFAULTS INCLUDING GENERATED)"
+               + partition_by)
+
+    if partitioned:
+        oldest = bind.execute(sa.text("SELECT min(created_at) FROM messages_old")).scalar()
+        now = datetime.utcnow()
+        month = _month_start(oldest or now)
+        end = _month_start(now)
+        for _ in range(MONTHS_AHEAD + 1):
+            end = _add_month(end)
+        while month < end:
+            upper = _add_month(month)
+            op.execute(f"CREATE TABLE messages_p{month:%Y%m} PARTITION OF messages "
+                       f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')")
+            month = upper
+        op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+    op.execute(f"INSERT INTO messages ({COLUMNS}) SELECT {COLUMNS} FROM messages_old")
+    if sequence:
+        # Dropping the old table would otherwise drop the id sequence with it
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY messages.id")
+    op.execute("DROP TABLE messages_old")
+
+    primary_key = '(id, created_at)' if partitioned else '(id)'
+    op.execute(f"ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY {primary_key}")
+    _create_indexes(has_search)
+    _restore_table_objects(triggers, rls, policies)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or _is_partitioned(bind):
+        return
+    _rebuild(bind, partitioned=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not _is_partitioned(bind):
+        return
+    # Archived partitions stay in their archive files
+    _rebuild(bind, partitioned=False)
@@ -0,0 +1,36 @@
+"""Seed the messages counter
+
+Message.count_all reads the message_counters row that writes keep up to
+date. The row is created here with an exact count, with messages locked
+against writes on PostgreSQL, so no write happens between the count and
+the row existing.
+
+Revision ID: e1a4b7c9d2f6
+Revises: c5f0a7d2e913
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a4b7c9d2f6'
+down_revision = 'c5f0a7d2e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("LOCK TABLE messages IN SHARE ROW EXCLUSIVE MODE")
+    # SQLite needs the WHERE to parse ON CONFLICT after a SELECT
+    op.execute(
+        "INSERT INTO message_counters (name, value) "
+        "SELECT 'messages', count(*) FROM messages WHERE true "
+        "ON CONFLICT (name) DO NOTHING"
+    )
+
+
+def downgrade():
+    op.execute("DELETE FROM message_counters WHERE name = 'messages'")
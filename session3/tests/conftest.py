@@ -0,0 +1,24 @@
+import pytest
+
+from postgrest_stub import PostgrestStub
+
+
+@pytest.fixture
+def stub():
+    """A running PostgREST stand-in, stopped after the test"""
+    server = PostgrestStub().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def database_app(tmp_path):
+    """An app storing messages in a temporary SQLite database"""
+    from app import create_app
+    from config import TestingConfig
+
+    class Config(TestingConfig):
+        STORAGE_BACKEND = 'database'
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.sqlite"}'
+
+    return create_app(Config)
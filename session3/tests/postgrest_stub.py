@@ -0,0 +1,142 @@
+"""
+Local HTTP stand-in for the PostgREST endpoints AsyncSupabaseDB uses
+
+Serves inserts, in.(...)/eq. selects and deletes on an in-memory messages
+table, records how many requests were in flight at once, and can slow
+down or fail chosen requests.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from postgrest import AsyncPostgrestClient
+
+IN_FILTER = re.compile(r'^in\.\((.*)\)$')
+
+
+class PostgrestStub:
+    """
+    In-memory PostgREST messages table on a local port
+
+    Attributes:
+        url: Base URL to pass as the Supabase project URL
+        rows: Stored rows by id
+        delay: Callable taking a request's keys (message texts for inserts,
+            ids for filters) and returning seconds to wait before answering
+        fail_on: Keys whose requests are answered with a 500 error
+        max_in_flight: Most requests seen in progress at the same time
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.delay = lambda keys: 0.0
+        self.fail_on = set()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, method, query, body):
+        """Answer one request, returning (status, payload)"""
+        params = dict(parse_qsl(query))
+        if method == 'POST':
+            keys = [row['message'] for row in body]
+        else:
+            keys = _filter_ids(params.get('id', ''))
+
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay(keys))
+            if self.fail_on.intersection(keys):
+                return 500, {'message': 'stub failure', 'code': 'XX000', 'hint': None, 'details': None}
+            with self._lock:
+                return self._apply(method, params, body, keys)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _apply(self, method, params, body, keys):
+        if method == 'POST':
+            inserted = []
+            for row in body:
+                inserted.append(dict(row, id=self._next_id, updated_at=row.get('created_at')))
+                self.rows[self._next_id] = inserted[-1]
+                self._next_id += 1
+            return 201, inserted
+
+        # Matching rows newest first, so callers cannot rely on the order
+        found = [self.rows[message_id] for message_id in sorted(keys, reverse=True)
+                 if message_id in self.rows]
+        if method == 'DELETE':
+            for row in found:
+                del self.rows[row['id']]
+            return 200, found
+        if 'limit' in params:
+            found = found[:int(params['limit'])]
+        return 200, found
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload = stub.handle(self.command, url.query, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class StubClient:
+    """The part of supabase's AsyncClient that AsyncSupabaseDB uses"""
+
+    def __init__(self, url):
+        self.postgrest = AsyncPostgrestClient(f'{url}/rest/v1')
+
+    def table(self, name):
+        return self.postgrest.from_(name)
+
+    def rpc(self, name, params):
+        return self.postgrest.rpc(name, params)
+
+
+def _filter_ids(value):
+    """Parse the ids of an in.(...) or eq. filter"""
+    match = IN_FILTER.match(value)
+    if match:
+        return [int(item) for item in match.group(1).split(',') if item]
+    if value.startswith('eq.'):
+        return [int(value[3:])]
+    return []
@@ -0,0 +1,21 @@
+"""Tests for admission control of the write path"""
+
+from app.admission import AdmissionController
+
+
+def test_shed_request_gets_its_token_back():
+    controller = AdmissionController(rate=1.0, burst=2, max_concurrent=1, clock=lambda: 0.0)
+    assert controller.acquire()
+
+    # Both requests are shed while the only write slot is taken
+    for _ in range(2):
+        assert controller.take_token('client') == 0
+        assert not controller.acquire()
+        controller.refund('client')
+
+    # The retry gets a slot instead of being rate limited
+    controller.release()
+    assert controller.take_token('client') == 0
+    assert controller.acquire()
+    assert controller.snapshot()['shed'] == 2
+    assert controller.snapshot()['rate_limited'] == 0
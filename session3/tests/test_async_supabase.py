@@ -0,0 +1,78 @@
+"""Tests for AsyncSupabaseDB against the local PostgREST stand-in"""
+
+import asyncio
+
+from app.database import AsyncSupabaseDB
+from postgrest_stub import StubClient
+
+
+def run(stub, operation, max_concurrency=10):
+    """Run operation(db) on an AsyncSupabaseDB connected to the stub"""
+    async def main():
+        async with AsyncSupabaseDB(StubClient(stub.url), max_concurrency=max_concurrency) as db:
+            return await operation(db)
+    return asyncio.run(main())
+
+
+def messages(count):
+    return [{'name': f'n{i}', 'email': f'n{i}@example.com', 'message': f'm{i}'} for i in range(count)]
+
+
+def test_requests_stay_within_max_concurrency(stub):
+    run(stub, lambda db: db.save_messages(messages(40), batch_size=40))
+    stub.delay = lambda keys: 0.05
+    stub.max_in_flight = 0
+
+    found = run(stub, lambda db: db.get_messages_by_ids(range(1, 41), batch_size=4), max_concurrency=3)
+
+    assert [row['id'] for row in found] == list(range(1, 41))
+    assert stub.max_in_flight == 3
+
+
+def test_save_messages_keeps_input_order(stub):
+    # The first batch answers last
+    stub.delay = lambda keys: 0.2 if 'm0' in keys else 0.0
+
+    saved = run(stub, lambda db: db.save_messages(messages(9), batch_size=3))
+
+    assert [row['message'] for row in saved] == [f'm{i}' for i in range(9)]
+    assert stub.requests == 3
+
+
+def test_get_messages_by_ids_follows_requested_order(stub):
+    run(stub, lambda db: db.save_messages(messages(10)))
+    ids = [7, 2, 9, 2, 42, 1, 5]
+
+    found = run(stub, lambda db: db.get_messages_by_ids(ids, batch_size=2))
+
+    # Duplicates are fetched once and missing ids are dropped
+    assert [row['id'] for row in found] == [7, 2, 9, 1, 5]
+    assert stub.requests == 1 + 3
+
+
+def test_failed_insert_batch_keeps_the_other_batches(stub):
+    stub.fail_on = {'m4'}
+
+    saved = run(stub, lambda db: db.save_messages(messages(9), batch_size=3))
+
+    assert [row['message'] for row in saved] == ['m0', 'm1', 'm2', 'm6', 'm7', 'm8']
+    assert len(stub.rows) == 6
+
+
+def test_failed_id_batch_fails_the_lookup(stub):
+    run(stub, lambda db: db.save_messages(messages(6)))
+    stub.fail_on = {5}
+
+    assert run(stub, lambda db: db.get_messages_by_ids(range(1, 7), batch_size=2)) == []
+    assert run(stub, lambda db: db.get_message_by_id(5)) is None
+    assert run(stub, lambda db: db.get_message_by_id(6))['message'] == 'm5'
+
+
+def test_delete_messages_counts_only_successful_batches(stub):
+    run(stub, lambda db: db.save_messages(messages(9)))
+    stub.fail_on = {4}
+
+    deleted = run(stub, lambda db: db.delete_messages(range(1, 10), batch_size=3))
+
+    assert deleted == 6
+    assert sorted(stub.rows) == [4, 5, 6]
@@ -0,0 +1,43 @@
+"""Tests for the message counter kept by the models or by database triggers"""
+
+import pytest
+
+from app.models import Message, db
+
+# SQLite versions of the counting triggers in database_setup.sql
+COUNTING_TRIGGERS = (
+    "CREATE TRIGGER messages_count_insert AFTER INSERT ON messages BEGIN "
+    "UPDATE message_counters SET value = value + 1 WHERE name = 'messages'; END",
+    "CREATE TRIGGER messages_count_delete AFTER DELETE ON messages BEGIN "
+    "UPDATE message_counters SET value = value - 1 WHERE name = 'messages'; END",
+)
+
+
+def insert_directly(count):
+    """Insert rows the way the Supabase client does, bypassing the models"""
+    for i in range(count):
+        db.session.execute(db.text(
+            "INSERT INTO messages (name, email, message, created_at, updated_at) "
+            "VALUES (:name, 'direct@example.com', 'direct', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+        ), {'name': f'direct{i}'})
+    db.session.commit()
+
+
+@pytest.mark.parametrize('triggers', [False, True])
+def test_every_write_is_counted_once(database_app, triggers):
+    with database_app.app_context():
+        if triggers:
+            for statement in COUNTING_TRIGGERS:
+                db.session.execute(db.text(statement))
+            db.session.commit()
+            insert_directly(2)
+
+        Message.create('a', 'a@example.com', 'one')
+        database_app.extensions['storage'].save_many([
+            {'name': f'b{i}', 'email': 'b@example.com', 'message': 'many'} for i in range(3)
+        ])
+        Message.query.filter_by(name='a').one().delete()
+
+        expected = 3 + (2 if triggers else 0)
+        assert Message.count_all(mode='exact') == expected
+        assert Message.count_all(mode='counter') == expected
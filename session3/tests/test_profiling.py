@@ -0,0 +1,40 @@
+"""Tests for per-request SQL query profiling"""
+
+from app.models import Message
+
+
+def make_app(tmp_path):
+    from app import create_app
+    from config import TestingConfig
+
+    class Config(TestingConfig):
+        STORAGE_BACKEND = 'database'
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.sqlite"}'
+        QUERY_PROFILING_ENABLED = True
+        SLOW_QUERY_THRESHOLD_MS = 0
+        MESSAGES_STREAM_BATCH_SIZE = 1
+
+    app = create_app(Config)
+    with app.app_context():
+        for i in range(3):
+            Message.create(f'n{i}', 'n@example.com', 'hello')
+    return app
+
+
+def test_server_timing_header(tmp_path):
+    response = make_app(tmp_path).test_client().get('/api/messages')
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+
+
+def test_streamed_response_is_logged_when_closed(tmp_path, capsys):
+    app = make_app(tmp_path)
+    capsys.readouterr()
+
+    response = app.test_client().get('/messages/all', buffered=False)
+    assert 'Server-Timing' not in response.headers
+    body = b''.join(response.response)
+    response.close()
+
+    assert body.count(b'n@example.com') == 3
+    slow = [line for line in capsys.readouterr().out.splitlines() if 'Slow request GET /messages/all' in line]
+    assert len(slow) == 1
@@ -0,0 +1,140 @@
+"""Tests for read replica routing, with temporary SQLite files as replicas"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.models import Message, db
+from app.replicas import STICKY_COOKIE, ReplicaRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def read_name(session):
+    """Read the name stored in a database, which tells the databases apart"""
+    return session.execute(text('SELECT name FROM messages ORDER BY id LIMIT 1')).scalar()
+
+
+def create_database(path, name=None):
+    """Create the schema in a SQLite file, holding one message if name is given"""
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    if name is not None:
+        with engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO messages (name, email, message, created_at, updated_at) "
+                "VALUES (:name, 'x@example.com', 'stored', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+            ), {'name': name})
+    return engine
+
+
+def break_database(engine):
+    with engine.begin() as connection:
+        connection.execute(text('ALTER TABLE messages RENAME TO messages_moved'))
+
+
+def repair_database(engine):
+    with engine.begin() as connection:
+        connection.execute(text('ALTER TABLE messages_moved RENAME TO messages'))
+
+
+@pytest.fixture
+def databases(tmp_path):
+    engines = {name: create_database(tmp_path / f'{name}.sqlite', name)
+               for name in ('primary', 'replica-1', 'replica-2')}
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def router(databases, clock):
+    replicas = {name: databases[name] for name in ('replica-1', 'replica-2')}
+    return ReplicaRouter(replicas, eject_seconds=30, clock=clock)
+
+
+def run(router, databases):
+    with Session(databases['primary']) as primary:
+        return router.run(read_name, primary=primary)
+
+
+def test_reads_rotate_over_replicas(router, databases):
+    assert [run(router, databases) for _ in range(4)] == ['replica-1', 'replica-2', 'replica-1', 'replica-2']
+    replicas = router.snapshot()['replicas']
+    assert replicas['replica-1']['reads'] == 2
+    assert replicas['replica-2']['reads'] == 2
+
+
+def test_failed_replica_is_ejected_until_eject_seconds_pass(router, databases, clock):
+    break_database(databases['replica-1'])
+
+    # The failed read moves on to the next replica
+    assert run(router, databases) == 'replica-2'
+    state = router.snapshot()['replicas']['replica-1']
+    assert not state['healthy']
+    assert (state['errors'], state['ejections']) == (1, 1)
+
+    # Repaired, but still ejected until eject_seconds have passed
+    repair_database(databases['replica-1'])
+    clock.now = 29
+    assert [run(router, databases) for _ in range(3)] == ['replica-2'] * 3
+
+    clock.now = 30
+    assert sorted(run(router, databases) for _ in range(2)) == ['replica-1', 'replica-2']
+    assert router.snapshot()['replicas']['replica-1']['healthy']
+
+
+def test_reads_fall_back_to_the_primary(router, databases):
+    break_database(databases['replica-1'])
+    break_database(databases['replica-2'])
+
+    assert run(router, databases) == 'primary'
+    assert run(router, databases) == 'primary'
+
+    snapshot = router.snapshot()
+    assert snapshot['fallbacks'] == 2
+    # Ejected replicas are not tried again for the second read
+    assert [state['errors'] for state in snapshot['replicas'].values()] == [1, 1]
+
+
+def test_submitting_client_reads_its_own_write(tmp_path):
+    from app import create_app
+    from config import TestingConfig
+
+    # Replicas that have not replicated anything yet
+    replica_paths = [tmp_path / f'replica-{number}.sqlite' for number in (1, 2)]
+    for path in replica_paths:
+        create_database(path).dispose()
+
+    class Config(TestingConfig):
+        STORAGE_BACKEND = 'database'
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.sqlite"}'
+        DATABASE_REPLICA_URLS = [f'sqlite:///{path}' for path in replica_paths]
+        REPLICA_STICKY_SECONDS = 60
+
+    app = create_app(Config)
+    submitter = app.test_client()
+    other = app.test_client()
+
+    response = submitter.post('/submit', data={'name': 'Ada', 'email': 'ada@example.com', 'message': 'hello'})
+    assert response.status_code == 200
+    assert submitter.get_cookie(STICKY_COOKIE) is not None
+
+    assert [msg['name'] for msg in submitter.get('/api/messages').get_json()['messages']] == ['Ada']
+    # Other clients read the replicas, which do not have the message yet
+    assert other.get('/api/messages').get_json()['messages'] == []
+
+    with app.app_context():
+        assert Message.query.count() == 1
+    assert app.extensions['replica_router'].snapshot()['sticky_reads'] >= 1
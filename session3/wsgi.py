@@ -0,0 +1,16 @@
+"""
+Flask Contact Form Application
+Session 3: Virtual Machines & Cloud Compute
+Production WSGI entry point, served by gunicorn with gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Uses the production configuration unless FLASK_ENV says otherwise.
+"""
+
+import os
+from app import create_app
+from config import config
+
+env = os.environ.get('FLASK_ENV', 'production')
+app = create_app(config[env])